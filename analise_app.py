@@ -0,0 +1,277 @@
+# analise_app.py - Interface gráfica (customtkinter) da Ferramenta de Análise Pré-Unificação
+
+# Seção de Importação de Bibliotecas
+# A interface fica num módulo separado para que o analise_gui.py possa ser importado (e rodado
+# pela linha de comando) sem carregar o customtkinter. Este módulo só é importado quando a
+# janela é aberta.
+# customtkinter: Para criar a interface gráfica com um visual moderno.
+# tkinter: A lista de bancos usa o Listbox do tkinter, que só desenha as linhas visíveis e
+#          por isso continua leve com milhares de bancos (uma caixa de seleção por banco não).
+# threading: Para executar a conexão e a análise em segundo plano, sem congelar a janela.
+import customtkinter as ctk
+import tkinter as tk
+import threading
+
+from analise_gui import (
+    MAX_EXTRACOES_SIMULTANEAS, OPCOES_EXPORTACAO_GUI, REGISTRO_VERIFICACOES,
+    FabricaConexaoSQLServer, GerenciadorConexoes, Instrumentacao, colunas_necessarias, descobrir_bancos, descrever_progresso,
+    executar_analise_completa,
+)
+
+# Classe principal da aplicação (GUI)
+class App(ctk.CTk):
+    def __init__(self):
+        super().__init__()
+        
+        # Configurações da janela
+        self.title("Ferramenta de Análise Pré-Unificação (v4.15)")
+        self.geometry("600x750")
+        ctk.set_appearance_mode("dark")
+        
+        # Estrutura de frames e widgets da GUI
+        self.main_scrollable_frame = ctk.CTkScrollableFrame(self)
+        self.main_scrollable_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        # Seção 1: Conexão
+        self.frame_conexao = ctk.CTkFrame(self.main_scrollable_frame, corner_radius=10)
+        self.frame_conexao.pack(pady=10, padx=10, fill="x")
+        ctk.CTkLabel(self.frame_conexao, text="1. Conexão com o Servidor SQL", font=("", 14, "bold")).pack(pady=10)
+        self.entry_servidor = ctk.CTkEntry(self.frame_conexao, placeholder_text="Servidor (ex: localhost\\SQLEXPRESS)")
+        self.entry_servidor.pack(pady=5, padx=10, fill="x")
+        self.entry_usuario = ctk.CTkEntry(self.frame_conexao, placeholder_text="Usuário")
+        self.entry_usuario.pack(pady=5, padx=10, fill="x")
+        self.entry_senha = ctk.CTkEntry(self.frame_conexao, placeholder_text="Senha", show="*")
+        self.entry_senha.pack(pady=5, padx=10, fill="x")
+        self.btn_conectar = ctk.CTkButton(self.frame_conexao, text="Conectar e Listar Bancos", command=self.iniciar_conexao_thread)
+        self.btn_conectar.pack(pady=10, padx=10)
+        
+        # Seção 2: Seleção de Bancos
+        self.frame_selecao = ctk.CTkFrame(self.main_scrollable_frame, corner_radius=10)
+        self.frame_selecao.pack(pady=10, padx=10, fill="x")
+        ctk.CTkLabel(self.frame_selecao, text="2. Seleção dos Bancos de Dados", font=("", 14, "bold")).pack(pady=10)
+        # Só aparecem os bancos do Ponto Offline (com a tabela de funcionários); os que não têm
+        # todas as tabelas ficam em cinza, com as que faltam (servem para as verificações que
+        # não usam essas tabelas). O filtro busca pelo nome
+        self.entry_filtro_bancos = ctk.CTkEntry(self.frame_selecao, placeholder_text="Filtrar bancos pelo nome")
+        self.entry_filtro_bancos.pack(pady=5, padx=10, fill="x")
+        self.entry_filtro_bancos.bind("<KeyRelease>", lambda evento: self.filtrar_bancos())
+        self.frame_lista_bancos = ctk.CTkFrame(self.frame_selecao)
+        self.frame_lista_bancos.pack(pady=5, padx=10, fill="x")
+        self.lista_bancos = tk.Listbox(self.frame_lista_bancos, selectmode=tk.MULTIPLE, height=10, activestyle="none", exportselection=False,
+                                       bg="#2b2b2b", fg="#dce4ee", selectbackground="#1f6aa5", highlightthickness=0, borderwidth=0)
+        self.lista_bancos.pack(side="left", fill="both", expand=True)
+        self.lista_bancos.bind("<<ListboxSelect>>", lambda evento: self.registrar_selecao_bancos())
+        barra_lista = ctk.CTkScrollbar(self.frame_lista_bancos, command=self.lista_bancos.yview)
+        barra_lista.pack(side="right", fill="y")
+        self.lista_bancos.configure(yscrollcommand=barra_lista.set)
+        self.frame_botoes_bancos = ctk.CTkFrame(self.frame_selecao, fg_color="transparent")
+        self.frame_botoes_bancos.pack(pady=5, padx=10, fill="x")
+        ctk.CTkButton(self.frame_botoes_bancos, text="Selecionar filtrados", command=self.selecionar_filtrados).pack(side="left", padx=(0, 5))
+        ctk.CTkButton(self.frame_botoes_bancos, text="Limpar seleção", command=self.limpar_selecao_bancos).pack(side="left")
+        self.label_bancos = ctk.CTkLabel(self.frame_selecao, text="Conecte ao servidor para listar os bancos.")
+        self.label_bancos.pack(pady=(0, 10), padx=10)
+        
+        # Seção 3: Execução da Análise
+        self.frame_execucao = ctk.CTkFrame(self.main_scrollable_frame, corner_radius=10)
+        self.frame_execucao.pack(pady=10, padx=10, fill="x")
+        ctk.CTkLabel(self.frame_execucao, text="3. Executar Análise", font=("", 14, "bold")).pack(pady=10)
+        # Verificações a executar (todas marcadas por padrão); só as tabelas e colunas usadas por elas são lidas
+        ctk.CTkLabel(self.frame_execucao, text="Verificações a executar:").pack(pady=(5, 0), padx=10, anchor="w")
+        self.frame_scroll_verificacoes = ctk.CTkScrollableFrame(self.frame_execucao, height=120)
+        self.frame_scroll_verificacoes.pack(pady=5, padx=10, fill="x")
+        self.checkboxes_verificacoes = []
+        for identificador, verificacao in REGISTRO_VERIFICACOES.items():
+            checkbox = ctk.CTkCheckBox(self.frame_scroll_verificacoes, text=verificacao["titulo"])
+            checkbox.select()
+            checkbox.pack(padx=10, pady=3, anchor="w")
+            self.checkboxes_verificacoes.append((identificador, checkbox))
+        self.entry_paralelismo = ctk.CTkEntry(self.frame_execucao, placeholder_text=f"Extrações simultâneas (padrão: {MAX_EXTRACOES_SIMULTANEAS})")
+        self.entry_paralelismo.pack(pady=5, padx=10, fill="x")
+        self.checkbox_pushdown = ctk.CTkCheckBox(self.frame_execucao, text="Verificar duplicidades no servidor (modo pushdown)")
+        self.checkbox_pushdown.pack(pady=5, padx=10, anchor="w")
+        self.checkbox_incremental = ctk.CTkCheckBox(self.frame_execucao, text="Analisar enquanto extrai (modo incremental)")
+        self.checkbox_incremental.pack(pady=5, padx=10, anchor="w")
+        self.checkbox_em_disco = ctk.CTkCheckBox(self.frame_execucao, text="Consolidar em disco (para máquinas com pouca memória)")
+        self.checkbox_em_disco.pack(pady=5, padx=10, anchor="w")
+        self.checkbox_cache = ctk.CTkCheckBox(self.frame_execucao, text="Usar cache local (baixa só as tabelas que mudaram)")
+        self.checkbox_cache.pack(pady=5, padx=10, anchor="w")
+        self.checkbox_forcar_cache = ctk.CTkCheckBox(self.frame_execucao, text="Forçar atualização do cache")
+        self.checkbox_forcar_cache.pack(pady=5, padx=10, anchor="w")
+        self.checkbox_so_alterados = ctk.CTkCheckBox(self.frame_execucao, text="Reverificar só os bancos alterados desde a última execução")
+        self.checkbox_so_alterados.pack(pady=5, padx=10, anchor="w")
+        self.menu_exportacao = ctk.CTkOptionMenu(self.frame_execucao, values=list(OPCOES_EXPORTACAO_GUI.keys()))
+        self.menu_exportacao.pack(pady=5, padx=10, fill="x")
+        self.entry_limite_linhas = ctk.CTkEntry(self.frame_execucao, placeholder_text="Máx. de linhas por seção no relatório (padrão: sem limite)")
+        self.entry_limite_linhas.pack(pady=5, padx=10, fill="x")
+        self.btn_analisar = ctk.CTkButton(self.frame_execucao, text="Iniciar Análise e Gerar Relatório", command=self.iniciar_analise_thread, state="disabled")
+        self.btn_analisar.pack(pady=10, padx=10)
+        # Progresso da análise (fase atual, linhas por segundo, memória e tempo restante estimado)
+        self.barra_progresso = ctk.CTkProgressBar(self.frame_execucao)
+        self.barra_progresso.set(0)
+        self.barra_progresso.pack(pady=5, padx=10, fill="x")
+        self.label_progresso = ctk.CTkLabel(self.frame_execucao, text="")
+        self.label_progresso.pack(pady=(0, 5), padx=10)
+        self.btn_cancelar = ctk.CTkButton(self.frame_execucao, text="Cancelar Análise", command=self.cancelar_analise, state="disabled")
+        self.btn_cancelar.pack(pady=(0, 10), padx=10)
+        
+        # Rótulo de Status
+        self.status_label = ctk.CTkLabel(self.main_scrollable_frame, text="Aguardando conexão...", wraplength=550)
+        self.status_label.pack(pady=10, padx=10)
+        
+        # Bancos com tabelas do Ponto Offline (dicts de 'descobrir_bancos'), os visíveis com o
+        # filtro atual e os marcados (mantidos ao trocar o filtro)
+        self.bancos_compativeis = []
+        self.bancos_visiveis = []
+        self.bancos_marcados = set()
+        self.instrumentacao = None
+
+    def atualizar_status(self, mensagem):
+        # Atualiza o rótulo de status na GUI de forma segura para threads
+        self.status_label.configure(text=mensagem)
+
+    def desativar_botoes(self):
+        # Desativa os botões para evitar cliques duplos durante a execução
+        self.btn_conectar.configure(state="disabled")
+        self.btn_analisar.configure(state="disabled")
+
+    def ativar_botoes(self):
+        # Reativa os botões após a conclusão da tarefa
+        self.btn_conectar.configure(state="normal")
+        self.btn_analisar.configure(state="normal" if self.bancos_compativeis else "disabled")
+        self.btn_cancelar.configure(state="disabled")
+
+    def atualizar_progresso(self, situacao):
+        # Atualiza a barra e o texto de progresso (chamado na thread da janela via 'after')
+        self.barra_progresso.set(situacao["fracao"])
+        self.label_progresso.configure(text=descrever_progresso(situacao))
+
+    def cancelar_analise(self):
+        # Pede o cancelamento; a análise para no próximo lote e reativa os botões ao terminar
+        if self.instrumentacao is not None:
+            self.instrumentacao.cancelar()
+            self.btn_cancelar.configure(state="disabled")
+            self.atualizar_status("Cancelando a análise...")
+
+    def filtrar_bancos(self):
+        # Redesenha a lista só com os bancos cujo nome contém o texto do filtro
+        filtro = self.entry_filtro_bancos.get().strip().lower()
+        visiveis = [b for b in self.bancos_compativeis if filtro in b["banco"].lower()]
+        self.bancos_visiveis = [b["banco"] for b in visiveis]
+        self.lista_bancos.delete(0, tk.END)
+        for indice, b in enumerate(visiveis):
+            texto = b["banco"] + (f"  (~{b['funcionarios']} funcionários)" if b["funcionarios"] is not None else "")
+            if b["faltando"]:
+                texto += "  [sem: " + ", ".join(b["faltando"]) + "]"
+            self.lista_bancos.insert(tk.END, texto)
+            if b["faltando"]: self.lista_bancos.itemconfigure(indice, fg="gray55")
+            if b["banco"] in self.bancos_marcados: self.lista_bancos.selection_set(indice)
+        self.atualizar_contagem_bancos()
+
+    def registrar_selecao_bancos(self):
+        # Sincroniza os bancos marcados com a seleção da parte visível da lista
+        selecionados = set(self.lista_bancos.curselection())
+        for indice, banco in enumerate(self.bancos_visiveis):
+            if indice in selecionados: self.bancos_marcados.add(banco)
+            else: self.bancos_marcados.discard(banco)
+        self.atualizar_contagem_bancos()
+
+    def selecionar_filtrados(self):
+        self.bancos_marcados.update(self.bancos_visiveis)
+        self.lista_bancos.selection_set(0, tk.END)
+        self.atualizar_contagem_bancos()
+
+    def limpar_selecao_bancos(self):
+        self.bancos_marcados.clear()
+        self.lista_bancos.selection_clear(0, tk.END)
+        self.atualizar_contagem_bancos()
+
+    def atualizar_contagem_bancos(self):
+        parciais = sum(bool(b["faltando"]) for b in self.bancos_compativeis)
+        self.label_bancos.configure(text=f"{len(self.bancos_visiveis)} de {len(self.bancos_compativeis)} bancos ({parciais} parcialmente compatíveis) | {len(self.bancos_marcados)} selecionado(s)")
+
+    def exibir_bancos_descobertos(self, descobertos):
+        # Preenche a lista com os bancos do Ponto Offline (chamado na thread da janela via 'after').
+        # Um banco só entra se tiver pelo menos a tabela de funcionários: nomes genéricos como
+        # 'empresas' ou 'funcoes' sozinhos aparecem em bancos de outros sistemas.
+        self.bancos_compativeis = [b for b in descobertos if b["tabelas"] and "funcionarios" in b["tabelas"]]
+        self.bancos_marcados.clear()
+        self.filtrar_bancos()
+        inacessiveis = sum(b["tabelas"] is None for b in descobertos)
+        completos = sum(b["compativel"] for b in descobertos)
+        self.atualizar_status(f"Conectado com sucesso. {completos} de {len(descobertos)} bancos têm todas as tabelas do Ponto Offline"
+                              + f" e {len(self.bancos_compativeis) - completos} têm só parte delas"
+                              + (f" ({inacessiveis} não puderam ser consultados)" if inacessiveis else "") + ". Selecione os bancos para análise.")
+
+    def iniciar_conexao_thread(self):
+        # Inicia a conexão em uma nova thread
+        self.desativar_botoes()
+        self.atualizar_status("Conectando ao servidor...")
+        thread = threading.Thread(target=self.conectar_e_listar_bancos)
+        thread.start()
+        
+    def conectar_e_listar_bancos(self):
+        """Função que se conecta e lista os bancos em uma thread separada."""
+        servidor, usuario, senha = self.entry_servidor.get(), self.entry_usuario.get(), self.entry_senha.get()
+        if not servidor or not usuario:
+            self.after(0, lambda: self.atualizar_status("Erro: Servidor e Usuário são campos obrigatórios."))
+            self.after(0, self.ativar_botoes)
+            return
+        try:
+            fabrica = FabricaConexaoSQLServer(usuario, senha, timeout=5)
+            # Lista os bancos e sonda, em lotes paralelos, quais têm as tabelas do Ponto Offline
+            with GerenciadorConexoes(servidor, fabrica, max_conexoes=MAX_EXTRACOES_SIMULTANEAS) as gerenciador:
+                descobertos = descobrir_bancos(gerenciador)
+            self.after(0, lambda: self.exibir_bancos_descobertos(descobertos))
+        except Exception as e:
+            self.after(0, lambda e=e: self.atualizar_status(f"Falha na conexão: {e}"))
+        finally:
+            self.after(0, self.ativar_botoes)
+
+    def iniciar_analise_thread(self):
+        # Inicia a análise em uma nova thread
+        bancos_selecionados = [b["banco"] for b in self.bancos_compativeis if b["banco"] in self.bancos_marcados]
+        if not bancos_selecionados or len(bancos_selecionados) < 2:
+            self.atualizar_status("Erro: Selecione pelo menos dois bancos de dados para comparar.")
+            return
+        # Lê o número de extrações simultâneas (vazio usa o padrão)
+        paralelismo = self.entry_paralelismo.get().strip()
+        if paralelismo and (not paralelismo.isdigit() or int(paralelismo) < 1):
+            self.atualizar_status("Erro: O número de extrações simultâneas deve ser um inteiro maior que zero.")
+            return
+        max_workers = int(paralelismo) if paralelismo else MAX_EXTRACOES_SIMULTANEAS
+        # Lê o limite de linhas por seção (vazio escreve todas)
+        limite_linhas = self.entry_limite_linhas.get().strip()
+        if limite_linhas and (not limite_linhas.isdigit() or int(limite_linhas) < 1):
+            self.atualizar_status("Erro: O limite de linhas por seção deve ser um inteiro maior que zero.")
+            return
+        verificacoes = [identificador for identificador, checkbox in self.checkboxes_verificacoes if checkbox.get() == 1]
+        if not verificacoes:
+            self.atualizar_status("Erro: Selecione pelo menos uma verificação.")
+            return
+        # Bancos parcialmente compatíveis só servem se as verificações escolhidas não usarem as tabelas que faltam
+        tabelas_usadas = colunas_necessarias(verificacoes).keys()
+        sem_tabelas = [f"{b['banco']} ({', '.join(t for t in b['faltando'] if t in tabelas_usadas)})" for b in self.bancos_compativeis
+                       if b["banco"] in self.bancos_marcados and any(t in tabelas_usadas for t in b["faltando"])]
+        if sem_tabelas:
+            self.atualizar_status("Erro: As verificações selecionadas usam tabelas que estes bancos não têm: " + "; ".join(sem_tabelas)
+                                  + ". Desmarque esses bancos ou as verificações dessas tabelas.")
+            return
+        self.desativar_botoes()
+        self.atualizar_status("Iniciando análise. Isso pode levar alguns minutos...")
+        self.barra_progresso.set(0)
+        self.label_progresso.configure(text="")
+        self.instrumentacao = Instrumentacao(ao_progredir=lambda situacao: self.after(0, lambda situacao=situacao: self.atualizar_progresso(situacao)))
+        self.btn_cancelar.configure(state="normal")
+        conexao_info = {"servidor": self.entry_servidor.get(), "usuario": self.entry_usuario.get(), "senha": self.entry_senha.get()}
+        thread = threading.Thread(target=executar_analise_completa, args=(conexao_info, bancos_selecionados, lambda msg: self.after(0, lambda msg=msg: self.atualizar_status(msg)), self, max_workers),
+                                  kwargs={"modo_pushdown": self.checkbox_pushdown.get() == 1,
+                                          "modo_incremental": self.checkbox_incremental.get() == 1,
+                                          "modo_em_disco": self.checkbox_em_disco.get() == 1,
+                                          "usar_cache": self.checkbox_cache.get() == 1,
+                                          "forcar_atualizacao_cache": self.checkbox_forcar_cache.get() == 1,
+                                          "reverificar_alterados": self.checkbox_so_alterados.get() == 1,
+                                          "formato_exportacao": OPCOES_EXPORTACAO_GUI[self.menu_exportacao.get()],
+                                          "limite_linhas_secao": int(limite_linhas) if limite_linhas else None,
+                                          "verificacoes": verificacoes,
+                                          "instrumentacao": self.instrumentacao})
+        thread.start()
@@ -2,19 +2,35 @@
 
 # Seção de Importação de Bibliotecas
 # Importamos as bibliotecas necessárias para a aplicação.
-# customtkinter: Para criar a interface gráfica com um visual moderno.
-# pyodbc: Permite a conexão com bancos de dados ODBC, como o SQL Server.
+# A interface gráfica (customtkinter) fica no analise_app.py e o pyodbc só é importado ao abrir
+# a primeira conexão; assim a linha de comando não depende de nenhum dos dois para iniciar.
 # pandas: Uma biblioteca poderosa para manipulação e análise de dados tabulares (DataFrames).
+# numpy: Base numérica do pandas, usada para montar colunas compactas sem cópias extras.
 # datetime: Para obter a data e hora atual ao gerar o relatório.
-# threading: Para executar tarefas de longa duração (como a análise de dados) em segundo plano,
-#             evitando que a interface do usuário (GUI) congele.
-# os: Para interagir com o sistema operacional, como criar pastas.
-import customtkinter as ctk
-import pyodbc
+# threading: Para proteger as estruturas compartilhadas entre as threads de extração.
+# concurrent.futures: Para extrair vários bancos e tabelas ao mesmo tempo com um número limitado de threads.
+# contextlib: Para criar o gerenciador de contexto que empresta conexões do pool e abrir um grupo de threads por servidor.
+# hashlib, json, time: Para nomear, indexar e controlar a idade dos arquivos do cache local.
+# re, unicodedata: Para montar nomes de arquivo simples a partir dos títulos das seções.
+# os, sys, argparse: Para criar pastas, escrever no stderr e ler os argumentos da linha de comando.
+# signal: Para que o Ctrl+C na linha de comando cancele a análise de forma ordenada.
+# sqlite3: Banco embutido usado pela consolidação em disco (modo para máquinas com pouca memória).
 import pandas as pd
-from datetime import datetime
+import numpy as np
+from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, ExitStack
+import hashlib
+import json
+import time
 import threading
+import re
+import sqlite3
+import unicodedata
 import os
+import sys
+import signal
+import argparse
 
 # Configuração Global das Tabelas
 # Este dicionário mapeia um nome lógico para cada tabela do banco de dados,
@@ -30,153 +46,2588 @@ CONFIG_TABELAS = {
     "departamentos": {"tabela": "departamentos", "colunas": ["id", "descricao"]}
 }
 
-def gerar_relatorio_txt(titulo, df, colunas_relatorio, arquivo_handle):
+# Tipos esperados das colunas extraídas. Cada lote lido do banco é convertido diretamente
+# para um tipo compacto do pandas: "inteiro" -> Int64, "data" -> datetime64, "texto" -> string.
+# Se os valores recebidos não forem do tipo esperado (ex: datas gravadas como texto),
+# a coluna é mantida como veio, para que as validações possam apontar o valor original.
+TIPOS_COLUNAS = {
+    "id": "inteiro", "funcionario_id": "inteiro", "numero": "inteiro", "dia_semana": "inteiro", "codigo": "inteiro",
+    "admissao": "data", "demissao": "data", "nascimento": "data", "expedicao": "data",
+    "data_inicio": "data", "data_fim": "data",
+    "cnpj": "texto", "serial_rep": "texto", "cpf": "texto", "n_pis": "texto", "n_folha": "texto", "n_identificador": "texto",
+}
+
+# Quantidade de linhas buscadas por ida ao servidor (cursor.fetchmany / cursor.arraysize).
+TAMANHO_LOTE = 5000
+
+# Cache local de extrações: pasta (dentro da pasta de resultados) e tamanho máximo em disco.
+# Quando o limite é ultrapassado, as tabelas usadas há mais tempo são removidas primeiro (LRU).
+PASTA_CACHE = "cache_extracao"
+TAMANHO_MAXIMO_CACHE = 2 * 1024 ** 3  # 2 GB
+
+# Número padrão de extrações (banco x tabela) executadas em paralelo.
+# Cada extração passa quase todo o tempo esperando o SQL Server, então algumas threads
+# simultâneas reduzem bastante o tempo total sem sobrecarregar o servidor.
+MAX_EXTRACOES_SIMULTANEAS = 4
+
+# Descoberta de bancos: quantos bancos entram em cada consulta de sondagem (as consultas rodam
+# em paralelo, limitadas pelo pool de sessões) e os bancos de sistema, que nunca são sondados.
+BANCOS_POR_SONDAGEM = 200
+BANCOS_SISTEMA = ("master", "model", "msdb", "tempdb")
+
+# Pasta padrão onde o relatório (e o cache e as seções exportadas) é gravado.
+PASTA_RESULTADOS = "Resultados_Analise"
+
+# Escrita do relatório: as tabelas são formatadas em blocos deste tamanho e gravadas direto no
+# arquivo, sem montar a seção inteira em memória. As seções também podem ser exportadas para
+# arquivos legíveis por máquina (com todas as linhas) na pasta PASTA_SECOES.
+TAMANHO_BLOCO_RELATORIO = 10000
+PASTA_SECOES = "secoes"
+FORMATOS_EXPORTACAO = ("csv", "jsonl", "parquet")
+OPCOES_EXPORTACAO_GUI = {"Não exportar as seções": None, "Exportar seções em CSV": "csv", "Exportar seções em JSONL": "jsonl", "Exportar seções em Parquet": "parquet"}
+
+# Consolidação em disco: arquivo SQLite (dentro da pasta de resultados) que recebe as colunas
+# usadas pelas verificações entre bancos. É apagado ao final da análise.
+ARQUIVO_CONSOLIDACAO = "consolidacao.sqlite"
+
+# Histórico entre execuções (dentro da pasta de resultados): o índice das inconsistências da
+# última execução, usado para apontar o que é novo e o que foi resolvido; o relatório anterior,
+# preservado ao gerar um novo; e os índices por banco usados para reverificar só os bancos alterados.
+ARQUIVO_ACHADOS = "achados.json"
+ARQUIVO_RELATORIO_ANTERIOR = "relatorio_analise_anterior.txt"
+PASTA_INDICES_BANCOS = "indices_bancos"
+
+# Rastro da execução (tempo, linhas, bytes e memória de cada extração e verificação), gravado
+# na pasta de resultados, e intervalo mínimo (em segundos) entre avisos de progresso à interface.
+ARQUIVO_TRACE = "trace_execucao.json"
+INTERVALO_PROGRESSO = 0.5
+
+# CNPJ da empresa de teste, que existe em todos os bancos e é ignorada nas verificações.
+CNPJ_EMPRESA_TESTE = "00.000.000/0000-00"
+
+# Verificações de duplicidade entre bancos, na ordem em que aparecem no relatório.
+# Cada item: (título, tabela lógica, colunas-chave, colunas do relatório, ignorar chave nula).
+# A mesma lista é usada pela análise local (pandas) e pelo modo pushdown (consultas no servidor).
+VERIFICACOES_DUPLICIDADE = [
+    ("Empresas com mesmo CNPJ e Razão Social", "empresas", ['cnpj', 'nome'], ['cnpj', 'nome', 'origem_db'], False),
+    ("Funções com mesma Descrição", "funcoes", ['descricao'], ['descricao', 'id', 'origem_db'], False),
+    ("Departamentos com mesma Descrição", "departamentos", ['descricao'], ['descricao', 'id', 'origem_db'], False),
+    ("Equipamentos com mesmo 'codigo'", "equipamentos", ['codigo'], ['codigo', 'descricao', 'origem_db'], True),
+    ("Equipamentos com mesma 'descricao'", "equipamentos", ['descricao'], ['descricao', 'codigo', 'origem_db'], True),
+    ("Equipamentos com mesmo 'serial_rep'", "equipamentos", ['serial_rep'], ['serial_rep', 'descricao', 'origem_db'], True),
+] + [
+    (f"Funcionários com mesmo {col_doc.upper()}", "funcionarios", [col_doc], [col_doc, 'id', 'nome', 'origem_db'], True)
+    for col_doc in ['cpf', 'n_pis', 'n_folha', 'n_identificador']
+]
+
+# Colunas de data dos funcionários, formatos aceitos (na ordem em que são tentados) e
+# intervalo válido. "ISO8601" cobre 'AAAA-MM-DD', 'AAAA-MM-DD HH:MM:SS[.fff]' e datas que
+# já chegam do banco como datetime.
+COLUNAS_DATA_FUNCIONARIOS = ['admissao', 'demissao', 'nascimento', 'expedicao']
+FORMATOS_DATA = ["ISO8601", "%d/%m/%Y", "%d/%m/%Y %H:%M:%S"]
+DATA_MINIMA, DATA_MAXIMA = pd.Timestamp('1900-01-01'), pd.Timestamp('2079-12-31')
+
+# Registro de todas as verificações do relatório, na ordem em que aparecem. Cada verificação
+# declara as colunas de que precisa em cada tabela; a extração busca só a união das colunas das
+# verificações escolhidas (mais as do sumário) e pula as tabelas que nenhuma delas usa.
+# Cada item: identificador -> {"titulo": título no relatório, "colunas": {tabela lógica: [colunas]}}.
+REGISTRO_VERIFICACOES = {
+    "horarios": {"titulo": "Horários com mesmo Nome para Códigos (numero) Diferentes", "colunas": {"horarios": ["numero", "nome", "dia_semana"]}},
+    **{
+        f"{nome_logico}_{'_'.join(colunas_chave)}": {"titulo": titulo, "colunas": {nome_logico: [c for c in dict.fromkeys(colunas_chave + colunas_relatorio) if c != 'origem_db']}}
+        for titulo, nome_logico, colunas_chave, colunas_relatorio, _ in VERIFICACOES_DUPLICIDADE
+    },
+    "datas_funcionarios": {"titulo": "Funcionários com Inconsistências de Datas", "colunas": {"funcionarios": ["id", "nome"] + COLUNAS_DATA_FUNCIONARIOS}},
+    "afastamentos": {"titulo": "Afastamentos Sobrepostos", "colunas": {"afastamentos": ["funcionario_id", "data_inicio", "data_fim"], "funcionarios": ["id", "nome"]}},
+}
+# Identificador de cada verificação de duplicidade, pelo título
+IDS_DUPLICIDADE = {dados["titulo"]: identificador for identificador, dados in REGISTRO_VERIFICACOES.items() if identificador not in ("horarios", "datas_funcionarios", "afastamentos")}
+
+# Colunas usadas pelo sumário quantitativo sempre que a tabela é extraída
+# (demitidos entre os funcionários e quantidade de horários distintos).
+COLUNAS_SUMARIO = {"funcionarios": ["demissao"], "horarios": ["numero"]}
+
+# Driver ODBC preferido. Se não estiver instalado, o "ODBC Driver NN for SQL Server" mais novo
+# da máquina é usado; cada entrada do config.json também pode informar o seu 'driver'.
+DRIVER_ODBC_PADRAO = "ODBC Driver 17 for SQL Server"
+
+# Tabelas que continuam sendo extraídas no modo pushdown, porque as verificações de
+# horários, datas e afastamentos ainda são feitas localmente.
+TABELAS_ANALISE_LOCAL = ["horarios", "funcionarios", "afastamentos"]
+
+class ErroExtracao(Exception):
+    """Falha ao extrair uma tabela de um banco. Guarda o banco e a tabela para o relatório."""
+    def __init__(self, nome_db, tabela, detalhe):
+        super().__init__(f"Falha ao ler '{tabela}' do banco '{nome_db}'. Detalhe: {detalhe}")
+        self.nome_db = nome_db
+        self.tabela = tabela
+        self.detalhe = str(detalhe)
+
+class AnaliseCancelada(Exception):
+    """A análise foi interrompida a pedido do usuário (ver Instrumentacao.cancelar)."""
+
+def montar_conn_str(servidor, usuario, senha, banco, driver=DRIVER_ODBC_PADRAO):
+    """Monta a string de conexão ODBC para um banco do SQL Server."""
+    conn_str = f"DRIVER={{{driver}}};SERVER={servidor};DATABASE={banco};UID={usuario};PWD={senha};"
+    # A partir do driver 18 a criptografia é obrigatória por padrão; aceita o certificado do
+    # servidor (normalmente autoassinado) para manter o comportamento do driver 17
+    if (_versao_driver_odbc(driver) or 0) >= 18:
+        conn_str += "TrustServerCertificate=yes;"
+    return conn_str
+
+def _versao_driver_odbc(nome):
+    """Versão de um driver 'ODBC Driver NN for SQL Server' (None para outros drivers)."""
+    encontrado = re.fullmatch(r"ODBC Driver (\d+) for SQL Server", nome)
+    return int(encontrado.group(1)) if encontrado else None
+
+def detectar_driver_odbc(drivers_instalados):
+    """
+    Escolhe o driver ODBC do SQL Server: DRIVER_ODBC_PADRAO se estiver instalado; senão, o
+    'ODBC Driver NN for SQL Server' de versão mais alta (ou DRIVER_ODBC_PADRAO, se não houver nenhum).
+    """
+    if DRIVER_ODBC_PADRAO in drivers_instalados: return DRIVER_ODBC_PADRAO
+    versoes = [(_versao_driver_odbc(nome), nome) for nome in drivers_instalados if _versao_driver_odbc(nome)]
+    return max(versoes)[1] if versoes else DRIVER_ODBC_PADRAO
+
+def citar_identificador(nome):
+    """Coloca um nome de banco/tabela entre colchetes, escapando ']' como no T-SQL."""
+    return "[" + str(nome).replace("]", "]]") + "]"
+
+# Seção de Seleção de Verificações
+# O usuário pode rodar só parte das verificações (ex: apenas CPFs). A partir da escolha são
+# calculadas as tabelas e colunas a extrair, usando as declarações de REGISTRO_VERIFICACOES.
+
+def resolver_verificacoes(identificadores=None):
+    """
+    Valida os identificadores escolhidos e os coloca na ordem do relatório.
+
+    Parâmetros:
+    - identificadores (list, opcional): Chaves de REGISTRO_VERIFICACOES (None para todas).
+
+    Retorna:
+    - list: Os identificadores, sem repetições, na ordem de REGISTRO_VERIFICACOES.
+
+    Lança:
+    - ValueError: Se algum identificador não existir ou se nenhum for escolhido.
+    """
+    if identificadores is None: return list(REGISTRO_VERIFICACOES)
+    desconhecidos = [i for i in identificadores if i not in REGISTRO_VERIFICACOES]
+    if desconhecidos:
+        raise ValueError(f"Verificação desconhecida: {', '.join(desconhecidos)}. Opções: {', '.join(REGISTRO_VERIFICACOES)}.")
+    escolhidos = [i for i in REGISTRO_VERIFICACOES if i in identificadores]
+    if not escolhidos: raise ValueError("Escolha pelo menos uma verificação.")
+    return escolhidos
+
+def filtrar_duplicidades(verificacoes):
+    """Itens de VERIFICACOES_DUPLICIDADE escolhidos em 'verificacoes' (identificadores)."""
+    return [v for v in VERIFICACOES_DUPLICIDADE if IDS_DUPLICIDADE[v[0]] in verificacoes]
+
+def colunas_necessarias(verificacoes, sem_duplicidades=False):
+    """
+    Calcula as tabelas e colunas que as verificações escolhidas precisam extrair.
+
+    Parâmetros:
+    - verificacoes (list): Identificadores de REGISTRO_VERIFICACOES.
+    - sem_duplicidades (bool): Se True (modo pushdown), as colunas das verificações de
+      duplicidade não são pedidas, mas as suas tabelas continuam na lista (para o sumário).
+
+    Retorna:
+    - dict: Tabela lógica -> colunas, na ordem de CONFIG_TABELAS; tabelas que nenhuma
+      verificação usa ficam de fora.
+    """
+    necessarias = {}
+    for identificador in verificacoes:
+        duplicidade = identificador in IDS_DUPLICIDADE.values()
+        for nome_logico, colunas in REGISTRO_VERIFICACOES[identificador]["colunas"].items():
+            escolhidas = necessarias.setdefault(nome_logico, set(COLUNAS_SUMARIO.get(nome_logico, [])))
+            if not (sem_duplicidades and duplicidade): escolhidas.update(colunas)
+    return {
+        nome_logico: [c for c in cfg["colunas"] if c in necessarias[nome_logico]]
+        for nome_logico, cfg in CONFIG_TABELAS.items() if nome_logico in necessarias
+    }
+
+# Seção de Instrumentação
+# Cada etapa da análise (extração de uma tabela de um banco, incorporação, verificação, escrita
+# do relatório) é medida: tempo, linhas, bytes aproximados e memória do processo ao final. As
+# medições vão para o rastro em JSON e para o apêndice de tempos do relatório. A mesma classe
+# acompanha o progresso (com estimativa do tempo restante) e o pedido de cancelamento, que as
+# threads consultam entre um lote e outro.
+
+def memoria_processo_mb():
+    """
+    Retorna a memória do processo em MB como (atual, pico), ou (None, None) se o sistema não
+    informar. No Windows usa a API do psapi; no Linux, o /proc; nos demais, o 'resource' (só o pico).
+    """
+    try:
+        if sys.platform == "win32":
+            # ctypes só é carregado no Windows, quando a memória é consultada pela primeira vez
+            import ctypes
+            from ctypes import wintypes
+
+            class ContadoresMemoria(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+            contadores = ContadoresMemoria()
+            contadores.cb = ctypes.sizeof(contadores)
+            processo = ctypes.windll.kernel32.GetCurrentProcess()
+            if not ctypes.windll.psapi.GetProcessMemoryInfo(processo, ctypes.byref(contadores), contadores.cb): return None, None
+            return contadores.WorkingSetSize / 2**20, contadores.PeakWorkingSetSize / 2**20
+        if os.path.exists("/proc/self/status"):
+            valores = {}
+            with open("/proc/self/status", 'r') as f:
+                for linha in f:
+                    if linha.startswith(("VmRSS:", "VmHWM:")):
+                        nome, quantidade = linha.split()[:2]
+                        valores[nome] = int(quantidade) / 1024
+            return valores.get("VmRSS:"), valores.get("VmHWM:")
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # No macOS o valor vem em bytes; nos outros sistemas, em KB
+        return None, pico / (2**20 if sys.platform == "darwin" else 1024)
+    except Exception:
+        return None, None
+
+class Instrumentacao:
+    """
+    Medições, progresso e cancelamento de uma execução da análise.
+
+    É compartilhada entre a thread da análise e as threads de extração (os registros são
+    protegidos por um lock). A interface cria uma instância, passa para executar_analise_completa
+    e pode chamar 'cancelar' a qualquer momento; as etapas seguintes lançam AnaliseCancelada.
+
+    Uso:
+        with instrumentacao.medir("extracao", banco=nome_db, tabela=nome_logico) as registro:
+            ...
+            registro["linhas"] = buffer.linhas
+    """
+    def __init__(self, ao_progredir=None):
+        """
+        Parâmetros:
+        - ao_progredir (function, opcional): Recebe o dicionário de 'situacao' a cada avanço
+          (no máximo a cada INTERVALO_PROGRESSO segundos, além do início e do fim de cada fase).
+        """
+        self.ao_progredir = ao_progredir
+        self.registros = []
+        self.inicio = time.perf_counter()
+        self.iniciada_em = datetime.now()
+        self._lock = threading.Lock()
+        self._cancelamento = threading.Event()
+        self._fase = None
+        self._total = self._concluidas = self._linhas = 0
+        self._inicio_fase = self._ultimo_aviso = self.inicio
+
+    # Cancelamento
+    def cancelar(self):
+        """Pede a interrupção da análise (pode ser chamado de qualquer thread)."""
+        self._cancelamento.set()
+
+    @property
+    def cancelada(self):
+        return self._cancelamento.is_set()
+
+    def verificar_cancelamento(self):
+        """Lança AnaliseCancelada se o cancelamento foi pedido."""
+        if self._cancelamento.is_set(): raise AnaliseCancelada("Análise cancelada pelo usuário.")
+
+    # Medições
+    @contextmanager
+    def medir(self, etapa, cancelavel=True, **campos):
+        """
+        Mede um trecho da análise. O registro entregue pode receber 'linhas' e 'bytes' (e outros
+        campos); tempo e memória são preenchidos ao final, mesmo se o trecho falhar.
+
+        Parâmetros:
+        - etapa (str): Nome da etapa no rastro (ex: 'extracao', 'verificacao').
+        - cancelavel (bool): Se False, o trecho começa mesmo com o cancelamento pedido (usado
+          em trechos que não podem ser interrompidos, como a escrita do relatório).
+
+        Lança:
+        - AnaliseCancelada: Se 'cancelavel' e o cancelamento foi pedido antes do início do trecho.
+        """
+        if cancelavel: self.verificar_cancelamento()
+        registro = {"etapa": etapa, **campos, "linhas": None, "bytes": None}
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        except BaseException as e:
+            registro["erro"] = type(e).__name__
+            raise
+        finally:
+            registro["inicio_s"] = round(inicio - self.inicio, 4)
+            registro["segundos"] = round(time.perf_counter() - inicio, 4)
+            registro["memoria_mb"] = memoria_processo_mb()[0]
+            with self._lock:
+                self.registros.append(registro)
+
+    def registros_da_etapa(self, etapa):
+        with self._lock:
+            return [r for r in self.registros if r["etapa"] == etapa]
+
+    # Progresso
+    def iniciar_fase(self, nome, total):
+        """Começa uma fase com 'total' passos (ex: as extrações), zerando o progresso e a estimativa."""
+        with self._lock:
+            self._fase, self._total, self._concluidas, self._linhas = nome, total, 0, 0
+            self._inicio_fase = time.perf_counter()
+        self._avisar(forcar=True)
+
+    def avancar(self, linhas=0):
+        """Conta um passo concluído da fase atual (e as linhas que ele trouxe)."""
+        with self._lock:
+            self._concluidas += 1
+            self._linhas += linhas or 0
+            terminou = self._concluidas >= self._total
+        self._avisar(forcar=terminou)
+
+    def situacao(self):
+        """
+        Retorna:
+        - dict: fase, concluidas, total, fracao (0 a 1), restante_s (estimativa, ou None),
+          linhas_por_s, memoria_mb e decorrido_s.
+        """
+        agora = time.perf_counter()
+        with self._lock:
+            fase, total, concluidas, linhas = self._fase, self._total, self._concluidas, self._linhas
+            decorrido_fase = agora - self._inicio_fase
+        # A estimativa supõe que os passos restantes levam, em média, o mesmo que os concluídos
+        restante = decorrido_fase / concluidas * (total - concluidas) if concluidas and total else None
+        return {
+            "fase": fase, "concluidas": concluidas, "total": total,
+            "fracao": concluidas / total if total else 0.0,
+            "restante_s": restante,
+            "linhas_por_s": linhas / decorrido_fase if decorrido_fase > 0 else 0.0,
+            "memoria_mb": memoria_processo_mb()[0],
+            "decorrido_s": agora - self.inicio,
+        }
+
+    def _avisar(self, forcar=False):
+        if self.ao_progredir is None: return
+        agora = time.perf_counter()
+        if not forcar and agora - self._ultimo_aviso < INTERVALO_PROGRESSO: return
+        self._ultimo_aviso = agora
+        self.ao_progredir(self.situacao())
+
+    # Saídas
+    def gravar_trace(self, caminho, **contexto):
+        """Grava o rastro da execução em JSON ('contexto' entra no cabeçalho, ex: modo e bancos)."""
+        _, pico = memoria_processo_mb()
+        with self._lock:
+            registros = list(self.registros)
+        dados = {
+            "iniciada_em": self.iniciada_em.isoformat(timespec="seconds"),
+            "duracao_s": round(time.perf_counter() - self.inicio, 3),
+            "memoria_pico_mb": pico,
+            **contexto,
+            "etapas": registros,
+        }
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False, indent=1, default=str)
+
+    def escrever_apendice(self, arquivo_handle, limite_linhas=None, caminho_trace=None):
+        """
+        Escreve no relatório o apêndice de tempos: o total de cada etapa, as extrações (das mais
+        lentas para as mais rápidas, com linhas por segundo) e as verificações.
+        """
+        with self._lock:
+            registros = pd.DataFrame(self.registros)
+        arquivo_handle.write("\n\n" + "=" * 80 + "\nAPÊNDICE: TEMPOS DE EXECUÇÃO\n" + "=" * 80 + "\n")
+        pico = memoria_processo_mb()[1]
+        arquivo_handle.write(f"Duração total: {time.perf_counter() - self.inicio:.1f} s" + (f" | Pico de memória do processo: {pico:.0f} MB" if pico else "") + "\n\n")
+        if registros.empty: return
+        resumo = registros.groupby('etapa', sort=False).agg(passos=('segundos', 'size'), segundos=('segundos', 'sum'), linhas=('linhas', 'sum'))
+        escrever_tabela(resumo.reset_index().round({'segundos': 2}), arquivo_handle)
+        arquivo_handle.write("\n\n")
+
+        extracoes = registros[registros['etapa'] == 'extracao']
+        if not extracoes.empty:
+            extracoes = extracoes.sort_values('segundos', ascending=False, kind='stable')
+            tabela = pd.DataFrame({
+                'banco': extracoes['banco'], 'tabela': extracoes['tabela'], 'origem': extracoes.get('origem'),
+                'linhas': extracoes['linhas'].fillna(0).astype('int64'),
+                'mb': (extracoes['bytes'].fillna(0) / 2**20).round(2),
+                'segundos': extracoes['segundos'].round(2),
+                'linhas_por_s': (extracoes['linhas'].fillna(0) / extracoes['segundos'].clip(lower=1e-6)).round(0).astype('int64'),
+            })
+            escritas = min(len(tabela), limite_linhas) if limite_linhas else len(tabela)
+            escrever_tabela(tabela.iloc[:escritas], arquivo_handle)
+            if escritas < len(tabela): _escrever_aviso_limite(arquivo_handle, len(tabela), escritas, caminho_trace)
+            arquivo_handle.write("\n\n")
+
+        verificacoes = registros[registros['etapa'] == 'verificacao']
+        if not verificacoes.empty:
+            tabela = pd.DataFrame({
+                'verificacao': verificacoes['verificacao'],
+                'linhas': verificacoes['linhas'].fillna(0).astype('int64'),
+                'segundos': verificacoes['segundos'].round(3),
+                'memoria_mb': verificacoes['memoria_mb'].round(0),
+            })
+            escrever_tabela(tabela, arquivo_handle)
+
+def descrever_progresso(situacao):
+    """Texto curto do progresso para a interface (ex: 'Extração: 12/40 | 35.120 linhas/s | restam ~2 min')."""
+    partes = [f"{situacao['fase']}: {situacao['concluidas']}/{situacao['total']}"]
+    if situacao["linhas_por_s"] >= 1: partes.append(f"{situacao['linhas_por_s']:,.0f} linhas/s".replace(",", "."))
+    if situacao["memoria_mb"]: partes.append(f"{situacao['memoria_mb']:.0f} MB")
+    restante = situacao["restante_s"]
+    if restante is not None and situacao["concluidas"] < situacao["total"]:
+        partes.append(f"restam ~{restante:.0f} s" if restante < 90 else f"restam ~{restante / 60:.0f} min")
+    return " | ".join(partes)
+
+# Seção de Gerenciamento de Conexões
+# Abrir uma conexão nova para cada tabela de cada banco significa um login (e um handshake TLS)
+# por leitura. As classes abaixo mantêm um pequeno pool de sessões por servidor, que são
+# reaproveitadas entre tabelas e, com 'USE', até entre bancos diferentes.
+
+class FabricaConexaoSQLServer:
+    """
+    Fábrica padrão de conexões: abre sessões pyodbc com o SQL Server.
+
+    Qualquer objeto chamável com a assinatura 'fabrica(servidor, banco)' que devolva uma
+    conexão DB-API pode substituí-la (por exemplo, um SQLite local em testes e benchmarks).
+    Se a fábrica também tiver um método 'trocar_banco(conexao, banco)', as sessões ociosas
+    são reaproveitadas para outros bancos; caso contrário, uma nova sessão é aberta.
+    Sem 'driver', o driver é escolhido por 'detectar_driver_odbc' na primeira conexão.
+    """
+    def __init__(self, usuario, senha, timeout=10, driver=None):
+        self.usuario = usuario
+        self.senha = senha
+        self.timeout = timeout
+        self.driver = driver
+
+    def __call__(self, servidor, banco):
+        # Importado só aqui: quem usa outra fábrica (ex: SQLite nos benchmarks) não precisa do pyodbc
+        import pyodbc
+        if self.driver is None:
+            self.driver = detectar_driver_odbc(pyodbc.drivers())
+        conn_str = montar_conn_str(servidor, self.usuario, self.senha, banco, self.driver)
+        # autocommit evita que a sessão fique com uma transação implícita aberta entre as leituras
+        return pyodbc.connect(conn_str, timeout=self.timeout, autocommit=True)
+
+    def trocar_banco(self, conexao, banco):
+        # Muda o banco atual da sessão sem precisar de um novo login
+        cursor = conexao.cursor()
+        try:
+            cursor.execute(f"USE {citar_identificador(banco)};")
+        finally:
+            cursor.close()
+        return True
+
+class GerenciadorConexoes:
+    """
+    Pool de conexões para um servidor, limitado a 'max_conexoes' sessões em uso ao mesmo tempo.
+
+    Uso:
+        with GerenciadorConexoes(servidor, fabrica) as gerenciador:
+            with gerenciador.conexao("Banco_1") as conn:
+                ...
+    Ao sair do bloco externo todas as sessões abertas são fechadas.
+    """
+    def __init__(self, servidor, fabrica, max_conexoes=MAX_EXTRACOES_SIMULTANEAS):
+        self.servidor = servidor
+        self.fabrica = fabrica
+        self.max_conexoes = max(1, int(max_conexoes))
+        self._limite = threading.BoundedSemaphore(self.max_conexoes)
+        self._lock = threading.Lock()
+        self._ociosas = []  # Lista de (banco_atual, conexao) prontas para reaproveitar
+        self._fechado = False
+
+    def _obter(self, banco):
+        with self._lock:
+            # 1º: uma sessão ociosa que já está no banco desejado
+            for i, (banco_atual, conn) in enumerate(self._ociosas):
+                if banco_atual == banco:
+                    del self._ociosas[i]
+                    return conn
+            # 2º: qualquer sessão ociosa, se a fábrica souber trocar de banco
+            candidata = self._ociosas.pop() if self._ociosas else None
+        trocar_banco = getattr(self.fabrica, "trocar_banco", None)
+        if candidata is not None:
+            _, conn = candidata
+            try:
+                if trocar_banco is not None and trocar_banco(conn, banco):
+                    return conn
+            except Exception:
+                pass
+            self._fechar_conexao(conn)
+        # 3º: abre uma sessão nova
+        return self.fabrica(self.servidor, banco)
+
+    @contextmanager
+    def conexao(self, banco):
+        """Empresta uma sessão posicionada em 'banco' e a devolve ao pool ao final do bloco."""
+        self._limite.acquire()
+        conn = None
+        try:
+            conn = self._obter(banco)
+            yield conn
+        except Exception:
+            # Uma sessão que falhou pode estar em estado inválido: é descartada em vez de devolvida
+            if conn is not None: self._fechar_conexao(conn)
+            conn = None
+            raise
+        finally:
+            if conn is not None:
+                with self._lock:
+                    devolver = not self._fechado
+                    if devolver: self._ociosas.append((banco, conn))
+                if not devolver: self._fechar_conexao(conn)
+            self._limite.release()
+
+    @staticmethod
+    def _fechar_conexao(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def fechar(self):
+        """Fecha todas as sessões ociosas; as que estiverem em uso são fechadas ao serem devolvidas."""
+        with self._lock:
+            self._fechado = True
+            ociosas, self._ociosas = self._ociosas, []
+        for _, conn in ociosas:
+            self._fechar_conexao(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+        return False
+
+def montar_alvos(conexao_info, bancos_selecionados):
+    """
+    Descreve onde cada banco da análise está: servidor, nome do banco e credenciais.
+
+    Parâmetros:
+    - conexao_info (dict): Servidor, usuário e senha usados para os itens que são só nomes de banco.
+    - bancos_selecionados (list): Nomes de bancos (todos no servidor de 'conexao_info') e/ou entradas
+      no formato do config.json (dicts com servidor, banco, usuario, senha e, opcionalmente, driver).
+
+    Retorna:
+    - dict: origem_db -> entrada, na ordem recebida. O origem_db é o 'nome_identificador' da
+      entrada (ou o nome do banco, se ela não tiver um); se os bancos estiverem em mais de um
+      servidor, ele vem precedido do servidor ('servidor/nome').
+
+    Lança:
+    - ValueError: Se o mesmo nome ou o mesmo banco aparecer duas vezes, ou se um servidor tiver
+      credenciais diferentes.
+    """
+    entradas = []
+    for item in bancos_selecionados:
+        if isinstance(item, dict):
+            entradas.append(item)
+        else:
+            entradas.append({"servidor": conexao_info["servidor"], "banco": item, "usuario": conexao_info["usuario"], "senha": conexao_info["senha"]})
+
+    credenciais = {}
+    for entrada in entradas:
+        login = (entrada["usuario"], entrada["senha"], entrada.get("driver"))
+        if credenciais.setdefault(entrada["servidor"], login) != login:
+            raise ValueError(f"O servidor '{entrada['servidor']}' aparece com usuários, senhas ou drivers diferentes.")
+
+    varios_servidores = len(credenciais) > 1
+    alvos = {}
+    bancos_informados = set()
+    for entrada in entradas:
+        nome = entrada.get("nome_identificador", entrada["banco"])
+        origem = f"{entrada['servidor']}/{nome}" if varios_servidores else nome
+        if origem in alvos:
+            raise ValueError(f"O nome '{origem}' foi informado mais de uma vez.")
+        if (entrada["servidor"], entrada["banco"]) in bancos_informados:
+            raise ValueError(f"O banco '{entrada['banco']}' do servidor '{entrada['servidor']}' foi informado mais de uma vez.")
+        bancos_informados.add((entrada["servidor"], entrada["banco"]))
+        alvos[origem] = entrada
+    return alvos
+
+class GerenciadorServidores:
+    """
+    Um pool (GerenciadorConexoes) por servidor, cada um com o seu próprio limite de sessões, para
+    que nenhuma instância do SQL Server fique sobrecarregada quando a análise junta vários servidores.
+
+    As sessões são pedidas pelo nome de origem do banco (origem_db, ver 'montar_alvos'), que é
+    traduzido para o servidor e o banco reais.
+    """
+    def __init__(self, alvos, fabrica_do_servidor, max_conexoes=MAX_EXTRACOES_SIMULTANEAS, limites_por_servidor=None):
+        """
+        Parâmetros:
+        - alvos (dict): origem_db -> entrada, como retornado por 'montar_alvos'.
+        - fabrica_do_servidor (callable): Recebe a primeira entrada de cada servidor e devolve a
+          fábrica de conexões daquele servidor.
+        - max_conexoes (int): Limite padrão de sessões simultâneas por servidor.
+        - limites_por_servidor (dict, opcional): Limites específicos (servidor -> sessões).
+        """
+        self.alvos = alvos
+        self.pools = {}
+        limites = limites_por_servidor or {}
+        for entrada in alvos.values():
+            servidor = entrada["servidor"]
+            if servidor not in self.pools:
+                self.pools[servidor] = GerenciadorConexoes(servidor, fabrica_do_servidor(entrada), limites.get(servidor, max_conexoes))
+
+    def servidor_de(self, origem):
+        return self.alvos[origem]["servidor"]
+
+    def banco_de(self, origem):
+        return self.alvos[origem]["banco"]
+
+    def conexao(self, origem):
+        """Empresta uma sessão do pool do servidor de 'origem', posicionada no banco correspondente."""
+        return self.pools[self.servidor_de(origem)].conexao(self.banco_de(origem))
+
+    def fechar(self):
+        for pool in self.pools.values():
+            pool.fechar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+        return False
+
+# Seção de Descoberta de Bancos
+# Em servidores compartilhados, a maioria dos bancos não é do Ponto Offline. Em vez de abrir cada
+# banco, uma consulta a partir do 'master' lê, de vários bancos de uma vez (nomes de três partes),
+# quais tabelas de CONFIG_TABELAS existem no esquema 'dbo' e a estimativa de linhas de cada uma
+# (sys.partitions, sem contar as linhas). As consultas de lotes diferentes rodam em paralelo.
+
+def listar_bancos_servidor(conexao):
+    """Lista os bancos on-line do servidor que o usuário pode acessar (sem os bancos de sistema)."""
+    excluidos = ", ".join("N'" + nome + "'" for nome in BANCOS_SISTEMA)
+    cursor = conexao.cursor()
+    try:
+        cursor.execute(f"SELECT name FROM sys.databases WHERE state = 0 AND HAS_DBACCESS(name) = 1 AND name NOT IN ({excluidos}) ORDER BY name;")
+        return [linha[0] for linha in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def montar_query_descoberta(bancos, tabelas):
+    """
+    Monta a consulta que sonda vários bancos de uma vez.
+
+    Parâmetros:
+    - bancos (list): Nomes dos bancos do lote.
+    - tabelas (list): Tabelas lógicas de CONFIG_TABELAS a procurar.
+
+    Retorna:
+    - str: Consulta com as colunas (ordem_db, tabela, linhas), uma linha por tabela encontrada.
+    """
+    nomes = ", ".join("N'" + CONFIG_TABELAS[t]["tabela"].replace("'", "''") + "'" for t in tabelas)
+    partes = []
+    for i, banco in enumerate(bancos):
+        b = citar_identificador(banco)
+        partes.append(
+            f"SELECT {i} AS ordem_db, t.name AS tabela, SUM(p.rows) AS linhas "
+            f"FROM {b}.sys.tables AS t "
+            f"JOIN {b}.sys.schemas AS s ON s.schema_id = t.schema_id "
+            f"JOIN {b}.sys.partitions AS p ON p.object_id = t.object_id AND p.index_id IN (0, 1) "
+            f"WHERE s.name = N'dbo' AND t.name IN ({nomes}) GROUP BY t.name"
+        )
+    return "\nUNION ALL\n".join(partes) + ";"
+
+def _sondar_lote(gerenciador, bancos, tabelas):
+    """
+    Sonda um lote de bancos. Se a consulta falhar (ex: um banco do lote ficou inacessível), o lote
+    é dividido ao meio e cada metade é sondada de novo, até isolar os bancos com problema.
+
+    Retorna:
+    - dict: banco -> {tabela lógica: linhas estimadas} (só as tabelas encontradas), ou None se o
+      banco não pôde ser consultado.
+    """
+    logicas = {CONFIG_TABELAS[t]["tabela"].lower(): t for t in tabelas}
+    try:
+        with gerenciador.conexao("master") as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(montar_query_descoberta(bancos, tabelas))
+                linhas = cursor.fetchall()
+            finally:
+                cursor.close()
+    except Exception:
+        if len(bancos) == 1: return {bancos[0]: None}
+        meio = len(bancos) // 2
+        return {**_sondar_lote(gerenciador, bancos[:meio], tabelas), **_sondar_lote(gerenciador, bancos[meio:], tabelas)}
+    encontradas = {banco: {} for banco in bancos}
+    for ordem_db, tabela, quantidade in linhas:
+        nome_logico = logicas.get(str(tabela).lower())
+        if nome_logico is not None: encontradas[bancos[ordem_db]][nome_logico] = int(quantidade or 0)
+    return encontradas
+
+def descobrir_bancos(gerenciador, bancos=None, tabelas=None, tamanho_lote=BANCOS_POR_SONDAGEM):
+    """
+    Descobre quais bancos do servidor têm as tabelas do Ponto Offline.
+
+    Parâmetros:
+    - gerenciador (GerenciadorConexoes): Pool de sessões do servidor (as sondagens usam o 'master').
+    - bancos (list, opcional): Bancos a sondar (padrão: todos os listados por 'listar_bancos_servidor').
+    - tabelas (list, opcional): Tabelas lógicas exigidas (padrão: todas de CONFIG_TABELAS).
+    - tamanho_lote (int): Quantos bancos entram em cada consulta.
+
+    Retorna:
+    - list: Um dict por banco, na ordem dos nomes: 'banco', 'tabelas' (tabela lógica -> linhas
+      estimadas, ou None se o banco não pôde ser consultado), 'faltando' (tabelas lógicas que o
+      banco não tem, ou None), 'compativel' (True se todas as 'tabelas' existem) e
+      'funcionarios' (estimativa, ou None).
+    """
+    tabelas = list(CONFIG_TABELAS.keys()) if tabelas is None else list(tabelas)
+    if bancos is None:
+        with gerenciador.conexao("master") as conn:
+            bancos = listar_bancos_servidor(conn)
+    lotes = [bancos[i:i + tamanho_lote] for i in range(0, len(bancos), tamanho_lote)]
+    encontradas = {}
+    if lotes:
+        with ThreadPoolExecutor(max_workers=min(gerenciador.max_conexoes, len(lotes))) as executor:
+            for resultado in executor.map(lambda lote: _sondar_lote(gerenciador, lote, tabelas), lotes):
+                encontradas.update(resultado)
+    descobertos = []
+    for banco in bancos:
+        presentes = encontradas.get(banco)
+        descobertos.append({
+            "banco": banco,
+            "tabelas": presentes,
+            "faltando": None if presentes is None else [t for t in tabelas if t not in presentes],
+            "compativel": presentes is not None and all(t in presentes for t in tabelas),
+            "funcionarios": (presentes or {}).get("funcionarios"),
+        })
+    return descobertos
+
+# Seção de Escrita do Relatório
+# As tabelas do relatório têm colunas de largura fixa, alinhadas à direita, no mesmo layout do
+# 'DataFrame.to_string(index=False)'. As larguras são medidas numa primeira passada pelos
+# blocos e as linhas são escritas na segunda, bloco a bloco.
+
+def _texto_valor(valor):
+    """Texto de um valor do relatório, com as mesmas marcas de vazio do pandas."""
+    if valor is None: return "None"
+    if valor is pd.NA: return "<NA>"
+    if valor is pd.NaT: return "NaT"
+    if isinstance(valor, float) and valor != valor: return "NaN"
+    return str(valor)
+
+def _formato_datas(serie):
+    """Escolhe, olhando a coluna inteira, se as datas são escritas com ou sem hora (None se não for data)."""
+    if not pd.api.types.is_datetime64_any_dtype(serie.dtype): return None
+    validas = serie.dropna()
+    if (validas == validas.dt.normalize()).all(): return "%Y-%m-%d"
+    if (validas.dt.microsecond == 0).all(): return "%Y-%m-%d %H:%M:%S"
+    return "%Y-%m-%d %H:%M:%S.%f"
+
+def _formato_decimais(serie, tamanho_bloco):
+    """
+    Escolhe, olhando a coluna inteira, como os números com casas decimais são escritos, com as
+    mesmas regras do pandas: 6 casas, tirando os zeros finais que todos os valores têm (deixando
+    pelo menos uma casa), ou notação científica se houver valores muito pequenos, ou muito
+    grandes que não caibam em 12 caracteres.
+
+    Retorna:
+    - tuple: ('f', casas) ou ('e', 6); None se a coluna não for de ponto flutuante do numpy.
+    """
+    if not (isinstance(serie.dtype, np.dtype) and serie.dtype.kind == "f"): return None
+    valores = serie.to_numpy()
+    absolutos = np.abs(valores[~np.isnan(valores)])
+    if ((absolutos < 1e-6) & (absolutos > 0)).any(): return ("e", 6)
+    # Os zeros finais são tirados por igual de todos os números, então basta o menor número de
+    # zeros finais; os tamanhos são medidos antes do corte e descontados no final
+    zeros_finais, maior_numero, maior_outro = 6, 0, 0
+    for inicio in range(0, len(valores), tamanho_bloco):
+        for valor in valores[inicio:inicio + tamanho_bloco]:
+            if valor != valor: maior_outro = max(maior_outro, 3)
+            elif not np.isfinite(valor): maior_outro = max(maior_outro, len(str(valor)))
+            else:
+                texto = f"{valor:.6f}"
+                zeros_finais = min(zeros_finais, len(texto) - len(texto.rstrip("0")))
+                maior_numero = max(maior_numero, len(texto))
+    casas = max(1, 6 - zeros_finais)
+    if (absolutos > 1e6).any() and max(maior_numero - (6 - casas), maior_outro) > 12: return ("e", 6)
+    return ("f", casas)
+
+def _formatar_coluna(serie, formato_data, formato_decimal=None):
+    """Converte um bloco de uma coluna em textos (array de objetos)."""
+    if formato_data is not None:
+        return serie.dt.strftime(formato_data).fillna("NaT").to_numpy(dtype=object)
+    if formato_decimal is not None:
+        notacao, casas = formato_decimal
+        return np.array(["NaN" if v != v else str(v) if not np.isfinite(v) else f"{v:.{casas}{notacao}}" for v in serie.to_numpy()], dtype=object)
+    if pd.api.types.is_integer_dtype(serie.dtype) and not serie.hasnans:
+        return serie.astype(str).to_numpy(dtype=object)
+    return np.array([_texto_valor(v) for v in serie], dtype=object)
+
+def escrever_tabela(df, arquivo_handle, tamanho_bloco=TAMANHO_BLOCO_RELATORIO):
+    """
+    Escreve um DataFrame como tabela de texto com colunas de largura fixa, bloco a bloco.
+
+    Parâmetros:
+    - df (DataFrame): As linhas a escrever, já na ordem do relatório.
+    - arquivo_handle (file object): O arquivo de texto de destino.
+    - tamanho_bloco (int): Quantas linhas são formatadas de cada vez.
+    """
+    colunas = list(df.columns)
+    formatos = [_formato_datas(df[c]) for c in colunas]
+    decimais = [_formato_decimais(df[c], tamanho_bloco) for c in colunas]
+    # Como no pandas, colunas numéricas reservam um espaço a mais no cabeçalho (lugar do sinal)
+    larguras = [len(str(c)) + (1 if pd.api.types.is_numeric_dtype(df[c].dtype) else 0) for c in colunas]
+    blocos = range(0, len(df), tamanho_bloco)
+
+    # 1ª passada: mede a largura de cada coluna sem guardar os textos
+    for inicio in blocos:
+        bloco = df.iloc[inicio:inicio + tamanho_bloco]
+        for i, c in enumerate(colunas):
+            textos = _formatar_coluna(bloco[c], formatos[i], decimais[i])
+            if len(textos): larguras[i] = max(larguras[i], max(map(len, textos)))
+
+    # 2ª passada: formata e grava as linhas de cada bloco
+    arquivo_handle.write(" ".join(str(c).rjust(larguras[i]) for i, c in enumerate(colunas)))
+    for inicio in blocos:
+        bloco = df.iloc[inicio:inicio + tamanho_bloco]
+        partes = [[t.rjust(larguras[i]) for t in _formatar_coluna(bloco[c], formatos[i], decimais[i])] for i, c in enumerate(colunas)]
+        arquivo_handle.write("\n" + "\n".join(map(" ".join, zip(*partes))))
+
+def _nome_arquivo_secao(titulo):
+    """Transforma o título da seção em um nome de arquivo sem acentos nem espaços."""
+    texto = unicodedata.normalize("NFKD", titulo).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "_", texto.lower()).strip("_")
+
+class ExportadorSecoes:
+    """
+    Grava cada seção do relatório, com todas as linhas, também em um arquivo legível por máquina
+    (CSV, JSONL ou Parquet) na pasta de seções, ao lado do relatorio_analise.txt.
+
+    Os arquivos são numerados na ordem das seções (ex: '03_funcoes_duplicadas.csv'). As seções de
+    execuções anteriores (só os arquivos nesse padrão; outros arquivos da pasta ficam) são
+    apagadas na primeira seção gravada, ou em 'concluir' se nenhuma seção for gravada.
+    """
+    PADRAO_ARQUIVO = re.compile(r"^\d{2,}_[a-z0-9_]*\.(?:" + "|".join(FORMATOS_EXPORTACAO) + r")$")
+
+    def __init__(self, pasta, formato):
+        if formato not in FORMATOS_EXPORTACAO:
+            raise ValueError(f"Formato de exportação inválido: '{formato}' (use {', '.join(FORMATOS_EXPORTACAO)}).")
+        self.pasta, self.formato = pasta, formato
+        self._quantidade = 0
+        self._antigas_apagadas = False
+
+    def _apagar_secoes_antigas(self):
+        if self._antigas_apagadas: return
+        os.makedirs(self.pasta, exist_ok=True)
+        for nome in os.listdir(self.pasta):
+            if self.PADRAO_ARQUIVO.match(nome): os.remove(os.path.join(self.pasta, nome))
+        self._antigas_apagadas = True
+
+    def concluir(self):
+        """Chamado ao final do relatório: apaga as seções antigas mesmo se nenhuma foi gravada agora."""
+        self._apagar_secoes_antigas()
+
+    def exportar(self, titulo, df):
+        """Grava a seção e retorna o caminho do arquivo criado."""
+        self._apagar_secoes_antigas()
+        self._quantidade += 1
+        caminho = os.path.join(self.pasta, f"{self._quantidade:02d}_{_nome_arquivo_secao(titulo)}.{self.formato}")
+        if self.formato == "csv":
+            df.to_csv(caminho, index=False, encoding="utf-8", chunksize=TAMANHO_BLOCO_RELATORIO)
+        elif self.formato == "jsonl":
+            with open(caminho, "w", encoding="utf-8") as arquivo:
+                for inicio in range(0, len(df), TAMANHO_BLOCO_RELATORIO):
+                    bloco = df.iloc[inicio:inicio + TAMANHO_BLOCO_RELATORIO]
+                    arquivo.write(bloco.to_json(orient="records", lines=True, date_format="iso", force_ascii=False))
+        else:
+            try:
+                df.to_parquet(caminho, index=False)
+            except Exception:
+                # Colunas com tipos misturados (ex: datas válidas e textos inválidos) são gravadas como texto
+                textos = {c: "string" for c in df.columns if df[c].dtype == object}
+                df.astype(textos).to_parquet(caminho, index=False)
+        return caminho
+
+def _escrever_aviso_limite(arquivo_handle, total, escritas, caminho_secao):
+    """Avisa no relatório quantas linhas ficaram de fora por causa do limite da seção."""
+    onde = f" A seção completa está em '{caminho_secao}'." if caminho_secao else " Exporte as seções (CSV/JSONL/Parquet) para ver todas."
+    arquivo_handle.write(f"\n... {total - escritas} de {total} linha(s) omitida(s) pelo limite da seção.{onde}")
+
+def gerar_relatorio_txt(titulo, df, colunas_relatorio, arquivo_handle, ja_ordenado=False, limite_linhas=None, exportador=None):
+    """
+    Função para gerar seções de relatório de texto a partir de um DataFrame.
+
+    Parâmetros:
+    - titulo (str): O título da seção de verificação no relatório.
+    - df (DataFrame): O DataFrame do pandas contendo os dados a serem relatados.
+    - colunas_relatorio (list): Lista de colunas a serem exibidas no relatório.
+    - arquivo_handle (file object): O arquivo de texto onde o relatório será escrito.
+    - ja_ordenado (bool): Se True, 'df' já vem sem nulos na primeira coluna e na ordem do
+      relatório (ex: saída do IndiceDuplicidade), e não é ordenado de novo.
+    - limite_linhas (int): Máximo de linhas escritas no texto (None para todas).
+    - exportador (ExportadorSecoes): Se informado, a seção completa também é gravada em arquivo.
+    
+    Retorna:
+    - bool: True se dados foram escritos, False caso contrário.
+    """
+    # Verifica se o DataFrame não é nulo e não está vazio
+    if df is not None and not df.empty:
+        # Escreve o cabeçalho da seção
+        arquivo_handle.write("=" * 80 + "\n")
+        arquivo_handle.write(f"VERIFICAÇÃO: {titulo}\n")
+        arquivo_handle.write("=" * 80 + "\n")
+        
+        # Garante que as colunas a serem exibidas existem no DataFrame
+        colunas_existentes = [c for c in colunas_relatorio if c in df.columns]
+        if not colunas_existentes: return False
+        
+        # Obtém a primeira coluna para usar na ordenação do relatório
+        primeira_coluna_para_ordenar = colunas_existentes[0]
+        
+        # Remove linhas com valores nulos na coluna de ordenação
+        df_limpo = df.dropna(subset=[primeira_coluna_para_ordenar])
+        
+        # Se ainda houver dados, ordena e escreve a tabela no arquivo.
+        # O desempate por 'origem_db' com ordenação estável deixa o relatório igual
+        # qualquer que seja a ordem de chegada das linhas (extração paralela, modo pushdown).
+        if not df_limpo.empty:
+            if ja_ordenado:
+                df_ordenado = df_limpo[colunas_existentes]
+            else:
+                ordenacao = [primeira_coluna_para_ordenar] + [c for c in ['origem_db'] if c in colunas_existentes and c != primeira_coluna_para_ordenar]
+                df_ordenado = df_limpo[colunas_existentes].sort_values(by=ordenacao, kind='stable')
+            caminho_secao = exportador.exportar(titulo, df_ordenado) if exportador is not None else None
+            total = len(df_ordenado)
+            escritas = min(total, limite_linhas) if limite_linhas else total
+            escrever_tabela(df_ordenado.iloc[:escritas], arquivo_handle)
+            if escritas < total: _escrever_aviso_limite(arquivo_handle, total, escritas, caminho_secao)
+            arquivo_handle.write("\n\n")
+            return True
+    return False
+
+def gerar_secao_horarios(df_horarios, arquivo_handle, limite_linhas=None, exportador=None):
+    """
+    Escreve a seção de horários com o mesmo nome para códigos ('numero') diferentes.
+
+    Em vez de filtrar a tabela inteira uma vez para cada nome em conflito, as linhas de todos
+    os nomes em conflito são separadas e ordenadas de uma só vez (nome, numero, dia_semana);
+    depois cada bloco é um simples recorte contínuo, escrito no relatório em ordem de nome.
+
+    Parâmetros:
+    - df_horarios (DataFrame): Horários consolidados de todos os bancos.
+    - arquivo_handle (file object): O arquivo de texto onde o relatório será escrito.
+    - limite_linhas (int): Máximo de linhas escritas no texto, somando os blocos (None para todas).
+    - exportador (ExportadorSecoes): Se informado, a seção completa também é gravada em arquivo.
+
+    Retorna:
+    - bool: True se algum conflito foi escrito, False caso contrário.
+    """
+    if df_horarios is None or df_horarios.empty: return False
+    # Nomes ligados a mais de um 'numero' distinto (horários sem nome não são comparáveis)
+    pares_unicos = df_horarios[['nome', 'numero']].drop_duplicates().dropna(subset=['nome'])
+    quantidade_codigos = pares_unicos.groupby('nome', sort=False)['numero'].transform('size')
+    nomes_conflitantes = pares_unicos.loc[quantidade_codigos > 1, 'nome'].unique()
+    if len(nomes_conflitantes) == 0: return False
+
+    # Ordenação estável: empates (mesmo horário em vários bancos) mantêm a ordem original das linhas
+    conflitos = df_horarios.loc[df_horarios['nome'].isin(nomes_conflitantes), ['nome', 'numero', 'dia_semana', 'origem_db']]
+    conflitos = conflitos.sort_values(by=['nome', 'numero', 'dia_semana'], kind='stable')
+    nomes = conflitos['nome'].to_numpy()
+    inicios = np.flatnonzero(np.r_[True, nomes[1:] != nomes[:-1]])
+    fins = np.r_[inicios[1:], len(nomes)]
+
+    titulo = REGISTRO_VERIFICACOES["horarios"]["titulo"]
+    caminho_secao = exportador.exportar(titulo, conflitos) if exportador is not None else None
+    arquivo_handle.write("=" * 80 + f"\nVERIFICAÇÃO: {titulo}\n" + "=" * 80 + "\n")
+    for inicio, fim in zip(inicios, fins):
+        # Com limite de linhas, o último bloco pode ser cortado e os seguintes são omitidos
+        if limite_linhas and inicio >= limite_linhas:
+            _escrever_aviso_limite(arquivo_handle, len(conflitos), limite_linhas, caminho_secao)
+            arquivo_handle.write("\n")
+            break
+        arquivo_handle.write(f"\n--- Conflito para o Nome de Horário: '{nomes[inicio]}' ---\n")
+        escrever_tabela(conflitos.iloc[inicio:min(fim, limite_linhas) if limite_linhas else fim], arquivo_handle)
+        arquivo_handle.write("\n")
+    else:
+        if limite_linhas and len(conflitos) > limite_linhas:
+            _escrever_aviso_limite(arquivo_handle, len(conflitos), limite_linhas, caminho_secao)
+            arquivo_handle.write("\n")
+    arquivo_handle.write("\n")
+    return True
+
+def _converter_coluna(valores, tipo):
+    """
+    Converte os valores de uma coluna de um lote para o tipo compacto esperado.
+
+    Parâmetros:
+    - valores (tuple): Valores da coluna, na ordem das linhas do lote.
+    - tipo (str ou None): "inteiro", "data", "texto" ou None (mantém como objeto).
+
+    Retorna:
+    - Um array do pandas/NumPy com os valores convertidos.
+    """
+    preenchidos = [v for v in valores if v is not None]
+    if tipo == "inteiro" and all(type(v) is int for v in preenchidos):
+        return pd.array(valores, dtype="Int64")
+    if tipo == "data" and preenchidos and all(isinstance(v, (datetime, date)) for v in preenchidos):
+        try:
+            return pd.to_datetime(pd.Series(valores, dtype=object)).array
+        except (pd.errors.OutOfBoundsDatetime, OverflowError):
+            # Datas-sentinela fora do intervalo do pandas (ex: 0001-01-01, 9999-12-31) ficam como objeto
+            pass
+    if tipo == "texto" and all(isinstance(v, str) for v in preenchidos):
+        return pd.array(valores, dtype="string")
+    return pd.array(valores, dtype=object)
+
+class BufferTabela:
+    """
+    Acumula, lote a lote, as colunas já convertidas de uma tabela lógica.
+
+    Cada extração (banco x tabela) preenche o seu próprio buffer; depois os buffers de todos
+    os bancos são encadeados com 'anexar' (sem copiar os dados) e o DataFrame consolidado é
+    montado uma única vez em 'para_dataframe', coluna por coluna, liberando os lotes no caminho.
+    A coluna 'origem_db' é guardada apenas como (banco, quantidade de linhas) e vira uma
+    coluna categórica no final.
+    """
+    def __init__(self, colunas):
+        self.colunas = list(colunas)
+        self._lotes = {c: [] for c in self.colunas}
+        self._origens = []  # Lista de (nome_db, quantidade de linhas)
+        self.linhas = 0
+
+    def adicionar_lote(self, linhas, origem):
+        """Converte um lote de linhas (tuplas do cursor) para colunas tipadas e o guarda."""
+        if not linhas: return
+        for nome, valores in zip(self.colunas, zip(*linhas)):
+            self._lotes[nome].append(_converter_coluna(valores, TIPOS_COLUNAS.get(nome)))
+        self._origens.append((origem, len(linhas)))
+        self.linhas += len(linhas)
+
+    def anexar(self, outro):
+        """Encadeia os lotes de outro buffer da mesma tabela ao final deste."""
+        for nome in self.colunas:
+            self._lotes[nome].extend(outro._lotes.get(nome, []))
+        self._origens.extend(outro._origens)
+        self.linhas += outro.linhas
+
+    def adicionar_dataframe(self, df, origem):
+        """Guarda um DataFrame já tipado (ex: lido do cache) como um único lote da origem informada."""
+        if df is None or df.empty: return
+        for nome in self.colunas:
+            self._lotes[nome].append(df[nome].array if nome in df.columns else pd.array([None] * len(df), dtype=object))
+        self._origens.append((origem, len(df)))
+        self.linhas += len(df)
+
+    def tamanho_bytes(self):
+        """Tamanho aproximado dos lotes guardados (colunas de texto contam só os ponteiros)."""
+        return sum(getattr(lote, 'nbytes', 0) for lotes in self._lotes.values() for lote in lotes)
+
+    def dataframe_sem_origem(self):
+        """Monta uma cópia do conteúdo atual, sem a coluna 'origem_db' e sem esvaziar o buffer."""
+        return pd.DataFrame({nome: self.coluna(nome) for nome in self.colunas})
+
+    def coluna(self, nome):
+        """Retorna uma coluna inteira (sem consumir o buffer) como Series."""
+        lotes = self._lotes.get(nome) or []
+        if not lotes: return pd.Series(dtype=object)
+        return pd.concat([pd.Series(lote) for lote in lotes], ignore_index=True) if len(lotes) > 1 else pd.Series(lotes[0])
+
+    def para_dataframe(self):
+        """Monta o DataFrame final e esvazia o buffer."""
+        if self.linhas == 0: return pd.DataFrame()
+        dados = {}
+        for nome in self.colunas:
+            dados[nome] = self.coluna(nome)
+            self._lotes[nome] = []  # Libera os lotes desta coluna antes de montar a próxima
+        df = pd.DataFrame(dados)
+
+        # Adiciona uma coluna de origem (categórica) para identificar de qual banco os dados vieram
+        categorias = sorted({origem for origem, _ in self._origens})
+        posicao = {origem: i for i, origem in enumerate(categorias)}
+        codigos = np.repeat([posicao[origem] for origem, _ in self._origens], [n for _, n in self._origens])
+        df['origem_db'] = pd.Categorical.from_codes(codigos, categories=categorias)
+        self._origens = []
+        self.linhas = 0
+        return df
+
+def extrair_dados(nome_logico, config_db, conexao, buffer=None, colunas=None, instrumentacao=None):
+    """
+    Extrai dados de uma tabela específica de um banco de dados SQL Server.
+
+    As linhas são lidas em lotes de TAMANHO_LOTE com 'fetchmany' e convertidas lote a lote
+    para tipos compactos, sem passar por um DataFrame intermediário.
+
+    Parâmetros:
+    - nome_logico (str): O nome lógico da tabela (ex: "empresas").
+    - config_db (dict): Dicionário com informações do banco de dados de origem.
+    - conexao: Conexão DB-API já posicionada no banco (emprestada do GerenciadorConexoes).
+    - buffer (BufferTabela, opcional): Buffer que recebe os lotes (com as mesmas 'colunas').
+    - colunas (list, opcional): Colunas a extrair (padrão: todas as de CONFIG_TABELAS).
+    - instrumentacao (Instrumentacao, opcional): Consultada a cada lote para atender um pedido
+      de cancelamento.
+
+    Retorna:
+    - DataFrame: Um DataFrame do pandas com os dados da tabela, quando 'buffer' não é informado.
+    - BufferTabela: O próprio buffer preenchido, quando 'buffer' é informado.
+
+    Lança:
+    - ErroExtracao: Se a leitura falhar (o chamador decide como registrar a falha).
+    - AnaliseCancelada: Se o cancelamento foi pedido durante a leitura.
+    """
+    config_tabela = CONFIG_TABELAS.get(nome_logico, {})
+    if not config_tabela: return pd.DataFrame()
+    tabela = config_tabela["tabela"]
+    colunas = colunas or config_tabela["colunas"]
+    # Monta a query de forma segura, garantindo a qualificação do esquema
+    colunas_str = ", ".join(f"[dbo].[{tabela}].[{c}] AS [{c}]" for c in colunas)
+    query = f"SELECT {colunas_str} FROM [dbo].[{tabela}];"
+    
+    try:
+        destino = buffer if buffer is not None else BufferTabela(colunas)
+        cursor = conexao.cursor()
+        try:
+            cursor.arraysize = TAMANHO_LOTE
+            cursor.execute(query)
+            # Lê o resultado em lotes, convertendo cada lote direto para o buffer
+            while True:
+                linhas = cursor.fetchmany(TAMANHO_LOTE)
+                if not linhas: break
+                destino.adicionar_lote(linhas, config_db['nome_identificador'])
+                if instrumentacao is not None: instrumentacao.verificar_cancelamento()
+        finally:
+            cursor.close()
+        return destino if buffer is not None else destino.para_dataframe()
+    except AnaliseCancelada:
+        raise
+    except Exception as e:
+        # Em caso de falha, repassa o erro identificando banco e tabela
+        raise ErroExtracao(config_db['nome_identificador'], tabela, e) from e
+
+# Seção de Cache Local
+# Nas reexecuções, a maioria dos bancos não mudou desde a última análise. Antes de baixar uma
+# tabela, é calculada no servidor uma "impressão digital" barata (quantidade de linhas, maior id
+# e CHECKSUM_AGG das colunas extraídas). Se ela for igual à guardada, a tabela é lida do disco.
+
+def calcular_impressao_digital(conexao, nome_logico):
+    """
+    Calcula no servidor uma impressão digital do conteúdo de uma tabela.
+
+    Parâmetros:
+    - conexao: Conexão DB-API já posicionada no banco.
+    - nome_logico (str): O nome lógico da tabela (ex: "empresas").
+
+    Retorna:
+    - str ou None: A impressão digital, ou None se o servidor não suportar a consulta.
+    """
+    config_tabela = CONFIG_TABELAS[nome_logico]
+    colunas = config_tabela["colunas"]
+    maior_id = "MAX([id])" if "id" in colunas else "NULL"
+    lista_colunas = ", ".join(citar_identificador(c) for c in colunas)
+    query = f"SELECT COUNT_BIG(*), {maior_id}, CHECKSUM_AGG(BINARY_CHECKSUM({lista_colunas})) FROM [dbo].{citar_identificador(config_tabela['tabela'])};"
+    cursor = conexao.cursor()
+    try:
+        cursor.execute(query)
+        linha = cursor.fetchone()
+    except Exception:
+        return None
+    finally:
+        cursor.close()
+    # As colunas entram na impressão para que uma mudança em CONFIG_TABELAS invalide o cache
+    return "|".join(str(v) for v in tuple(linha)) + "|" + ",".join(colunas)
+
+def gravar_dataframe(df, caminho_base):
+    """
+    Grava um DataFrame em Parquet ('caminho_base.parquet'); tabelas com colunas de tipos
+    misturados (ex: datas válidas e textos inválidos), que o Parquet não aceita, vão para pickle.
+
+    Retorna:
+    - str: O caminho do arquivo gravado.
+    """
+    caminho = caminho_base + ".parquet"
+    try:
+        df.to_parquet(caminho, index=False)
+    except Exception:
+        if os.path.exists(caminho): os.remove(caminho)
+        caminho = caminho_base + ".pkl"
+        df.reset_index(drop=True).to_pickle(caminho)
+    return caminho
+
+def ler_dataframe(caminho):
+    """Lê um arquivo gravado por 'gravar_dataframe'."""
+    return pd.read_parquet(caminho) if caminho.endswith(".parquet") else pd.read_pickle(caminho)
+
+class CacheExtracao:
+    """
+    Cache em disco das tabelas extraídas, uma entrada por (servidor, banco, tabela).
+
+    Os dados ficam em Parquet (colunar); tabelas com colunas de tipos misturados, que o Parquet
+    não aceita, são guardadas com pickle. Um índice JSON guarda a impressão digital, o tamanho
+    e o último acesso de cada entrada, usado na remoção LRU quando 'limite_bytes' é excedido.
+    Com 'forcar_atualizacao', nada é lido do cache, mas as novas extrações são gravadas.
+    """
+    def __init__(self, pasta, limite_bytes=TAMANHO_MAXIMO_CACHE, forcar_atualizacao=False):
+        self.pasta = pasta
+        self.limite_bytes = limite_bytes
+        self.forcar_atualizacao = forcar_atualizacao
+        self._lock = threading.Lock()
+        self._caminho_indice = os.path.join(pasta, "indice.json")
+        os.makedirs(pasta, exist_ok=True)
+        try:
+            with open(self._caminho_indice, 'r', encoding='utf-8') as f:
+                self._indice = json.load(f)
+        except (OSError, ValueError):
+            self._indice = {}
+
+    @staticmethod
+    def _chave(servidor, banco, nome_logico):
+        return hashlib.sha1(f"{servidor}|{banco}|{nome_logico}".encode('utf-8')).hexdigest()
+
+    def _salvar_indice(self):
+        temporario = self._caminho_indice + ".tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(self._indice, f, ensure_ascii=False, indent=1)
+        os.replace(temporario, self._caminho_indice)
+
+    def obter(self, servidor, banco, nome_logico, impressao):
+        """Retorna o DataFrame guardado, ou None se não existir, estiver desatualizado ou houver atualização forçada."""
+        if self.forcar_atualizacao or impressao is None: return None
+        chave = self._chave(servidor, banco, nome_logico)
+        with self._lock:
+            entrada = self._indice.get(chave)
+            if entrada is None or entrada.get("impressao") != impressao: return None
+            caminho = os.path.join(self.pasta, entrada["arquivo"])
+        try:
+            df = ler_dataframe(caminho)
+        except Exception:
+            return None
+        with self._lock:
+            entrada["ultimo_acesso"] = time.time()
+            self._salvar_indice()
+        return df
+
+    def guardar(self, servidor, banco, nome_logico, impressao, df):
+        """Grava (ou substitui) a entrada e remove as mais antigas se o limite de tamanho for excedido."""
+        if impressao is None: return
+        chave = self._chave(servidor, banco, nome_logico)
+        caminho = gravar_dataframe(df, os.path.join(self.pasta, chave))
+        with self._lock:
+            anterior = self._indice.get(chave)
+            if anterior and anterior["arquivo"] != os.path.basename(caminho):
+                self._remover_arquivo(anterior["arquivo"])
+            self._indice[chave] = {
+                "servidor": servidor, "banco": banco, "tabela": nome_logico, "impressao": impressao,
+                "arquivo": os.path.basename(caminho), "bytes": os.path.getsize(caminho), "ultimo_acesso": time.time(),
+            }
+            self._remover_excedente()
+            self._salvar_indice()
+
+    def _remover_arquivo(self, arquivo):
+        try:
+            os.remove(os.path.join(self.pasta, arquivo))
+        except OSError:
+            pass
+
+    def _remover_excedente(self):
+        # Remove as entradas usadas há mais tempo até o cache caber no limite
+        total = sum(e["bytes"] for e in self._indice.values())
+        for chave, entrada in sorted(self._indice.items(), key=lambda item: item[1]["ultimo_acesso"]):
+            if total <= self.limite_bytes: break
+            self._remover_arquivo(entrada["arquivo"])
+            total -= entrada["bytes"]
+            del self._indice[chave]
+
+def _extrair_com_pool(gerenciador, nome_logico, nome_db, cache=None, colunas=None, instrumentacao=None):
+    """
+    Empresta uma sessão do pool e extrai uma tabela ('colunas', ou todas); falhas de conexão
+    também viram ErroExtracao. Se houver cache e a tabela não tiver mudado no servidor, os dados
+    vêm do disco (desde que a entrada guardada tenha todas as colunas pedidas). A extração é
+    medida pela 'instrumentacao' (origem 'servidor' ou 'cache').
+    """
+    colunas = colunas or CONFIG_TABELAS[nome_logico]["colunas"]
+    instrumentacao = instrumentacao or Instrumentacao()
+    try:
+        with instrumentacao.medir("extracao", banco=nome_db, tabela=nome_logico, origem="servidor") as registro:
+            with gerenciador.conexao(nome_db) as conn:
+                buffer = BufferTabela(colunas)
+                impressao = calcular_impressao_digital(conn, nome_logico) if cache is not None else None
+                df_cache = None
+                if impressao is not None:
+                    df_cache = cache.obter(gerenciador.servidor_de(nome_db), gerenciador.banco_de(nome_db), nome_logico, impressao)
+                if df_cache is not None and all(c in df_cache.columns for c in colunas):
+                    buffer.adicionar_dataframe(df_cache[colunas], nome_db)
+                    registro["origem"], impressao = "cache", None
+                else:
+                    extrair_dados(nome_logico, {"nome_identificador": nome_db}, conn, buffer, colunas, instrumentacao)
+            if impressao is not None:
+                cache.guardar(gerenciador.servidor_de(nome_db), gerenciador.banco_de(nome_db), nome_logico, impressao, buffer.dataframe_sem_origem())
+            registro["linhas"], registro["bytes"] = buffer.linhas, buffer.tamanho_bytes()
+        return buffer
+    except (ErroExtracao, AnaliseCancelada):
+        raise
+    except Exception as e:
+        raise ErroExtracao(nome_db, CONFIG_TABELAS[nome_logico]["tabela"], e) from e
+
+def extrair_bancos_em_paralelo(gerenciador, bancos_selecionados, status_callback, tabelas=None, cache=None, ao_concluir=None, colunas=None, instrumentacao=None):
+    """
+    Extrai todas as tabelas de todos os bancos usando um conjunto limitado de threads.
+
+    Cada servidor tem o seu próprio grupo de threads, do tamanho do limite de sessões do seu
+    pool: os servidores são lidos ao mesmo tempo e nenhuma thread fica parada esperando a
+    vez de um servidor enquanto outro está livre.
+
+    Parâmetros:
+    - gerenciador (GerenciadorServidores): Pools de sessões dos servidores.
+    - bancos_selecionados (list): Lista de nomes de origem (origem_db) dos bancos a serem extraídos.
+    - status_callback (function): Função para atualizar o status na GUI.
+    - tabelas (list, opcional): Tabelas lógicas a extrair (padrão: todas de CONFIG_TABELAS).
+    - cache (CacheExtracao, opcional): Cache local consultado antes de cada extração.
+    - ao_concluir (function, opcional): Chamada como 'ao_concluir(nome_db, nome_logico, buffer)'
+      assim que cada tabela termina (sempre na thread que chamou esta função). Quando informada,
+      os buffers são entregues a ela e não ficam guardados em 'resultados'.
+    - colunas (dict, opcional): Colunas a extrair de cada tabela lógica (padrão: todas).
+    - instrumentacao (Instrumentacao, opcional): Mede cada extração, acompanha o progresso da
+      fase "Extração" e atende o pedido de cancelamento.
+
+    Retorna:
+    - tuple: (resultados, falhas), onde 'resultados' mapeia (nome_db, nome_logico) para o
+      BufferTabela extraído e 'falhas' é a lista de ErroExtracao ordenada por banco e tabela.
+
+    Lança:
+    - AnaliseCancelada: Se o cancelamento foi pedido (as extrações que ainda não começaram
+      são descartadas e as que estão em andamento param no próximo lote).
+    """
+    resultados = {}
+    falhas = []
+    instrumentacao = instrumentacao or Instrumentacao()
+    tabelas = list(CONFIG_TABELAS.keys()) if tabelas is None else tabelas
+    tarefas = [(nome_db, nome_logico) for nome_db in bancos_selecionados for nome_logico in tabelas]
+    if not tarefas: return resultados, falhas
+    instrumentacao.iniciar_fase("Extração", len(tarefas))
+
+    with ExitStack() as pilha:
+        executores = {servidor: pilha.enter_context(ThreadPoolExecutor(max_workers=pool.max_conexoes)) for servidor, pool in gerenciador.pools.items()}
+        futuros = {}
+        for nome_db, nome_logico in tarefas:
+            executor = executores[gerenciador.servidor_de(nome_db)]
+            futuro = executor.submit(_extrair_com_pool, gerenciador, nome_logico, nome_db, cache, (colunas or {}).get(nome_logico), instrumentacao)
+            futuros[futuro] = (nome_db, nome_logico)
+
+        # Os resultados chegam na ordem em que as threads terminam; por isso são guardados
+        # por chave e reordenados depois, para o relatório sair sempre igual.
+        concluidas = 0
+        try:
+            for futuro in as_completed(futuros):
+                nome_db, nome_logico = futuros[futuro]
+                linhas, aviso = 0, ""
+                try:
+                    buffer = futuro.result()
+                except ErroExtracao as e:
+                    # A falha vai para o relatório; no status, aparece junto com o andamento
+                    falhas.append(e)
+                    aviso = f" (falhou: {e})"
+                else:
+                    linhas = buffer.linhas
+                    if ao_concluir is not None:
+                        ao_concluir(nome_db, nome_logico, buffer)
+                    else:
+                        resultados[(nome_db, nome_logico)] = buffer
+                concluidas += 1
+                instrumentacao.avancar(linhas)
+                status_callback(f"Extraindo dados ({concluidas}/{len(tarefas)}): {nome_db} / {nome_logico}{aviso}")
+                instrumentacao.verificar_cancelamento()
+        except BaseException:
+            # Cancelamento ou erro (ex: em 'ao_concluir'): descarta as extrações na fila, para
+            # não continuar consultando o servidor. Com cancelamento, as que estão em andamento
+            # param no próximo lote; nos demais casos, terminam o lote atual e são ignoradas.
+            for futuro in futuros: futuro.cancel()
+            raise
+
+    ordem_bancos = {nome_db: i for i, nome_db in enumerate(bancos_selecionados)}
+    ordem_tabelas = {cfg["tabela"]: i for i, cfg in enumerate(CONFIG_TABELAS.values())}
+    falhas.sort(key=lambda f: (ordem_bancos.get(f.nome_db, len(ordem_bancos)), ordem_tabelas.get(f.tabela, len(ordem_tabelas))))
+    return resultados, falhas
+
+# Seção do Motor de Duplicidade
+# Em vez de uma chamada 'duplicated' para cada verificação (e uma nova ordenação no relatório),
+# cada conjunto (tabela, colunas-chave) ganha um índice de hash calculado uma única vez:
+# o código do grupo de cada linha, o tamanho de cada grupo e em quantos bancos ele aparece.
+# Só os grupos presentes em mais de um banco são conflitos de unificação.
+
+def _codificar_coluna(serie):
+    """
+    Converte uma coluna em códigos inteiros (um por valor distinto) usando uma tabela de hash.
+
+    Retorna:
+    - tuple: (codigos, valores), onde 'codigos' tem um inteiro por linha (-1 para nulos) e
+      'valores' é a lista de valores distintos, na ordem em que apareceram.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Colunas categóricas (ex: 'origem_db') já têm os códigos prontos
+        return serie.cat.codes.to_numpy().astype(np.int64), serie.cat.categories
+    codigos, valores = pd.factorize(serie)
+    return codigos.astype(np.int64), valores
+
+def _ranking_valores(valores, codigos):
+    """
+    Retorna, para cada linha de 'codigos', a posição do seu valor na ordem crescente (-1 para nulos).
+    Só os valores distintos presentes em 'codigos' são ordenados, e não as linhas.
+    """
+    presentes = pd.unique(codigos[codigos >= 0])
+    try:
+        ordem = pd.Index(valores).take(presentes).argsort(kind='stable')
+    except TypeError:
+        # Valores de tipos misturados (ex: números e textos): ordena pela representação em texto
+        ordem = np.argsort(np.array([str(v) for v in pd.Index(valores).take(presentes)]), kind='stable')
+    ranking = np.full(len(valores) + 1, -1, dtype=np.int64)
+    ranking[presentes[ordem]] = np.arange(len(presentes))
+    return ranking[codigos]  # códigos -1 caem na última posição, que vale -1
+
+class IndiceDuplicidade:
+    """
+    Índice de hash de uma tabela consolidada por um conjunto de colunas-chave.
+
+    Atributos (calculados uma única vez, na criação):
+    - grupos (ndarray): Código do grupo (valor da chave) de cada linha.
+    - tamanhos (ndarray): Quantidade de linhas de cada grupo.
+    - bancos_por_grupo (ndarray): Quantidade de bancos ('origem_db') distintos de cada grupo.
+    """
+    def __init__(self, df, colunas_chave):
+        self.df = df
+        self.colunas_chave = list(colunas_chave)
+        self._codigos = {c: _codificar_coluna(df[c]) for c in self.colunas_chave}
+        # Combina os códigos de cada coluna da chave em um único código de grupo.
+        # Nulos (-1) formam um grupo próprio, como em 'duplicated'.
+        grupos = self._codigos[self.colunas_chave[0]][0] + 1
+        for coluna in self.colunas_chave[1:]:
+            codigos = self._codigos[coluna][0] + 1
+            grupos = pd.factorize(grupos * (int(codigos.max()) + 1) + codigos)[0].astype(np.int64)
+        self.grupos = grupos
+        quantidade_grupos = int(grupos.max()) + 1 if len(grupos) else 0
+        self.tamanhos = np.bincount(grupos, minlength=quantidade_grupos)
+
+        # Conta em quantos bancos diferentes cada grupo aparece (pares únicos grupo x banco).
+        # Grupos de uma linha só estão em um banco; os pares são calculados apenas para os demais.
+        # As categorias de 'origem_db' são ordenadas, então o código também serve para ordenar.
+        self.origens = _codificar_coluna(df['origem_db'])[0] if 'origem_db' in df.columns else np.zeros(len(df), dtype=np.int64)
+        quantidade_origens = int(self.origens.max()) + 2 if len(self.origens) else 1
+        repetidas = self.tamanhos[grupos] > 1
+        pares = pd.unique(grupos[repetidas] * quantidade_origens + self.origens[repetidas] + 1)
+        self.bancos_por_grupo = np.maximum(np.minimum(self.tamanhos, 1), np.bincount(pares // quantidade_origens, minlength=quantidade_grupos))
+
+    def mascara_conflitos(self, ignorar_chave_nula=False):
+        """Linhas cujo grupo aparece em mais de um banco (opcionalmente, sem as de chave nula)."""
+        mascara = self.bancos_por_grupo[self.grupos] > 1
+        if ignorar_chave_nula:
+            mascara &= self.df[self.colunas_chave[0]].notna().to_numpy()
+        return mascara
+
+    def conflitos_ordenados(self, coluna_ordenacao, ignorar_chave_nula=False):
+        """
+        Retorna as linhas em conflito já na ordem do relatório: pela 'coluna_ordenacao' e, em
+        caso de empate, por 'origem_db'. Linhas com 'coluna_ordenacao' nula são descartadas,
+        como em gerar_relatorio_txt.
+        """
+        posicoes = np.flatnonzero(self.mascara_conflitos(ignorar_chave_nula))
+        if len(posicoes) == 0: return self.df.iloc[0:0]
+        if coluna_ordenacao in self._codigos:
+            codigos, valores = self._codigos[coluna_ordenacao]
+            chave_ordem = _ranking_valores(valores, codigos[posicoes])
+        else:
+            codigos, valores = _codificar_coluna(self.df[coluna_ordenacao].iloc[posicoes])
+            chave_ordem = _ranking_valores(valores, codigos)
+        posicoes, chave_ordem = posicoes[chave_ordem >= 0], chave_ordem[chave_ordem >= 0]
+        ordem = np.lexsort((self.origens[posicoes], chave_ordem))
+        return self.df.iloc[posicoes[ordem]]
+
+class MotorDuplicidade:
+    """
+    Executa as verificações de VERIFICACOES_DUPLICIDADE sobre os dados consolidados,
+    reaproveitando um único IndiceDuplicidade por (tabela, colunas-chave).
+    """
+    def __init__(self, dados_consolidados):
+        self.dados = dados_consolidados
+        self._indices = {}
+
+    def indice(self, nome_logico, colunas_chave):
+        """Retorna (criando na primeira vez) o índice da tabela pelas colunas-chave."""
+        chave = (nome_logico, tuple(colunas_chave))
+        if chave not in self._indices:
+            df = self.dados.get(nome_logico)
+            self._indices[chave] = IndiceDuplicidade(df, colunas_chave) if df is not None and not df.empty else None
+        return self._indices[chave]
+
+    def verificar(self, verificacoes=VERIFICACOES_DUPLICIDADE):
+        """Retorna um dicionário título -> DataFrame das linhas em conflito, na ordem do relatório."""
+        secoes = {}
+        for titulo, nome_logico, colunas_chave, colunas_relatorio, ignorar_nula in verificacoes:
+            indice = self.indice(nome_logico, colunas_chave)
+            secoes[titulo] = indice.conflitos_ordenados(colunas_relatorio[0], ignorar_nula) if indice is not None else None
+        return secoes
+
+def encontrar_duplicados(df, colunas_chave, ignorar_chave_nula=False, coluna_ordenacao=None):
+    """
+    Retorna as linhas de 'df' cuja chave aparece em mais de um banco ('origem_db').
+
+    Parâmetros:
+    - df (DataFrame): Dados consolidados de uma tabela.
+    - colunas_chave (list): Colunas que formam a chave comparada.
+    - ignorar_chave_nula (bool): Se True, linhas com a primeira coluna da chave nula são descartadas.
+    - coluna_ordenacao (str, opcional): Coluna que ordena o resultado (padrão: a primeira da chave).
+
+    Retorna:
+    - DataFrame ou None: As linhas em conflito, na ordem do relatório (None se não houver dados).
+    """
+    if df is None or df.empty: return None
+    return IndiceDuplicidade(df, colunas_chave).conflitos_ordenados(coluna_ordenacao or colunas_chave[0], ignorar_chave_nula)
+
+def montar_query_pushdown(bancos, nome_logico, colunas_chave, colunas_relatorio, ignorar_chave_nula=False):
+    """
+    Monta a consulta que encontra, no próprio servidor, as linhas com chave repetida entre os bancos.
+
+    A consulta une a tabela de todos os bancos com nomes de três partes ([banco].[dbo].[tabela])
+    em um UNION ALL e devolve somente as linhas cuja chave aparece em mais de um banco.
+    A primeira coluna ('ordem_db') é a posição do banco em 'bancos' e ordena o resultado.
     """
-    Função para gerar seções de relatório de texto a partir de um DataFrame.
+    tabela = CONFIG_TABELAS[nome_logico]["tabela"]
+    colunas = [c for c in dict.fromkeys(colunas_chave + colunas_relatorio) if c != 'origem_db']
+    lista_colunas = ", ".join(citar_identificador(c) for c in colunas)
+    filtros = []
+    if ignorar_chave_nula:
+        filtros.append(f"{citar_identificador(colunas_chave[0])} IS NOT NULL")
+    if nome_logico == "empresas":
+        filtros.append(f"([cnpj] IS NULL OR [cnpj] <> N'{CNPJ_EMPRESA_TESTE}')")
+    where = (" WHERE " + " AND ".join(filtros)) if filtros else ""
+    partes = [
+        f"SELECT {i} AS ordem_db, {lista_colunas} FROM {citar_identificador(banco)}.[dbo].{citar_identificador(tabela)}{where}"
+        for i, banco in enumerate(bancos)
+    ]
+    # Uma única passada com funções de janela: a linha entra no resultado se o seu grupo tem
+    # bancos diferentes. O PARTITION BY já considera iguais duas chaves nulas, como o pandas
+    # faz em 'duplicated', e não exige uma junção da tabela unida com ela mesma.
+    particao = "PARTITION BY " + ", ".join(citar_identificador(c) for c in colunas_chave)
+    return (
+        "WITH u AS (\n" + "\nUNION ALL\n".join(partes) + "\n), "
+        f"g AS (SELECT *, MIN(ordem_db) OVER ({particao}) AS menor_db, MAX(ordem_db) OVER ({particao}) AS maior_db FROM u)\n"
+        f"SELECT ordem_db, {lista_colunas} FROM g WHERE menor_db <> maior_db ORDER BY ordem_db;"
+    )
+
+def executar_verificacoes_pushdown(gerenciador, bancos, status_callback, tabelas_contagem, verificacoes=VERIFICACOES_DUPLICIDADE, instrumentacao=None, nomes_no_servidor=None):
+    """
+    Executa as verificações de VERIFICACOES_DUPLICIDADE direto no servidor (modo pushdown).
+
+    Só as linhas que colidem trafegam pela rede. Como a comparação do SQL Server pode ser mais
+    permissiva que a do pandas (ex: collation que ignora maiúsculas), o resultado de cada consulta
+    passa de novo por 'encontrar_duplicados' para ficar idêntico ao da análise local.
 
     Parâmetros:
-    - titulo (str): O título da seção de verificação no relatório.
-    - df (DataFrame): O DataFrame do pandas contendo os dados a serem relatados.
-    - colunas_relatorio (list): Lista de colunas a serem exibidas no relatório.
-    - arquivo_handle (file object): O arquivo de texto onde o relatório será escrito.
-    
+    - gerenciador (GerenciadorConexoes): Pool de sessões do servidor.
+    - bancos (list): Bancos a comparar.
+    - status_callback (function): Função para atualizar o status na GUI.
+    - tabelas_contagem (list): Tabelas lógicas que não serão extraídas e só precisam de COUNT(*).
+    - verificacoes (list): Itens de VERIFICACOES_DUPLICIDADE a executar (padrão: todos).
+    - instrumentacao (Instrumentacao, opcional): Mede cada verificação e acompanha o progresso.
+    - nomes_no_servidor (list, opcional): Nomes reais dos bancos no servidor, na ordem de 'bancos',
+      quando os nomes do relatório são outros (padrão: os próprios 'bancos').
+
     Retorna:
-    - bool: True se dados foram escritos, False caso contrário.
+    - tuple: (secoes, contagens), onde 'secoes' mapeia o título da verificação para o DataFrame
+      de duplicados e 'contagens' mapeia (nome_db, nome_logico) para o número de linhas.
+
+    Lança:
+    - Exception: Qualquer erro de consulta (ex: servidor que não permite consultas entre bancos);
+      o chamador volta para a análise local.
+    - AnaliseCancelada: Se o cancelamento foi pedido entre uma verificação e outra.
     """
-    # Verifica se o DataFrame não é nulo e não está vazio
-    if df is not None and not df.empty:
-        # Escreve o cabeçalho da seção
-        arquivo_handle.write("=" * 80 + "\n")
-        arquivo_handle.write(f"VERIFICAÇÃO: {titulo}\n")
-        arquivo_handle.write("=" * 80 + "\n")
-        
-        # Garante que as colunas a serem exibidas existem no DataFrame
-        colunas_existentes = [c for c in colunas_relatorio if c in df.columns]
-        if not colunas_existentes: return False
-        
-        # Obtém a primeira coluna para usar na ordenação do relatório
-        primeira_coluna_para_ordenar = colunas_existentes[0]
-        
-        # Remove linhas com valores nulos na coluna de ordenação
-        df_limpo = df.dropna(subset=[primeira_coluna_para_ordenar])
-        
-        # Se ainda houver dados, ordena e escreve a tabela no arquivo
-        if not df_limpo.empty:
-            df_ordenado = df_limpo[colunas_existentes].sort_values(by=primeira_coluna_para_ordenar)
-            arquivo_handle.write(df_ordenado.to_string(index=False))
-            arquivo_handle.write("\n\n")
-            return True
-    return False
+    secoes = {}
+    contagens = {}
+    nomes_no_servidor = bancos if nomes_no_servidor is None else nomes_no_servidor
+    instrumentacao = instrumentacao or Instrumentacao()
+    instrumentacao.iniciar_fase("Verificações no servidor", len(verificacoes))
+    with gerenciador.conexao("master") as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.arraysize = TAMANHO_LOTE
+            for titulo, nome_logico, colunas_chave, colunas_relatorio, ignorar_nula in verificacoes:
+                status_callback(f"Verificando no servidor: {titulo}...")
+                with instrumentacao.medir("verificacao", verificacao=titulo, origem="servidor") as registro:
+                    cursor.execute(montar_query_pushdown(nomes_no_servidor, nome_logico, colunas_chave, colunas_relatorio, ignorar_nula))
+                    colunas = [d[0] for d in cursor.description][1:]
+                    buffer = BufferTabela(colunas)
+                    while True:
+                        linhas = cursor.fetchmany(TAMANHO_LOTE)
+                        if not linhas: break
+                        # O resultado vem ordenado por banco: cada trecho contínuo vira um lote com a sua origem
+                        inicio = 0
+                        for fim in range(1, len(linhas) + 1):
+                            if fim == len(linhas) or linhas[fim][0] != linhas[inicio][0]:
+                                buffer.adicionar_lote([tuple(l)[1:] for l in linhas[inicio:fim]], bancos[linhas[inicio][0]])
+                                inicio = fim
+                    registro["bytes"] = buffer.tamanho_bytes()
+                    secoes[titulo] = encontrar_duplicados(buffer.para_dataframe(), colunas_chave, ignorar_nula, colunas_relatorio[0])
+                    registro["linhas"] = 0 if secoes[titulo] is None else len(secoes[titulo])
+                instrumentacao.avancar()
 
-def extrair_dados(nome_logico, config_db, conn_str):
+            # As tabelas que não serão extraídas ainda aparecem no sumário: basta contar as linhas
+            for nome_logico in tabelas_contagem:
+                tabela = citar_identificador(CONFIG_TABELAS[nome_logico]["tabela"])
+                cursor.execute("\nUNION ALL\n".join(
+                    f"SELECT {i} AS ordem_db, COUNT(*) AS total FROM {citar_identificador(banco)}.[dbo].{tabela}"
+                    for i, banco in enumerate(nomes_no_servidor)
+                ) + ";")
+                for ordem_db, total in cursor.fetchall():
+                    contagens[(bancos[ordem_db], nome_logico)] = int(total)
+        finally:
+            cursor.close()
+    return secoes, contagens
+
+# Seção de Validação de Datas
+# Cada coluna de data é convertida uma única vez; a contagem de ativos/demitidos e as três
+# validações (formato, intervalo e demissão antes da admissão) reaproveitam essa conversão.
+
+def converter_datas(serie):
     """
-    Extrai dados de uma tabela específica de um banco de dados SQL Server.
+    Converte uma coluna de datas para datetime64 uma única vez, com formatos explícitos.
+
+    Colunas que já chegaram tipadas (datetime64) são devolvidas sem conversão. Nas demais,
+    cada formato de FORMATOS_DATA é tentado só nos valores que os anteriores não reconheceram.
+
+    Retorna:
+    - Series: As datas convertidas (NaT para vazios e valores em formato inválido).
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie.dtype): return serie
+    convertida = None
+    for formato in FORMATOS_DATA:
+        pendentes = serie.notna() if convertida is None else (serie.notna() & convertida.isna())
+        if not pendentes.any(): break
+        parcial = pd.to_datetime(serie[pendentes], format=formato, errors='coerce')
+        convertida = parcial.reindex(serie.index) if convertida is None else convertida.fillna(parcial)
+    if convertida is None:
+        convertida = pd.Series(pd.NaT, index=serie.index, dtype='datetime64[ns]')
+    return convertida
+
+def validar_datas_funcionarios(df, datas):
+    """
+    Aplica as validações de data sobre as colunas já convertidas.
 
     Parâmetros:
-    - nome_logico (str): O nome lógico da tabela (ex: "empresas").
-    - config_db (dict): Dicionário com informações do banco de dados de origem.
-    - conn_str (str): A string de conexão com o banco de dados.
+    - df (DataFrame): Funcionários consolidados (com os valores originais).
+    - datas (dict): Coluna -> Series convertida por 'converter_datas'.
 
     Retorna:
-    - DataFrame: Um DataFrame do pandas com os dados da tabela.
+    - DataFrame: Tabela compacta de erros, com a posição da linha em 'df' ('posicao') e o
+      'motivo_erro', em vez de cópias das linhas inteiras.
     """
-    config_tabela = CONFIG_TABELAS.get(nome_logico, {})
-    if not config_tabela: return pd.DataFrame()
-    tabela = config_tabela["tabela"]
-    # Monta a query de forma segura, garantindo a qualificação do esquema
-    colunas_str = ", ".join(f"[dbo].[{tabela}].[{c}] AS [{c}]" for c in config_tabela["colunas"])
-    query = f"SELECT {colunas_str} FROM [dbo].[{tabela}];"
-    
+    erros = []
+
+    def registrar(mascara, motivo):
+        posicoes = np.flatnonzero(mascara.to_numpy(dtype=bool, na_value=False))
+        if len(posicoes):
+            motivos = motivo.iloc[posicoes].to_numpy() if isinstance(motivo, pd.Series) else motivo
+            erros.append(pd.DataFrame({'posicao': posicoes, 'motivo_erro': motivos}))
+
+    # 1. Checa formato de data inválido (valor preenchido que nenhum formato reconheceu)
+    for col, convertida in datas.items():
+        original = df[col]
+        invalido = original.notna() & convertida.isna()
+        if invalido.any():
+            registrar(invalido, f"Formato de data inválido em '{col}' (Valor: " + original.astype(str) + ")")
+
+    # 2. Checa datas fora do range aceitável
+    for col, convertida in datas.items():
+        registrar(convertida.notna() & ((convertida < DATA_MINIMA) | (convertida > DATA_MAXIMA)), f"Data em '{col}' fora do range (1900-2079)")
+
+    # 3. Checa inconsistência lógica: demissão antes da admissão
+    if 'admissao' in datas and 'demissao' in datas:
+        admissao, demissao = datas['admissao'], datas['demissao']
+        registrar(admissao.notna() & demissao.notna() & (demissao < admissao), "Demissão anterior à admissão")
+
+    if not erros: return pd.DataFrame({'posicao': pd.Series(dtype=np.int64), 'motivo_erro': pd.Series(dtype=object)})
+    return pd.concat(erros, ignore_index=True)
+
+def montar_relatorio_erros_datas(df, datas, erros):
+    """Monta, só para as linhas com erro, as colunas da seção de datas do relatório."""
+    posicoes = erros['posicao'].to_numpy()
+    linhas = {'id': df['id'].iloc[posicoes].to_numpy(), 'nome': df['nome'].iloc[posicoes].to_numpy()}
+    for col in ['admissao', 'demissao', 'nascimento']:
+        if col in datas: linhas[col] = datas[col].iloc[posicoes].to_numpy()
+    linhas['motivo_erro'] = erros['motivo_erro'].to_numpy()
+    linhas['origem_db'] = df['origem_db'].iloc[posicoes].to_numpy()
+    resultado = pd.DataFrame(linhas)
+    resultado['origem_db'] = pd.Categorical(resultado['origem_db'], categories=df['origem_db'].cat.categories) if isinstance(df['origem_db'].dtype, pd.CategoricalDtype) else resultado['origem_db']
+    return resultado.drop_duplicates(subset=['id', 'origem_db', 'motivo_erro'])
+
+# Seção de Afastamentos
+# A sobreposição é procurada por funcionário dentro de cada banco de origem: ids iguais em
+# bancos diferentes são pessoas diferentes e não podem ser comparados entre si.
+
+def encontrar_afastamentos_sobrepostos(df_afastamentos):
+    """
+    Encontra todos os afastamentos que se sobrepõem a outro do mesmo funcionário no mesmo banco.
+
+    Os afastamentos são ordenados uma única vez por (origem_db, funcionario_id, data_inicio) e
+    percorridos mantendo o maior 'data_fim' já visto no grupo. Um afastamento se sobrepõe a um
+    anterior quando começa antes (ou no dia) desse maior fim, e a um posterior quando termina
+    depois (ou no dia) do início do próximo. Assim, cada afastamento envolvido em qualquer
+    sobreposição é encontrado em O(n log n), e não só o que vem logo depois do outro.
+
+    Parâmetros:
+    - df_afastamentos (DataFrame): Afastamentos consolidados.
+
+    Retorna:
+    - DataFrame: Os afastamentos sobrepostos (funcionario_id, data_inicio, data_fim, origem_db),
+      com as datas já convertidas. Linhas sem funcionário ou sem datas válidas são ignoradas.
+    """
+    inicio = converter_datas(df_afastamentos['data_inicio'])
+    fim = converter_datas(df_afastamentos['data_fim'])
+    validos = (df_afastamentos['funcionario_id'].notna() & inicio.notna() & fim.notna()).to_numpy(dtype=bool)
+    posicoes = np.flatnonzero(validos)
+
+    # Chaves numéricas para a ordenação: banco, funcionário e as datas em microssegundos
+    origens = _codificar_coluna(df_afastamentos['origem_db'])[0][posicoes]
+    funcionarios = _codificar_coluna(df_afastamentos['funcionario_id'])[0][posicoes]
+    inicios = inicio.to_numpy()[posicoes].astype('datetime64[us]').view(np.int64)
+    fins = fim.to_numpy()[posicoes].astype('datetime64[us]').view(np.int64)
+    ordem = np.lexsort((fins, inicios, funcionarios, origens))
+    origens, funcionarios, inicios, fins = origens[ordem], funcionarios[ordem], inicios[ordem], fins[ordem]
+
+    # Marca onde começa cada grupo (banco, funcionário) na ordem já ordenada
+    novo_grupo = np.ones(len(ordem), dtype=bool)
+    novo_grupo[1:] = (origens[1:] != origens[:-1]) | (funcionarios[1:] != funcionarios[:-1])
+
+    # Maior 'data_fim' entre os afastamentos anteriores do mesmo grupo (varredura com máximo acumulado)
+    fim_maximo = pd.Series(fins).groupby(np.cumsum(novo_grupo)).cummax().to_numpy()
+    sobrepoe_anterior = np.zeros(len(ordem), dtype=bool)
+    sobrepoe_anterior[1:] = ~novo_grupo[1:] & (inicios[1:] <= fim_maximo[:-1])
+
+    # Como os inícios estão em ordem, basta comparar o fim com o início do próximo do grupo
+    sobrepoe_posterior = np.zeros(len(ordem), dtype=bool)
+    sobrepoe_posterior[:-1] = ~novo_grupo[1:] & (fins[:-1] >= inicios[1:])
+
+    selecionadas = posicoes[ordem[sobrepoe_anterior | sobrepoe_posterior]]
+    return pd.DataFrame({
+        'funcionario_id': df_afastamentos['funcionario_id'].iloc[selecionadas].to_numpy(),
+        'data_inicio': inicio.iloc[selecionadas].to_numpy(),
+        'data_fim': fim.iloc[selecionadas].to_numpy(),
+        'origem_db': df_afastamentos['origem_db'].iloc[selecionadas].astype(str).to_numpy(),
+    })
+
+def anexar_nomes_funcionarios(df, df_funcionarios):
+    """
+    Acrescenta a coluna 'nome' buscando o funcionário por (origem_db, funcionario_id).
+
+    A busca é um-para-um: cada (origem_db, id) aparece uma única vez na tabela de nomes, então o
+    resultado tem exatamente as mesmas linhas de 'df', mesmo que vários bancos reutilizem os ids.
+    """
+    if df_funcionarios is None or df_funcionarios.empty:
+        return df.assign(nome=pd.NA)
+    nomes = pd.DataFrame({
+        'origem_db': df_funcionarios['origem_db'].astype(str).to_numpy(),
+        'funcionario_id': df_funcionarios['id'].to_numpy(),
+        'nome': df_funcionarios['nome'].to_numpy(),
+    }).drop_duplicates(subset=['origem_db', 'funcionario_id'])
+    return df.merge(nomes, on=['origem_db', 'funcionario_id'], how='left', validate='many_to_one')
+
+# Seção de Análise Incremental
+# Cada tabela de cada banco é incorporada assim que a sua extração termina: as chaves entram em
+# índices acumulados (duplicidades e horários) e as verificações que não cruzam bancos (datas e
+# afastamentos) são feitas na hora, só sobre aquele banco. Assim os conflitos aparecem no status
+# ainda durante a extração, e os dados brutos de cada banco são liberados logo depois, ficando
+# só as colunas que o relatório ainda vai usar.
+
+def _hash_chaves(df, colunas_chave):
+    """
+    Hash (uint64) das colunas-chave de cada linha. Valores iguais têm sempre o mesmo hash, e
+    todos os nulos também; colisões só podem acrescentar linhas, nunca esconder um conflito.
+    """
+    return pd.util.hash_pandas_object(df[colunas_chave].astype(object), index=False).to_numpy()
+
+def _unicos_ordenados(valores):
+    """Valores distintos, em ordem (por ordenação; bem mais rápido que np.unique para hashes uint64)."""
+    valores = np.sort(valores)
+    return valores[np.r_[True, valores[1:] != valores[:-1]]] if len(valores) else valores
+
+def _contidos(valores, ordenados):
+    """Máscara de quais 'valores' estão no array 'ordenados' (ordenado e sem repetições)."""
+    if len(ordenados) == 0: return np.zeros(len(valores), dtype=bool)
+    posicoes = np.minimum(np.searchsorted(ordenados, valores), len(ordenados) - 1)
+    return ordenados[posicoes] == valores
+
+class AnaliseIncremental:
+    """
+    Analisa os bancos à medida que as tabelas chegam, em qualquer ordem.
+
+    - Duplicidades: para cada verificação, um índice com os hashes das chaves já vistas em
+      outros bancos e os hashes que já estão em conflito (presentes em mais de um banco).
+    - Horários: os pares (nome, numero) distintos de todos os bancos, para achar nomes com
+      mais de um código.
+    - Datas dos funcionários e afastamentos sobrepostos: verificados no próprio banco, porque
+      não dependem dos outros (os afastamentos são comparados só dentro de cada banco).
+
+    Em 'finalizar', só as linhas cujas chaves estão em conflito são consolidadas, na ordem dos
+    bancos, e passam pelo MotorDuplicidade; as seções saem iguais às da análise feita sobre todos
+    os dados consolidados.
+
+    Uso:
+        analise = AnaliseIncremental(bancos, status_callback)
+        analise.incorporar(nome_db, nome_logico, buffer)  # para cada extração concluída
+        secoes = analise.finalizar()
+    """
+    def __init__(self, bancos, status_callback, verificar_duplicidades=True, verificacoes=None, instrumentacao=None):
+        """
+        Parâmetros:
+        - bancos (list): Nomes de origem dos bancos, na ordem do relatório.
+        - status_callback (function): Recebe os avisos de conflitos encontrados durante a extração.
+        - verificar_duplicidades (bool): False quando as duplicidades já foram verificadas no
+          servidor (modo pushdown).
+        - verificacoes (list, opcional): Identificadores de REGISTRO_VERIFICACOES a executar
+          (padrão: todas).
+        - instrumentacao (Instrumentacao, opcional): Mede cada incorporação e cada verificação.
+        """
+        self.bancos = list(bancos)
+        self.status_callback = status_callback
+        self.instrumentacao = instrumentacao or Instrumentacao()
+        self.selecionadas = resolver_verificacoes(verificacoes)
+        self.verificacoes = filtrar_duplicidades(self.selecionadas) if verificar_duplicidades else []
+        self.contagem_registros = {nome_db: {} for nome_db in self.bancos}
+        self.conflitos = 0
+
+        # Colunas de cada tabela guardadas até o final; as demais são liberadas ao incorporar
+        self._colunas_retidas = {}
+        if "horarios" in self.selecionadas: self._colunas_retidas["horarios"] = ['nome', 'numero', 'dia_semana']
+        if "afastamentos" in self.selecionadas: self._colunas_retidas["funcionarios"] = ['id', 'nome']
+        for _, nome_logico, colunas_chave, colunas_relatorio, _ in self.verificacoes:
+            colunas = self._colunas_retidas.setdefault(nome_logico, [])
+            colunas.extend(c for c in colunas_chave + colunas_relatorio if c != 'origem_db' and c not in colunas)
+
+        self._partes = {}          # (nome_logico, nome_db) -> DataFrame só com as colunas retidas
+        self._hashes = {}          # (titulo, nome_db) -> (hash da chave, linha participa da verificação)
+        self._chaves_vistas = {titulo: np.empty(0, dtype=np.uint64) for titulo, *_ in self.verificacoes}
+        self._chaves_em_conflito = {titulo: np.empty(0, dtype=np.uint64) for titulo, *_ in self.verificacoes}
+        self._pares_horarios = pd.DataFrame(columns=['nome', 'numero'])
+        self._nomes_horarios_em_conflito = set()
+        self._erros_datas = {}     # nome_db -> linhas da seção de datas
+        self._sobreposicoes = {}   # nome_db -> afastamentos sobrepostos
+
+    def incorporar(self, nome_db, nome_logico, buffer):
+        """
+        Incorpora a tabela 'nome_logico' do banco 'nome_db' e libera os seus dados brutos.
+
+        Retorna:
+        - int: Quantidade de conflitos novos encontrados com esta tabela.
+        """
+        if buffer is None or buffer.linhas == 0: return 0
+        with self.instrumentacao.medir("analise", banco=nome_db, tabela=nome_logico) as registro:
+            registro["linhas"], registro["bytes"] = buffer.linhas, buffer.tamanho_bytes()
+            novos = self._incorporar(nome_db, nome_logico, buffer)
+        if novos:
+            self.conflitos += novos
+            self.status_callback(f"{nome_db} / {nome_logico}: {novos} conflito(s) novo(s) ({self.conflitos} até agora)")
+        return novos
+
+    def _incorporar(self, nome_db, nome_logico, buffer):
+        # Lógica de contagem específica para cada tabela
+        if nome_logico == "horarios":
+            # Conta o número de horários únicos (baseado na coluna 'numero')
+            self.contagem_registros[nome_db][nome_logico] = buffer.coluna('numero').nunique()
+        elif nome_logico != "funcionarios":
+            # Para as outras tabelas, conta o número total de linhas (funcionários são contados abaixo)
+            self.contagem_registros[nome_db][nome_logico] = buffer.linhas
+        df = buffer.para_dataframe()
+
+        novos = 0
+        if nome_logico == "empresas":
+            # Filtra a empresa de teste antes das verificações de duplicidade
+            # (CNPJs nulos (<NA>) não são a empresa de teste e continuam na análise)
+            df = df[~(df["cnpj"] == CNPJ_EMPRESA_TESTE).fillna(False).astype(bool)]
+        elif nome_logico == "funcionarios":
+            novos += self._verificar_datas(nome_db, df)
+        elif nome_logico == "afastamentos" and "afastamentos" in self.selecionadas:
+            sobreposicoes = encontrar_afastamentos_sobrepostos(df)
+            if not sobreposicoes.empty: self._sobreposicoes[nome_db] = sobreposicoes
+            novos += len(sobreposicoes)
+
+        colunas = self._colunas_retidas.get(nome_logico)
+        if colunas: novos += self._indexar_e_reter(nome_db, nome_logico, df[colunas])
+        return novos
+
+    def _indexar_e_reter(self, nome_db, nome_logico, df):
+        """Acrescenta as colunas retidas de uma tabela aos índices entre bancos e as guarda até 'finalizar'."""
+        novos = 0
+        if nome_logico == "horarios" and "horarios" in self.selecionadas:
+            novos += self._indexar_horarios(df)
+        for titulo, tabela, colunas_chave, _, ignorar_nula in self.verificacoes:
+            if tabela == nome_logico:
+                novos += self._indexar_chaves(titulo, nome_db, df, colunas_chave, ignorar_nula)
+        self._reter(nome_db, nome_logico, df)
+        return novos
+
+    def estado(self, nome_db):
+        """
+        Resultado da análise de um banco já incorporado, para ser guardado no IndiceBancos.
+
+        Retorna:
+        - dict: 'contagem' (sumário), 'erros_datas' e 'sobreposicoes' (DataFrames ou None) e
+          'tabelas' (tabela lógica -> colunas retidas).
+        """
+        tabelas = {}
+        for nome_logico in self._colunas_retidas:
+            parte = self._parte(nome_db, nome_logico)
+            if parte is not None: tabelas[nome_logico] = parte
+        return {
+            "contagem": self.contagem_registros.get(nome_db, {}),
+            "erros_datas": self._erros_datas.get(nome_db),
+            "sobreposicoes": self._sobreposicoes.get(nome_db),
+            "tabelas": tabelas,
+        }
+
+    def restaurar(self, nome_db, estado):
+        """
+        Incorpora um banco a partir do estado guardado numa execução anterior (ver 'estado'), sem
+        extraí-lo: as verificações do próprio banco são reaproveitadas e as colunas retidas entram
+        nos índices entre bancos como se tivessem acabado de chegar.
+        """
+        self.contagem_registros[nome_db] = estado["contagem"]
+        if estado["erros_datas"] is not None:
+            self._erros_datas[nome_db] = estado["erros_datas"].assign(origem_db=nome_db)
+        if estado["sobreposicoes"] is not None:
+            self._sobreposicoes[nome_db] = estado["sobreposicoes"].assign(origem_db=nome_db)
+        for nome_logico, df in estado["tabelas"].items():
+            if nome_logico in self._colunas_retidas:
+                self._indexar_e_reter(nome_db, nome_logico, df[self._colunas_retidas[nome_logico]])
+
+    def _verificar_datas(self, nome_db, df):
+        """Conta ativos/demitidos e valida as datas dos funcionários deste banco (conversão única)."""
+        validar = "datas_funcionarios" in self.selecionadas
+        datas = {col: converter_datas(df[col]) for col in (COLUNAS_DATA_FUNCIONARIOS if validar else ['demissao']) if col in df.columns}
+        demitidos = int(datas['demissao'].notna().sum()) if 'demissao' in datas else 0
+        self.contagem_registros[nome_db]['funcionarios'] = {'ativos': len(df) - demitidos, 'demitidos': demitidos}
+        if not validar or not datas: return 0
+        erros = validar_datas_funcionarios(df, datas)
+        if erros.empty: return 0
+        self._erros_datas[nome_db] = montar_relatorio_erros_datas(df, datas, erros)
+        return len(self._erros_datas[nome_db])
+
+    def _indexar_horarios(self, df):
+        """Acrescenta os pares (nome, numero) do banco e retorna quantos nomes passaram a ter mais de um código."""
+        pares = df[['nome', 'numero']].dropna(subset=['nome']).drop_duplicates()
+        self._pares_horarios = pd.concat([self._pares_horarios, pares], ignore_index=True).drop_duplicates()
+        quantidade_codigos = self._pares_horarios.groupby('nome', sort=False)['numero'].size()
+        em_conflito = set(quantidade_codigos.index[quantidade_codigos > 1])
+        novos = len(em_conflito - self._nomes_horarios_em_conflito)
+        self._nomes_horarios_em_conflito = em_conflito
+        return novos
+
+    def _indexar_chaves(self, titulo, nome_db, df, colunas_chave, ignorar_nula):
+        """Atualiza o índice da verificação com as chaves do banco e retorna quantas viraram conflito."""
+        hashes = _hash_chaves(df, colunas_chave)
+        participa = df[colunas_chave[0]].notna().to_numpy() if ignorar_nula else np.ones(len(df), dtype=bool)
+        self._hashes[(titulo, nome_db)] = (hashes, participa)
+        chaves = _unicos_ordenados(hashes[participa])
+        vistas, em_conflito = self._chaves_vistas[titulo], self._chaves_em_conflito[titulo]
+        # Chaves deste banco que já apareceram em outro banco são conflitos de unificação
+        repetidas = chaves[_contidos(chaves, vistas)]
+        novas = repetidas[~_contidos(repetidas, em_conflito)]
+        self._chaves_em_conflito[titulo] = _unicos_ordenados(np.concatenate([em_conflito, novas]))
+        self._chaves_vistas[titulo] = _unicos_ordenados(np.concatenate([vistas, chaves]))
+        return len(novas)
+
+    def _reter(self, nome_db, nome_logico, df):
+        """Guarda as colunas retidas de uma tabela até 'finalizar'."""
+        self._partes[(nome_logico, nome_db)] = df
+
+    def _parte(self, nome_db, nome_logico):
+        """Colunas retidas de uma tabela de um banco (None se a tabela não veio)."""
+        return self._partes.get((nome_logico, nome_db))
+
+    def _consolidar(self, nome_logico, filtro, bancos=None):
+        """Junta, na ordem dos bancos, as partes retidas de uma tabela (só as linhas de 'filtro(nome_db, parte)')."""
+        buffer = BufferTabela(self._colunas_retidas[nome_logico])
+        for nome_db in (self.bancos if bancos is None else bancos):
+            parte = self._partes.get((nome_logico, nome_db))
+            if parte is not None:
+                buffer.adicionar_dataframe(parte[filtro(nome_db, parte)], nome_db)
+        return buffer.para_dataframe()
+
+    def _horarios_em_conflito(self):
+        """Linhas (consolidadas) dos horários cujo nome tem mais de um código, ou None."""
+        nomes_em_conflito = self._nomes_horarios_em_conflito
+        if not nomes_em_conflito: return None
+        return self._consolidar("horarios", lambda nome_db, parte: parte['nome'].isin(nomes_em_conflito).to_numpy())
+
+    def _linhas_em_conflito(self, nome_logico):
+        """Linhas (consolidadas) da tabela com alguma chave em conflito em qualquer das suas verificações."""
+        def filtro(nome_db, parte):
+            mascara = np.zeros(len(parte), dtype=bool)
+            for titulo, tabela, *_ in self.verificacoes:
+                if tabela == nome_logico and (titulo, nome_db) in self._hashes:
+                    hashes, participa = self._hashes[(titulo, nome_db)]
+                    mascara |= participa & _contidos(hashes, self._chaves_em_conflito[titulo])
+            return mascara
+        return self._consolidar(nome_logico, filtro)
+
+    def _nomes_funcionarios(self, bancos):
+        """Colunas 'id' e 'nome' dos funcionários dos bancos informados."""
+        return self._consolidar("funcionarios", lambda nome_db, parte: slice(None), bancos)
+
+    def fechar(self):
+        """Libera os dados retidos (pode ser chamado mais de uma vez)."""
+        self._partes, self._hashes = {}, {}
+
+    def finalizar(self):
+        """
+        Monta os dados das seções do relatório a partir dos índices e das partes retidas.
+
+        Retorna:
+        - dict: 'horarios' (DataFrame para gerar_secao_horarios), 'duplicidades' (título ->
+          DataFrame, como MotorDuplicidade.verificar), 'erros_datas' e 'sobreposicoes'
+          (DataFrames prontos para o relatório, ou None).
+        """
+        instrumentacao = self.instrumentacao
+        locais = [i for i in ("horarios", "datas_funcionarios", "afastamentos") if i in self.selecionadas]
+        instrumentacao.iniciar_fase("Verificações", len(locais) + len(self.verificacoes))
+
+        @contextmanager
+        def medir(titulo, selecionada=True):
+            # Cada verificação escolhida é medida e conta um passo do progresso
+            if not selecionada:
+                yield {}
+                return
+            with instrumentacao.medir("verificacao", verificacao=titulo) as registro:
+                yield registro
+            instrumentacao.avancar()
+
+        def linhas(df):
+            return 0 if df is None else len(df)
+
+        with medir(REGISTRO_VERIFICACOES["horarios"]["titulo"], "horarios" in self.selecionadas) as registro:
+            secoes = {"horarios": self._horarios_em_conflito()}
+            registro["linhas"] = linhas(secoes["horarios"])
+
+        # Duplicidades: só as linhas com alguma chave em conflito são consolidadas
+        tabelas = list(dict.fromkeys(tabela for _, tabela, *_ in self.verificacoes))
+        dados = {}
+        for tabela in tabelas:
+            with instrumentacao.medir("consolidacao", tabela=tabela) as registro:
+                dados[tabela] = self._linhas_em_conflito(tabela)
+                registro["linhas"] = len(dados[tabela])
+        motor = MotorDuplicidade(dados)
+        secoes["duplicidades"] = {}
+        for verificacao in self.verificacoes:
+            with medir(verificacao[0]) as registro:
+                secoes["duplicidades"].update(motor.verificar([verificacao]))
+                registro["linhas"] = linhas(secoes["duplicidades"][verificacao[0]])
+
+        with medir(REGISTRO_VERIFICACOES["datas_funcionarios"]["titulo"], "datas_funcionarios" in self.selecionadas) as registro:
+            erros = [self._erros_datas[nome_db] for nome_db in self.bancos if nome_db in self._erros_datas]
+            if erros:
+                erros_datas = pd.concat(erros, ignore_index=True)
+                erros_datas['origem_db'] = pd.Categorical(erros_datas['origem_db'].astype(str), categories=sorted(self._erros_datas))
+                secoes["erros_datas"] = erros_datas
+            else:
+                secoes["erros_datas"] = None
+            registro["linhas"] = linhas(secoes["erros_datas"])
+
+        with medir(REGISTRO_VERIFICACOES["afastamentos"]["titulo"], "afastamentos" in self.selecionadas) as registro:
+            sobreposicoes = [self._sobreposicoes[nome_db] for nome_db in self.bancos if nome_db in self._sobreposicoes]
+            if sobreposicoes:
+                bancos_com_sobreposicao = [nome_db for nome_db in self.bancos if nome_db in self._sobreposicoes]
+                nomes = self._nomes_funcionarios(bancos_com_sobreposicao)
+                sobreposicoes_com_nome = anexar_nomes_funcionarios(pd.concat(sobreposicoes, ignore_index=True), nomes if not nomes.empty else None)
+                secoes["sobreposicoes"] = sobreposicoes_com_nome.sort_values(['funcionario_id', 'origem_db', 'data_inicio', 'data_fim'], kind='stable')
+            else:
+                secoes["sobreposicoes"] = None
+            registro["linhas"] = linhas(secoes["sobreposicoes"])
+        self.fechar()
+        return secoes
+
+class AnaliseEmDisco(AnaliseIncremental):
+    """
+    Variante da AnaliseIncremental que consolida em disco, para máquinas com pouca memória.
+
+    As colunas retidas de cada banco vão para um arquivo SQLite em vez de ficarem na memória, e
+    as verificações entre bancos (duplicidades e horários) viram consultas SQL agrupadas sobre
+    índices criados no final; só as linhas em conflito voltam para o pandas. As verificações de
+    um banco só (datas e afastamentos) continuam sendo feitas ao incorporar cada banco, com
+    apenas aquele banco na memória.
+
+    O arquivo é apagado em 'fechar' (chamado por 'finalizar').
+    """
+    def __init__(self, caminho, bancos, status_callback, verificar_duplicidades=True, verificacoes=None, instrumentacao=None):
+        """
+        Parâmetros:
+        - caminho (str): Arquivo SQLite da consolidação (substituído se já existir).
+        - bancos, status_callback, verificar_duplicidades, verificacoes, instrumentacao: Como em
+          AnaliseIncremental.
+        """
+        super().__init__(bancos, status_callback, verificar_duplicidades, verificacoes, instrumentacao)
+        self.caminho = caminho
+        if os.path.exists(caminho): os.remove(caminho)
+        self._conexao = sqlite3.connect(caminho)
+        # O arquivo é descartável: sem diário nem sincronização, as inserções são bem mais rápidas
+        self._conexao.execute("PRAGMA journal_mode = OFF")
+        self._conexao.execute("PRAGMA synchronous = OFF")
+        # O banco de origem é guardado pela posição na seleção; as colunas não têm tipo declarado
+        # para que o SQLite guarde cada valor exatamente como chegou (texto '1' é diferente de 1)
+        self._posicao_banco = {nome_db: i for i, nome_db in enumerate(self.bancos)}
+        for nome_logico, colunas in self._colunas_retidas.items():
+            self._conexao.execute(f"CREATE TABLE {self._citar(nome_logico)} (banco INTEGER NOT NULL, {', '.join(self._citar(c) for c in colunas)})")
+
+    @staticmethod
+    def _citar(nome):
+        """Coloca um nome de tabela/coluna entre aspas duplas, como no SQLite."""
+        return '"' + nome.replace('"', '""') + '"'
+
+    def _indexar_chaves(self, titulo, nome_db, df, colunas_chave, ignorar_nula):
+        # Os conflitos são encontrados no final, por consulta SQL
+        return 0
+
+    def _indexar_horarios(self, df):
+        return 0
+
+    def _reter(self, nome_db, nome_logico, df):
+        """Grava as colunas retidas no SQLite, em lotes de TAMANHO_LOTE linhas."""
+        marcadores = ", ".join("?" * (len(df.columns) + 1))
+        sql = f"INSERT INTO {self._citar(nome_logico)} VALUES ({marcadores})"
+        posicao = self._posicao_banco[nome_db]
+        for inicio in range(0, len(df), TAMANHO_LOTE):
+            lote = df.iloc[inicio:inicio + TAMANHO_LOTE]
+            # Valores nativos do Python (nulos do pandas viram None), que o sqlite3 sabe gravar
+            colunas = [lote[c].astype(object).where(lote[c].notna(), None).tolist() for c in lote.columns]
+            self._conexao.executemany(sql, zip([posicao] * len(lote), *colunas))
+        self._conexao.commit()
+
+    def _consultar(self, colunas, sql, parametros=()):
+        """
+        Executa uma consulta que devolve (banco, *colunas) ordenada por banco e monta o
+        DataFrame consolidado com os mesmos tipos da extração.
+        """
+        buffer = BufferTabela(colunas)
+        cursor = self._conexao.execute(sql, parametros)
+        while True:
+            lote = cursor.fetchmany(TAMANHO_LOTE)
+            if not lote: break
+            inicio = 0
+            for fim in range(1, len(lote) + 1):
+                # Separa o lote em trechos contínuos do mesmo banco (as linhas vêm ordenadas por banco)
+                if fim == len(lote) or lote[fim][0] != lote[inicio][0]:
+                    buffer.adicionar_lote([linha[1:] for linha in lote[inicio:fim]], self.bancos[lote[inicio][0]])
+                    inicio = fim
+        return buffer.para_dataframe()
+
+    def _parte(self, nome_db, nome_logico):
+        colunas = self._colunas_retidas[nome_logico]
+        sql = f"SELECT banco, {', '.join(self._citar(c) for c in colunas)} FROM {self._citar(nome_logico)} WHERE banco = ? ORDER BY rowid"
+        df = self._consultar(colunas, sql, (self._posicao_banco[nome_db],))
+        return None if df.empty else df[colunas]
+
+    def _horarios_em_conflito(self):
+        if "horarios" not in self._colunas_retidas: return None
+        colunas = ", ".join(self._citar(c) for c in self._colunas_retidas["horarios"])
+        self._conexao.execute('CREATE INDEX IF NOT EXISTS ix_horarios_nome ON horarios (nome, numero)')
+        # Nomes com mais de um 'numero' distinto (o nulo conta como um código, como no pandas)
+        sql = (f"SELECT banco, {colunas} FROM horarios WHERE nome IN ("
+               "SELECT nome FROM (SELECT DISTINCT nome, numero FROM horarios WHERE nome IS NOT NULL) GROUP BY nome HAVING COUNT(*) > 1"
+               ") ORDER BY banco, rowid")
+        df = self._consultar(self._colunas_retidas["horarios"], sql)
+        return None if df.empty else df
+
+    def _linhas_em_conflito(self, nome_logico):
+        tabela = self._citar(nome_logico)
+        subconsultas = []
+        for indice, (titulo, tabela_verificacao, colunas_chave, _, ignorar_nula) in enumerate(self.verificacoes):
+            if tabela_verificacao != nome_logico: continue
+            chave = [self._citar(c) for c in colunas_chave]
+            self._conexao.execute(f"CREATE INDEX IF NOT EXISTS ix_{nome_logico}_{indice} ON {tabela} ({', '.join(chave)}, banco)")
+            filtro_nulo = f" WHERE {chave[0]} IS NOT NULL" if ignorar_nula else ""
+            # 'IS' compara nulos como iguais: chaves nulas formam um grupo, como no MotorDuplicidade
+            juncao = " AND ".join(f"t.{c} IS g.{c}" for c in chave)
+            subconsultas.append(
+                f"SELECT t.rowid FROM {tabela} t JOIN (SELECT {', '.join(chave)} FROM {tabela}{filtro_nulo} "
+                f"GROUP BY {', '.join(chave)} HAVING COUNT(DISTINCT banco) > 1) g ON {juncao}"
+                + (f" WHERE t.{chave[0]} IS NOT NULL" if ignorar_nula else ""))
+        colunas = ", ".join(self._citar(c) for c in self._colunas_retidas[nome_logico])
+        sql = f"SELECT banco, {colunas} FROM {tabela} WHERE rowid IN ({' UNION '.join(subconsultas)}) ORDER BY banco, rowid"
+        return self._consultar(self._colunas_retidas[nome_logico], sql)
+
+    def _nomes_funcionarios(self, bancos):
+        posicoes = [self._posicao_banco[nome_db] for nome_db in bancos]
+        sql = f"SELECT banco, id, nome FROM funcionarios WHERE banco IN ({', '.join('?' * len(posicoes))}) ORDER BY banco, rowid"
+        return self._consultar(['id', 'nome'], sql, posicoes)
+
+    def fechar(self):
+        """Fecha e apaga o arquivo SQLite (pode ser chamado mais de uma vez)."""
+        super().fechar()
+        if self._conexao is not None:
+            self._conexao.close()
+            self._conexao = None
+            if os.path.exists(self.caminho): os.remove(self.caminho)
+
+# Seção de Histórico entre Execuções
+# Cada execução grava um índice compacto das inconsistências encontradas (verificação, chave e
+# banco). Na execução seguinte, o relatório aponta o que é novo, o que continua e o que foi
+# resolvido. Opcionalmente, o resultado da análise de cada banco também é guardado (IndiceBancos),
+# para que, na próxima vez, só os bancos que mudaram sejam extraídos e comparados com os
+# índices guardados dos demais.
+
+# Colunas que identificam cada inconsistência das seções que não são de duplicidade
+COLUNAS_CHAVE_ACHADOS = {
+    "horarios": ['nome'],
+    "datas_funcionarios": ['id', 'motivo_erro'],
+    "afastamentos": ['funcionario_id', 'data_inicio', 'data_fim'],
+}
+
+def listar_achados(secoes, secoes_duplicidade, verificacoes):
+    """
+    Monta o índice das inconsistências de uma execução.
+
+    Parâmetros:
+    - secoes (dict): Resultado de AnaliseIncremental.finalizar.
+    - secoes_duplicidade (dict): Título -> DataFrame das duplicidades (local ou pushdown).
+    - verificacoes (list): Identificadores das verificações executadas.
+
+    Retorna:
+    - dict: Identificador da verificação -> lista ordenada de [chave, origem_db], sem repetições.
+      A chave é o texto dos valores das colunas-chave, separados por ' | '.
+    """
+    dados = {"horarios": secoes["horarios"], "datas_funcionarios": secoes["erros_datas"], "afastamentos": secoes["sobreposicoes"]}
+    colunas_chave = dict(COLUNAS_CHAVE_ACHADOS)
+    for titulo, _, chave, colunas_relatorio, _ in VERIFICACOES_DUPLICIDADE:
+        identificador = IDS_DUPLICIDADE[titulo]
+        df = secoes_duplicidade.get(titulo)
+        # Como no relatório, linhas sem a primeira coluna não aparecem
+        dados[identificador] = df.dropna(subset=[colunas_relatorio[0]]) if df is not None else None
+        colunas_chave[identificador] = chave
+    achados = {}
+    for identificador in verificacoes:
+        df = dados.get(identificador)
+        if df is None or df.empty:
+            achados[identificador] = []
+            continue
+        valores = zip(*(df[c].tolist() for c in colunas_chave[identificador]))
+        chaves = [" | ".join(map(_texto_valor, linha)) for linha in valores]
+        achados[identificador] = sorted({(chave, str(origem)) for chave, origem in zip(chaves, df['origem_db'].astype(str))})
+    return achados
+
+def carregar_achados(caminho):
+    """Lê o índice de achados gravado pela execução anterior (None se não existir ou estiver inválido)."""
     try:
-        # Usa um gerenciador de contexto 'with' para garantir que a conexão seja fechada
-        with pyodbc.connect(conn_str, timeout=10) as conn:
-            # Lê os dados do SQL Server diretamente para um DataFrame do pandas
-            df = pd.read_sql(query, conn)
-            # Adiciona uma coluna de origem para identificar de qual banco os dados vieram
-            df['origem_db'] = config_db['nome_identificador']
-            return df
-    except Exception as e:
-        # Em caso de falha, exibe uma mensagem de aviso e retorna um DataFrame vazio
-        print(f"\n[AVISO] Falha ao ler '{tabela}' do banco '{config_db['nome_identificador']}'. Detalhe: {e}")
-        return pd.DataFrame()
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def salvar_achados(caminho, achados, verificacoes, bancos):
+    """Grava o índice de achados desta execução (substituindo o anterior)."""
+    dados = {"gerado_em": datetime.now().isoformat(timespec="seconds"), "verificacoes": list(verificacoes), "bancos": list(bancos), "achados": achados}
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+def comparar_achados(anterior, achados, verificacoes, bancos):
+    """
+    Compara os achados desta execução com os da anterior.
+
+    Só entram na comparação as verificações e os bancos analisados nas duas execuções (uma
+    inconsistência de um banco que ficou de fora agora não é dada como resolvida).
+
+    Parâmetros:
+    - anterior (dict): Conteúdo carregado por 'carregar_achados'.
+    - achados (dict): Resultado de 'listar_achados' desta execução.
+    - verificacoes (list): Identificadores das verificações executadas agora.
+    - bancos (list): Bancos analisados agora.
+
+    Retorna:
+    - tuple: (resumo, detalhes). 'resumo' é um DataFrame com as colunas verificacao, novas,
+      remanescentes e resolvidas (uma linha por verificação comparada); 'detalhes' lista as
+      inconsistências novas e resolvidas (verificacao, situacao, chave, origem_db).
+    """
+    anteriores = anterior.get("achados", {})
+    bancos = set(bancos) & set(anterior.get("bancos", []))
+    linhas_resumo, detalhes = [], []
+    for identificador in verificacoes:
+        if identificador not in anteriores: continue
+        titulo = REGISTRO_VERIFICACOES[identificador]["titulo"]
+        atuais = {tuple(item) for item in achados.get(identificador, []) if item[1] in bancos}
+        antigos = {tuple(item) for item in anteriores[identificador] if item[1] in bancos}
+        novas, resolvidas = sorted(atuais - antigos), sorted(antigos - atuais)
+        linhas_resumo.append({"verificacao": titulo, "novas": len(novas), "remanescentes": len(atuais & antigos), "resolvidas": len(resolvidas)})
+        detalhes += [{"verificacao": titulo, "situacao": "NOVA", "chave": chave, "origem_db": origem} for chave, origem in novas]
+        detalhes += [{"verificacao": titulo, "situacao": "RESOLVIDA", "chave": chave, "origem_db": origem} for chave, origem in resolvidas]
+    resumo = pd.DataFrame(linhas_resumo, columns=["verificacao", "novas", "remanescentes", "resolvidas"])
+    return resumo, pd.DataFrame(detalhes, columns=["verificacao", "situacao", "chave", "origem_db"])
+
+def gerar_secao_comparacao(resumo, detalhes, data_anterior, arquivo_handle, limite_linhas=None, exportador=None):
+    """
+    Escreve a seção de comparação com a execução anterior: a contagem de inconsistências novas,
+    remanescentes e resolvidas por verificação e, em seguida, a lista das novas e das resolvidas.
+    """
+    if resumo.empty: return
+    titulo = "Comparação com a Execução Anterior"
+    arquivo_handle.write("=" * 80 + f"\n{titulo.upper()} ({data_anterior})\n" + "=" * 80 + "\n")
+    escrever_tabela(resumo, arquivo_handle)
+    arquivo_handle.write("\n\n")
+    if detalhes.empty: return
+    caminho_secao = exportador.exportar(titulo, detalhes) if exportador is not None else None
+    escritas = min(len(detalhes), limite_linhas) if limite_linhas else len(detalhes)
+    escrever_tabela(detalhes.iloc[:escritas], arquivo_handle)
+    if escritas < len(detalhes): _escrever_aviso_limite(arquivo_handle, len(detalhes), escritas, caminho_secao)
+    arquivo_handle.write("\n\n")
+
+class IndiceBancos:
+    """
+    Resultado da análise de cada banco (colunas retidas, contagens e verificações do próprio
+    banco), guardado para a reverificação só dos bancos alterados.
+
+    Cada banco fica numa subpasta com um 'estado.json' e um arquivo por tabela. O estado só é
+    reaproveitado se as impressões digitais das tabelas (ver calcular_impressao_digital), as
+    verificações escolhidas e as colunas extraídas forem as mesmas da execução que o gravou.
+    """
+    def __init__(self, pasta):
+        self.pasta = pasta
+        os.makedirs(pasta, exist_ok=True)
+
+    def _pasta_banco(self, servidor, banco):
+        return os.path.join(self.pasta, hashlib.sha1(f"{servidor}|{banco}".encode('utf-8')).hexdigest())
+
+    @staticmethod
+    def _assinatura(impressoes, verificacoes, colunas):
+        return {"impressoes": impressoes, "verificacoes": list(verificacoes), "colunas": colunas}
+
+    def obter(self, servidor, banco, impressoes, verificacoes, colunas):
+        """Retorna o estado guardado do banco, ou None se não existir ou se o banco mudou."""
+        if not impressoes or any(v is None for v in impressoes.values()): return None
+        pasta = self._pasta_banco(servidor, banco)
+        try:
+            with open(os.path.join(pasta, "estado.json"), 'r', encoding='utf-8') as f:
+                guardado = json.load(f)
+            if guardado["assinatura"] != self._assinatura(impressoes, verificacoes, colunas): return None
+            quadros = {nome: ler_dataframe(os.path.join(pasta, arquivo)) for nome, arquivo in guardado["arquivos"].items()}
+        except (OSError, ValueError, KeyError):
+            return None
+        return {
+            "contagem": guardado["contagem"],
+            "erros_datas": quadros.pop("erros_datas", None),
+            "sobreposicoes": quadros.pop("sobreposicoes", None),
+            "tabelas": quadros,
+        }
+
+    def guardar(self, servidor, banco, impressoes, verificacoes, colunas, estado):
+        """Grava o estado de um banco (ver AnaliseIncremental.estado), substituindo o anterior."""
+        if not impressoes or any(v is None for v in impressoes.values()): return
+        pasta = self._pasta_banco(servidor, banco)
+        os.makedirs(pasta, exist_ok=True)
+        # Sem o estado.json, uma gravação interrompida nunca é lida como válida
+        caminho_estado = os.path.join(pasta, "estado.json")
+        if os.path.exists(caminho_estado): os.remove(caminho_estado)
+        for nome in os.listdir(pasta): os.remove(os.path.join(pasta, nome))
+        quadros = dict(estado["tabelas"])
+        for nome in ("erros_datas", "sobreposicoes"):
+            if estado[nome] is not None: quadros[nome] = estado[nome]
+        arquivos = {nome: os.path.basename(gravar_dataframe(df, os.path.join(pasta, nome))) for nome, df in quadros.items()}
+        guardado = {"servidor": servidor, "banco": banco, "assinatura": self._assinatura(impressoes, verificacoes, colunas), "contagem": estado["contagem"], "arquivos": arquivos}
+        with open(caminho_estado, 'w', encoding='utf-8') as f:
+            json.dump(guardado, f, ensure_ascii=False, default=int)
+
+def _impressoes_do_banco(gerenciador, nome_db, tabelas):
+    """Impressões digitais das tabelas de um banco (None se o banco não puder ser consultado)."""
+    try:
+        with gerenciador.conexao(nome_db) as conn:
+            return {nome_logico: calcular_impressao_digital(conn, nome_logico) for nome_logico in tabelas}
+    except Exception:
+        return None
+
+def calcular_impressoes_bancos(gerenciador, bancos, tabelas):
+    """
+    Calcula, em paralelo (limitado pelos pools de cada servidor), as impressões digitais das
+    tabelas de todos os bancos.
+
+    Retorna:
+    - dict: nome_db -> {tabela lógica: impressão} (ou None, se o banco não pôde ser consultado).
+    """
+    if not bancos: return {}
+    threads = sum(pool.max_conexoes for pool in gerenciador.pools.values())
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return dict(zip(bancos, executor.map(lambda nome_db: _impressoes_do_banco(gerenciador, nome_db, tabelas), bancos)))
 
-def executar_analise_completa(conexao_info, bancos_selecionados, status_callback, app_instance):
+def executar_analise_completa(conexao_info, bancos_selecionados, status_callback, app_instance, max_workers=MAX_EXTRACOES_SIMULTANEAS, fabrica_conexao=None, modo_pushdown=False, usar_cache=False, forcar_atualizacao_cache=False, formato_exportacao=None, limite_linhas_secao=None, pasta_resultados=PASTA_RESULTADOS, limites_por_servidor=None, modo_incremental=False, modo_em_disco=False, verificacoes=None, reverificar_alterados=False, instrumentacao=None):
     """
     Função principal que orquestra a extração, consolidação e análise dos dados.
-    Esta função é executada em uma thread separada para não travar a GUI.
+    Na GUI, esta função é executada em uma thread separada para não travar a janela; na linha de
+    comando, é chamada diretamente.
 
     Parâmetros:
-    - conexao_info (dict): Informações de servidor, usuário e senha.
-    - bancos_selecionados (list): Lista de nomes dos bancos a serem analisados.
+    - conexao_info (dict): Informações de servidor, usuário e senha (pode ser None se todos os
+      itens de 'bancos_selecionados' forem entradas completas).
+    - bancos_selecionados (list): Nomes dos bancos a serem analisados e/ou entradas no formato do
+      config.json, que podem estar em servidores diferentes (ver 'montar_alvos').
     - status_callback (function): Função para atualizar o status na GUI.
-    - app_instance (App): A instância da classe da aplicação para chamar 'after()'.
+    - app_instance (App): A instância da classe da aplicação para chamar 'after()' (None fora da GUI).
+    - max_workers (int): Quantidade máxima de extrações simultâneas (banco x tabela) por servidor.
+    - fabrica_conexao (callable, opcional): Fábrica 'fabrica(servidor, banco)' de conexões DB-API,
+      usada para todos os servidores. Por padrão, cada servidor usa uma FabricaConexaoSQLServer
+      com o seu usuário e senha.
+    - modo_pushdown (bool): Se True, as verificações de duplicidade rodam no servidor e só as
+      linhas que colidem são transferidas. Se o servidor recusar consultas entre bancos, ou se os
+      bancos estiverem em servidores diferentes, a análise volta automaticamente para o modo local.
+    - usar_cache (bool): Se True, tabelas que não mudaram desde a última execução são lidas do
+      cache local em vez de baixadas de novo.
+    - forcar_atualizacao_cache (bool): Se True, ignora o conteúdo do cache e baixa tudo de novo
+      (o cache é regravado com os dados novos).
+    - formato_exportacao (str, opcional): 'csv', 'jsonl' ou 'parquet' para gravar também cada
+      seção completa na pasta de seções.
+    - limite_linhas_secao (int, opcional): Máximo de linhas por seção no relatório de texto.
+    - pasta_resultados (str): Pasta onde o relatório, o cache e as seções exportadas são gravados.
+    - limites_por_servidor (dict, opcional): Limite de sessões simultâneas de servidores
+      específicos (servidor -> sessões); os demais usam 'max_workers'.
+    - modo_incremental (bool): Se True, cada tabela é analisada assim que a sua extração
+      termina (ver AnaliseIncremental): os conflitos aparecem no status durante a extração e os
+      dados brutos não ficam todos na memória ao mesmo tempo. O relatório é o mesmo.
+    - modo_em_disco (bool): Se True, a consolidação é feita num arquivo SQLite na pasta de
+      resultados (ver AnaliseEmDisco), para máquinas com pouca memória. Implica o modo incremental.
+    - verificacoes (list, opcional): Identificadores de REGISTRO_VERIFICACOES a executar (padrão:
+      todas). Só as tabelas e colunas usadas por elas são extraídas.
+    - reverificar_alterados (bool): Se True, só os bancos cujas tabelas mudaram desde a última
+      execução são extraídos; os demais são comparados a partir do resultado guardado da sua
+      última análise (ver IndiceBancos). Não se aplica quando o modo pushdown é usado.
+    - instrumentacao (Instrumentacao, opcional): Recebe as medições e o progresso da execução e
+      permite cancelá-la (a GUI cria a sua para mostrar a barra de progresso). As medições vão
+      para o rastro ARQUIVO_TRACE e para o apêndice de tempos do relatório.
+
+    Retorna:
+    - dict: {'inconsistencias': bool, 'falhas_extracao': list, 'caminho_relatorio': str,
+      'comparacao': DataFrame ou None (novas/remanescentes/resolvidas por verificação em relação
+      à execução anterior), 'caminho_trace': str}, ou None se a análise foi interrompida por um
+      erro crítico ou cancelada.
     """
+    analise = None
+    instrumentacao = instrumentacao or Instrumentacao()
+    caminho_trace = os.path.join(pasta_resultados, ARQUIVO_TRACE)
     try:
         # Configuração da pasta de resultados
-        pasta_resultados = "Resultados_Analise"
         os.makedirs(pasta_resultados, exist_ok=True)
         caminho_relatorio = os.path.join(pasta_resultados, "relatorio_analise.txt")
         status_callback(f"Pasta de resultados: '{pasta_resultados}'")
         
-        # Estruturas para armazenar dados extraídos e contagens
-        todos_os_dados = {key: [] for key in CONFIG_TABELAS.keys()}
-        contagem_registros = {}
+        # Verificações escolhidas e as colunas que elas precisam de cada tabela
+        verificacoes = resolver_verificacoes(verificacoes)
+        colunas_extracao = colunas_analisadas = colunas_necessarias(verificacoes)
+        duplicidades_escolhidas = filtrar_duplicidades(verificacoes)
 
-        # Loop principal: itera sobre cada banco de dados selecionado
-        for nome_db in bancos_selecionados:
-            status_callback(f"Processando banco: {nome_db}...")
-            # Monta a string de conexão para o banco atual
-            conn_str = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={conexao_info['servidor']};DATABASE={nome_db};UID={conexao_info['usuario']};PWD={conexao_info['senha']};"
-            contagem_registros[nome_db] = {}
+        # Onde cada banco está; a partir daqui os bancos são identificados pelo nome de origem
+        alvos = montar_alvos(conexao_info, bancos_selecionados)
+        bancos_selecionados = list(alvos.keys())
+        if fabrica_conexao is None:
+            fabrica_do_servidor = lambda entrada: FabricaConexaoSQLServer(entrada['usuario'], entrada['senha'], driver=entrada.get('driver'))
+        else:
+            fabrica_do_servidor = lambda entrada: fabrica_conexao
 
-            # Sub-loop: itera sobre cada tabela a ser analisada
-            for nome_logico in CONFIG_TABELAS.keys():
-                df = extrair_dados(nome_logico, {"nome_identificador": nome_db}, conn_str)
-                if df is not None and not df.empty:
-                    todos_os_dados[nome_logico].append(df)
-                    
-                    # Lógica de contagem específica para cada tabela
-                    if nome_logico == "funcionarios":
-                        df_copy = df.copy()
-                        if 'demissao' in df_copy.columns:
-                            df_copy['demissao'] = pd.to_datetime(df_copy['demissao'], errors='coerce')
-                            ativos = df_copy['demissao'].isnull().sum()
-                            demitidos = df_copy['demissao'].notnull().sum()
-                            contagem_registros[nome_db]['funcionarios'] = {'ativos': ativos, 'demitidos': demitidos}
-                        else:
-                            contagem_registros[nome_db]['funcionarios'] = {'ativos': len(df_copy), 'demitidos': 0}
-                    elif nome_logico == "horarios":
-                        # Conta o número de horários únicos (baseado na coluna 'numero')
-                        contagem_registros[nome_db][nome_logico] = df['numero'].nunique()
+        # Extração paralela: todos os pares (banco, tabela) são lidos ao mesmo tempo, limitados
+        # por servidor (max_workers ou o limite específico do servidor)
+        secoes_pushdown = None
+        contagens_servidor = {}
+        cache = CacheExtracao(os.path.join(pasta_resultados, PASTA_CACHE), forcar_atualizacao=forcar_atualizacao_cache) if usar_cache else None
+        tabelas_extracao = list(colunas_extracao)
+        # Cada pool tem uma sessão por thread; todas são fechadas ao final da extração
+        with GerenciadorServidores(alvos, fabrica_do_servidor, max_workers, limites_por_servidor) as gerenciador:
+            quantidade_servidores = len(gerenciador.pools)
+            status_callback(f"Extraindo dados de {len(bancos_selecionados)} bancos" + (f" em {quantidade_servidores} servidores..." if quantidade_servidores > 1 else "..."))
+            if modo_pushdown and quantidade_servidores > 1:
+                # Consultas entre bancos só funcionam dentro de uma mesma instância
+                status_callback("O modo pushdown não funciona entre servidores diferentes; usando a análise local...")
+            elif modo_pushdown and duplicidades_escolhidas:
+                # Tabelas usadas apenas pelas verificações de duplicidade não precisam ser extraídas
+                tabelas_so_contagem = [t for t in colunas_extracao if t not in TABELAS_ANALISE_LOCAL]
+                try:
+                    pool_unico = next(iter(gerenciador.pools.values()))
+                    secoes_pushdown, contagens_servidor = executar_verificacoes_pushdown(pool_unico, bancos_selecionados, status_callback, tabelas_so_contagem, duplicidades_escolhidas, instrumentacao,
+                                                                                       nomes_no_servidor=[gerenciador.banco_de(b) for b in bancos_selecionados])
+                    tabelas_extracao = [t for t in colunas_extracao if t in TABELAS_ANALISE_LOCAL]
+                    # As colunas das duplicidades já foram verificadas no servidor
+                    colunas_extracao = colunas_necessarias(verificacoes, sem_duplicidades=True)
+                except AnaliseCancelada:
+                    raise
+                except Exception as e:
+                    status_callback(f"Servidor não permite o modo pushdown ({e}); usando a análise local...")
+                    secoes_pushdown, contagens_servidor = None, {}
+            # As duplicidades só são verificadas localmente se o servidor não as devolveu prontas
+            if modo_em_disco:
+                caminho_consolidacao = os.path.join(pasta_resultados, ARQUIVO_CONSOLIDACAO)
+                analise = AnaliseEmDisco(caminho_consolidacao, bancos_selecionados, status_callback, secoes_pushdown is None, verificacoes, instrumentacao)
+            else:
+                analise = AnaliseIncremental(bancos_selecionados, status_callback, secoes_pushdown is None, verificacoes, instrumentacao)
+            # Reverificação só dos bancos alterados: os bancos cujas impressões digitais não mudaram
+            # são restaurados do índice guardado na última execução e não são extraídos
+            indice_bancos, impressoes, bancos_extracao = None, {}, bancos_selecionados
+            if reverificar_alterados and secoes_pushdown is not None:
+                status_callback("A reverificação só dos bancos alterados não se aplica ao modo pushdown; analisando todos...")
+            elif reverificar_alterados:
+                indice_bancos = IndiceBancos(os.path.join(pasta_resultados, PASTA_INDICES_BANCOS))
+                status_callback("Verificando quais bancos mudaram desde a última execução...")
+                impressoes = calcular_impressoes_bancos(gerenciador, bancos_selecionados, tabelas_extracao)
+                bancos_extracao = []
+                for nome_db in bancos_selecionados:
+                    estado = indice_bancos.obter(alvos[nome_db]["servidor"], alvos[nome_db]["banco"], impressoes[nome_db], verificacoes, colunas_extracao)
+                    if estado is None:
+                        bancos_extracao.append(nome_db)
                     else:
-                        # Para todas as outras tabelas, conta o número total de linhas
-                        contagem_registros[nome_db][nome_logico] = len(df)
+                        analise.restaurar(nome_db, estado)
+                status_callback(f"{len(bancos_selecionados) - len(bancos_extracao)} banco(s) sem alterações reaproveitados; {len(bancos_extracao)} banco(s) a extrair.")
+            # Em disco, cada tabela sai da memória assim que chega (senão os buffers se acumulariam até o fim)
+            ao_concluir = analise.incorporar if modo_incremental or modo_em_disco else None
+            resultados, falhas_extracao = extrair_bancos_em_paralelo(gerenciador, bancos_extracao, status_callback, tabelas_extracao, cache, ao_concluir, colunas_extracao, instrumentacao)
+
+        # Sem o modo incremental, as tabelas são incorporadas só agora, na ordem da seleção
+        # (independentemente da ordem em que as threads terminaram)
+        for nome_db in bancos_selecionados:
+            for nome_logico in CONFIG_TABELAS.keys():
+                buffer = resultados.pop((nome_db, nome_logico), None)
+                if buffer is not None: analise.incorporar(nome_db, nome_logico, buffer)
+
+        # Guarda o resultado dos bancos extraídos agora (sem falhas) para a próxima reverificação
+        if indice_bancos is not None:
+            bancos_com_falha = {falha.nome_db for falha in falhas_extracao}
+            for nome_db in bancos_extracao:
+                if nome_db in bancos_com_falha: continue
+                indice_bancos.guardar(alvos[nome_db]["servidor"], alvos[nome_db]["banco"], impressoes[nome_db], verificacoes, colunas_extracao, analise.estado(nome_db))
+
+        # Tabelas não extraídas (modo pushdown): usa a contagem feita no servidor
+        contagem_registros = analise.contagem_registros
+        for (nome_db, nome_logico), quantidade in contagens_servidor.items():
+            if quantidade and nome_logico not in contagem_registros[nome_db]:
+                contagem_registros[nome_db][nome_logico] = quantidade
 
         status_callback("Consolidando e analisando os dados...")
-        
-        # Concatena todos os DataFrames extraídos para uma análise consolidada
-        dados_consolidados = {
-            nome: pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
-            for nome, dfs in todos_os_dados.items()
-        }
-        
-        # Filtra a empresa de teste antes de realizar as verificações de duplicidade
-        if "empresas" in dados_consolidados and not dados_consolidados["empresas"].empty:
-            cnpj_teste = "00.000.000/0000-00"
-            dados_consolidados["empresas"] = dados_consolidados["empresas"][
-                dados_consolidados["empresas"]["cnpj"] != cnpj_teste
-            ]
+        secoes = analise.finalizar()
+        # No modo pushdown os conflitos de duplicidade já vieram prontos do servidor; senão foram
+        # calculados pela análise incremental. Em ambos os casos já estão ordenados.
+        secoes_duplicidade = secoes_pushdown if secoes_pushdown is not None else secoes["duplicidades"]
+
+        # Comparação com a execução anterior (se houver um índice de achados na pasta de resultados)
+        caminho_achados = os.path.join(pasta_resultados, ARQUIVO_ACHADOS)
+        achados = listar_achados(secoes, secoes_duplicidade, verificacoes)
+        anterior = carregar_achados(caminho_achados)
+        resumo_comparacao, detalhes_comparacao = comparar_achados(anterior, achados, verificacoes, bancos_selecionados) if anterior else (None, None)
+
+        # Opções de escrita comuns a todas as seções (limite de linhas e exportação)
+        exportador = ExportadorSecoes(os.path.join(pasta_resultados, PASTA_SECOES), formato_exportacao) if formato_exportacao else None
+        opcoes_secao = {"limite_linhas": limite_linhas_secao, "exportador": exportador}
+
+        # O relatório da execução anterior é preservado ao lado do novo (a partir daqui a
+        # análise não é mais cancelada, para não deixar a pasta sem relatório)
+        instrumentacao.verificar_cancelamento()
+        if os.path.exists(caminho_relatorio):
+            os.replace(caminho_relatorio, os.path.join(pasta_resultados, ARQUIVO_RELATORIO_ANTERIOR))
 
         # Início da escrita do relatório
-        with open(caminho_relatorio, 'w', encoding='utf-8') as relatorio:
+        with instrumentacao.medir("relatorio", cancelavel=False), open(caminho_relatorio, 'w', encoding='utf-8') as relatorio:
             relatorio.write(f"Relatório de Análise Pré-Unificação - Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n\n")
+            # Com só parte das verificações, o relatório diz quais foram feitas
+            if len(verificacoes) < len(REGISTRO_VERIFICACOES):
+                relatorio.write("Verificações selecionadas: " + "; ".join(REGISTRO_VERIFICACOES[i]["titulo"] for i in verificacoes) + "\n\n")
             
             # Seção do Sumário Quantitativo
             if contagem_registros:
                 relatorio.write("=" * 80 + "\nSUMÁRIO QUANTITATIVO DE REGISTROS\n" + "=" * 80 + "\n")
                 
                 # Tamanhos de colunas para garantir alinhamento perfeito
+                # Com bancos de vários servidores, a coluna do banco cresce para caber 'servidor/banco'
                 TAMANHO_COLUNA_NOME_BANCO = 20
+                if len({entrada["servidor"] for entrada in alvos.values()}) > 1:
+                    TAMANHO_COLUNA_NOME_BANCO = max([20] + [len(nome_db) + 1 for nome_db in contagem_registros])
                 TAMANHO_COLUNA_DADOS = 30
 
                 # Gera o cabeçalho da tabela de sumário
@@ -197,7 +2648,10 @@ def executar_analise_completa(conexao_info, bancos_selecionados, status_callback
                         contagem = contagens.get(nome_tabela)
                         
                         # Lógica de formatação para a coluna de funcionários
-                        if nome_tabela == 'funcionarios' and isinstance(contagem, dict):
+                        if nome_tabela not in colunas_analisadas:
+                            # Tabela não usada pelas verificações escolhidas (não foi lida)
+                            linha += " | -".ljust(TAMANHO_COLUNA_DADOS + 2)
+                        elif nome_tabela == 'funcionarios' and isinstance(contagem, dict):
                             ativos = contagem.get('ativos', 0)
                             demitidos = contagem.get('demitidos', 0)
                             linha += f" | Ativos:{ativos}/Demitidos:{demitidos}".ljust(TAMANHO_COLUNA_DADOS + 2)
@@ -218,7 +2672,9 @@ def executar_analise_completa(conexao_info, bancos_selecionados, status_callback
                 relatorio.write("-" * len(header) + "\n")
                 linha_total = f"{'TOTAL GERAL':<{TAMANHO_COLUNA_NOME_BANCO}}"
                 for nome_tabela in tabelas_ordenadas:
-                    if nome_tabela == 'funcionarios':
+                    if nome_tabela not in colunas_analisadas:
+                        linha_total += " | -".ljust(TAMANHO_COLUNA_DADOS + 2)
+                    elif nome_tabela == 'funcionarios':
                         total_ativos = totais[nome_tabela]['ativos']
                         total_demitidos = totais[nome_tabela]['demitidos']
                         linha_total += f" | Ativos:{total_ativos}/Demitidos:{total_demitidos}".ljust(TAMANHO_COLUNA_DADOS + 2)
@@ -227,254 +2683,239 @@ def executar_analise_completa(conexao_info, bancos_selecionados, status_callback
                         linha_total += f" | {total}".ljust(TAMANHO_COLUNA_DADOS + 2)
                 relatorio.write(linha_total + "\n\n\n")
 
+            # Seção de Falhas de Extração (tabelas que não puderam ser lidas)
+            if falhas_extracao:
+                relatorio.write("=" * 80 + "\nFALHAS DE EXTRAÇÃO (dados ausentes da análise)\n" + "=" * 80 + "\n")
+                for falha in falhas_extracao:
+                    relatorio.write(f"Banco: {falha.nome_db} | Tabela: {falha.tabela} | Detalhe: {falha.detalhe}\n")
+                relatorio.write("\n\n")
+
+            # Seção de Comparação com a execução anterior (novas, remanescentes e resolvidas)
+            if resumo_comparacao is not None:
+                data_anterior = anterior.get("gerado_em", "").replace("T", " ")
+                gerar_secao_comparacao(resumo_comparacao, detalhes_comparacao, data_anterior, relatorio, **opcoes_secao)
+
             inconsistencias_encontradas = False
 
             # Seção de Verificações Específicas
             # Horários com mesmo nome para códigos diferentes
-            df_horarios = dados_consolidados.get("horarios")
-            if df_horarios is not None and not df_horarios.empty:
-                pares_unicos = df_horarios[['nome', 'numero']].drop_duplicates()
-                nomes_conflitantes = pares_unicos[pares_unicos.duplicated(subset=['nome'], keep=False)]['nome'].unique()
-                if len(nomes_conflitantes) > 0:
-                    inconsistencias_encontradas = True
-                    relatorio.write("=" * 80 + "\nVERIFICAÇÃO: Horários com mesmo Nome para Códigos (numero) Diferentes\n" + "=" * 80 + "\n")
-                    for nome_conflito in sorted(nomes_conflitantes):
-                        relatorio.write(f"\n--- Conflito para o Nome de Horário: '{nome_conflito}' ---\n")
-                        df_conflito_filtrado = df_horarios[df_horarios['nome'] == nome_conflito]
-                        relatorio.write(df_conflito_filtrado[['nome', 'numero', 'dia_semana', 'origem_db']].sort_values(by=['numero', 'dia_semana']).to_string(index=False))
-                        relatorio.write("\n")
-                    relatorio.write("\n")
-            
-            # Verificações de Duplicidade Simples (Empresas, Funções, Departamentos)
-            df_empresas = dados_consolidados.get("empresas")
-            verificacoes_simples = {
-                "Empresas com mesmo CNPJ e Razão Social": (df_empresas, ['cnpj', 'nome'], ['cnpj', 'nome', 'origem_db']),
-                "Funções com mesma Descrição": ("funcoes", ['descricao'], ['descricao', 'id', 'origem_db']),
-                "Departamentos com mesma Descrição": ("departamentos", ['descricao'], ['descricao', 'id', 'origem_db'])
-            }
-            for titulo, (nome_df_ou_df, subset_cols, report_cols) in verificacoes_simples.items():
-                # Trata a entrada como DataFrame ou nome de tabela
-                if isinstance(nome_df_ou_df, pd.DataFrame):
-                    df = nome_df_ou_df
-                else:
-                    df = dados_consolidados.get(nome_df_ou_df)
-
-                if df is not None and not df.empty:
-                    # Encontra linhas duplicadas com base no subset de colunas
-                    duplicados = df[df.duplicated(subset=subset_cols, keep=False)]
-                    if gerar_relatorio_txt(titulo, duplicados, report_cols, relatorio): inconsistencias_encontradas = True
+            if gerar_secao_horarios(secoes["horarios"], relatorio, **opcoes_secao): inconsistencias_encontradas = True
             
-            # Verificações de Duplicidade em Equipamentos
-            df_equipamentos = dados_consolidados.get("equipamentos")
-            if df_equipamentos is not None and not df_equipamentos.empty:
-                # Verifica duplicidade por 'codigo'
-                if 'codigo' in df_equipamentos.columns:
-                    duplicados = df_equipamentos[df_equipamentos['codigo'].notna() & df_equipamentos.duplicated(subset=['codigo'], keep=False)]
-                    if gerar_relatorio_txt("Equipamentos com mesmo 'codigo'", duplicados, ['codigo', 'descricao', 'origem_db'], relatorio): inconsistencias_encontradas = True
-                # Verifica duplicidade por 'descricao'
-                if 'descricao' in df_equipamentos.columns:
-                    duplicados = df_equipamentos[df_equipamentos['descricao'].notna() & df_equipamentos.duplicated(subset=['descricao'], keep=False)]
-                    if gerar_relatorio_txt("Equipamentos com mesma 'descricao'", duplicados, ['descricao', 'codigo', 'origem_db'], relatorio): inconsistencias_encontradas = True
-                # Verifica duplicidade por 'serial_rep'
-                if 'serial_rep' in df_equipamentos.columns:
-                    duplicados = df_equipamentos[df_equipamentos['serial_rep'].notna() & df_equipamentos.duplicated(subset=['serial_rep'], keep=False)]
-                    if gerar_relatorio_txt("Equipamentos com mesmo 'serial_rep'", duplicados, ['serial_rep', 'descricao', 'origem_db'], relatorio): inconsistencias_encontradas = True
+            # Verificações de Duplicidade entre bancos (Empresas, Funções, Departamentos, Equipamentos e
+            # documentos de Funcionários)
+            for titulo, nome_logico, colunas_chave, colunas_relatorio, ignorar_nula in VERIFICACOES_DUPLICIDADE:
+                if gerar_relatorio_txt(titulo, secoes_duplicidade.get(titulo), colunas_relatorio, relatorio, ja_ordenado=True, **opcoes_secao): inconsistencias_encontradas = True
             
             # Verificações de Inconsistência em Funcionários
-            df_funcionarios = dados_consolidados.get("funcionarios")
-            if df_funcionarios is not None and not df_funcionarios.empty:
-                # Verifica duplicidade por documentos
-                for col_doc in ['cpf', 'n_pis', 'n_folha', 'n_identificador']:
-                    if col_doc in df_funcionarios.columns:
-                        duplicados = df_funcionarios[df_funcionarios[col_doc].notna() & df_funcionarios.duplicated(subset=[col_doc], keep=False)]
-                        if gerar_relatorio_txt(f"Funcionários com mesmo {col_doc.upper()}", duplicados, [col_doc, 'id', 'nome', 'origem_db'], relatorio): inconsistencias_encontradas = True
-                
-                # Validação de Datas (formato, range e lógica)
-                df_check = df_funcionarios.copy()
-                colunas_data = ['admissao', 'demissao', 'nascimento', 'expedicao']
-                erros_de_data = []
-                originais = {col: df_check[col] for col in colunas_data if col in df_check.columns}
-                
-                # Converte colunas de data para tipo datetime e trata erros
-                for col in colunas_data:
-                    if col in df_check.columns: df_check[col] = pd.to_datetime(df_check[col], errors='coerce')
-                
-                # 1. Checa formato de data inválido
-                for col, original_series in originais.items():
-                    formato_invalido_mask = original_series.notna() & df_check[col].isna()
-                    if formato_invalido_mask.any():
-                        erros = df_check[formato_invalido_mask].copy()
-                        erros['motivo_erro'] = f"Formato de data inválido em '{col}' (Valor: " + original_series[formato_invalido_mask].astype(str) + ")"
-                        erros_de_data.append(erros)
-                
-                # 2. Checa datas fora do range aceitável
-                min_date, max_date = pd.Timestamp('1900-01-01'), pd.Timestamp('2079-12-31')
-                for col in colunas_data:
-                    if col in df_check.columns:
-                        range_mask = df_check[col].notna() & ((df_check[col] < min_date) | (df_check[col] > max_date))
-                        if range_mask.any():
-                            erros = df_check[range_mask].copy()
-                            erros['motivo_erro'] = f"Data em '{col}' fora do range (1900-2079)"
-                            erros_de_data.append(erros)
-                
-                # 3. Checa inconsistência lógica: demissão antes da admissão
-                if 'admissao' in df_check.columns and 'demissao' in df_check.columns:
-                    logica_mask = df_check['admissao'].notna() & df_check['demissao'].notna() & (df_check['demissao'] < df_check['admissao'])
-                    if logica_mask.any():
-                        erros = df_check[logica_mask].copy()
-                        erros['motivo_erro'] = "Demissão anterior à admissão"
-                        erros_de_data.append(erros)
-                        
-                # Consolida e reporta todos os erros de data
-                if erros_de_data:
-                    df_final_erros = pd.concat(erros_de_data).drop_duplicates(subset=['id', 'origem_db', 'motivo_erro'])
-                    if gerar_relatorio_txt("Funcionários com Inconsistências de Datas", df_final_erros, ['id', 'nome', 'admissao', 'demissao', 'nascimento', 'motivo_erro', 'origem_db'], relatorio): inconsistencias_encontradas = True
+            # Validação de Datas (formato, range e lógica), feita em cada banco ao incorporá-lo
+            if gerar_relatorio_txt(REGISTRO_VERIFICACOES["datas_funcionarios"]["titulo"], secoes["erros_datas"], ['id', 'nome', 'admissao', 'demissao', 'nascimento', 'motivo_erro', 'origem_db'], relatorio, **opcoes_secao): inconsistencias_encontradas = True
             
-            # Verificação de Afastamentos Sobrepostos
-            df_afastamentos = dados_consolidados.get("afastamentos")
-            if df_afastamentos is not None and not df_afastamentos.empty and df_funcionarios is not None and not df_funcionarios.empty:
-                 # Converte colunas de data
-                 df_afastamentos['data_inicio'] = pd.to_datetime(df_afastamentos['data_inicio'], errors='coerce')
-                 df_afastamentos['data_fim'] = pd.to_datetime(df_afastamentos['data_fim'], errors='coerce')
-                 df_afastamentos.dropna(subset=['funcionario_id', 'data_inicio', 'data_fim'], inplace=True)
-                 df_afastamentos.sort_values(['funcionario_id', 'data_inicio'], inplace=True)
-                 
-                 # Cria uma nova coluna com a data de fim do afastamento anterior
-                 df_afastamentos['data_fim_anterior'] = df_afastamentos.groupby('funcionario_id')['data_fim'].shift(1)
-                 
-                 # Identifica sobreposições comparando a data de início atual com a de fim anterior
-                 sobreposicoes = df_afastamentos[df_afastamentos['data_inicio'] <= df_afastamentos['data_fim_anterior']]
-                 
-                 # Se encontrar sobreposições, gera o relatório
-                 if not sobreposicoes.empty:
-                    sobreposicoes_com_nome = sobreposicoes.merge(df_funcionarios[['id', 'nome']], left_on='funcionario_id', right_on='id', how='left')
-                    if gerar_relatorio_txt("Afastamentos Sobrepostos", sobreposicoes_com_nome, ['funcionario_id', 'nome', 'data_inicio', 'data_fim', 'origem_db'], relatorio): inconsistencias_encontradas = True
+            # Verificação de Afastamentos Sobrepostos (por funcionário, dentro de cada banco), já com os nomes e ordenada
+            if gerar_relatorio_txt(REGISTRO_VERIFICACOES["afastamentos"]["titulo"], secoes["sobreposicoes"], ['funcionario_id', 'nome', 'data_inicio', 'data_fim', 'origem_db'], relatorio, ja_ordenado=True, **opcoes_secao): inconsistencias_encontradas = True
 
             # Escreve a mensagem final do relatório
+            aviso_falhas = f" Atenção: {len(falhas_extracao)} tabela(s) não puderam ser lidas (veja o relatório)." if falhas_extracao else ""
+            aviso_comparacao = ""
+            if resumo_comparacao is not None and not resumo_comparacao.empty:
+                aviso_comparacao = f" Desde a execução anterior: {resumo_comparacao['novas'].sum()} nova(s), {resumo_comparacao['resolvidas'].sum()} resolvida(s)."
             if not inconsistencias_encontradas:
                 relatorio.write("NENHUMA INCONSISTÊNCIA ENCONTRADA.")
-                status_callback("Análise concluída. Nenhuma inconsistência encontrada!")
+                status_callback("Análise concluída. Nenhuma inconsistência encontrada!" + aviso_comparacao + aviso_falhas)
             else:
-                status_callback(f"Análise concluída! O relatório 'relatorio_analise.txt' foi gerado com sucesso.")
+                status_callback(f"Análise concluída! O relatório 'relatorio_analise.txt' foi gerado com sucesso." + aviso_comparacao + aviso_falhas)
+
+            # Apêndice com os tempos de cada etapa (o rastro completo fica em ARQUIVO_TRACE)
+            instrumentacao.escrever_apendice(relatorio, limite_linhas_secao, caminho_trace)
+            if exportador is not None: exportador.concluir()
+
+        # O índice desta execução passa a ser a referência da próxima (bancos com falha de extração
+        # ficam de fora, para que as suas inconsistências não sejam dadas como resolvidas)
+        bancos_com_falha = {falha.nome_db for falha in falhas_extracao}
+        salvar_achados(caminho_achados, achados, verificacoes, [b for b in bancos_selecionados if b not in bancos_com_falha])
+        return {"inconsistencias": inconsistencias_encontradas, "falhas_extracao": falhas_extracao, "caminho_relatorio": caminho_relatorio, "comparacao": resumo_comparacao, "caminho_trace": caminho_trace}
+    except AnaliseCancelada:
+        status_callback("Análise cancelada. Nenhum relatório foi gerado.")
+        return None
     except Exception as e:
         # Em caso de erro crítico na análise, exibe a mensagem de erro
         status_callback(f"ERRO CRÍTICO DURANTE A ANÁLISE: {e}")
+        return None
     finally:
+        # Libera os dados retidos (e apaga o arquivo da consolidação em disco) mesmo se houve erro
+        if analise is not None: analise.fechar()
+        # O rastro é gravado mesmo em caso de erro ou cancelamento, para mostrar onde a análise parou
+        try:
+            instrumentacao.gravar_trace(caminho_trace, bancos=[b if isinstance(b, str) else b.get("nome_identificador", b.get("banco")) for b in bancos_selecionados], verificacoes=verificacoes,
+                                        modos={"pushdown": modo_pushdown, "incremental": modo_incremental, "em_disco": modo_em_disco,
+                                               "cache": usar_cache, "reverificar_alterados": reverificar_alterados})
+        except OSError:
+            pass
         # Garante que os botões da GUI sejam reativados após o término da análise
-        app_instance.after(0, app_instance.ativar_botoes)
+        if app_instance is not None:
+            app_instance.after(0, app_instance.ativar_botoes)
 
-# Classe principal da aplicação (GUI)
-class App(ctk.CTk):
-    def __init__(self):
-        super().__init__()
-        
-        # Configurações da janela
-        self.title("Ferramenta de Análise Pré-Unificação (v4.15)")
-        self.geometry("600x750")
-        ctk.set_appearance_mode("dark")
-        
-        # Estrutura de frames e widgets da GUI
-        self.main_scrollable_frame = ctk.CTkScrollableFrame(self)
-        self.main_scrollable_frame.pack(fill="both", expand=True, padx=10, pady=10)
-        
-        # Seção 1: Conexão
-        self.frame_conexao = ctk.CTkFrame(self.main_scrollable_frame, corner_radius=10)
-        self.frame_conexao.pack(pady=10, padx=10, fill="x")
-        ctk.CTkLabel(self.frame_conexao, text="1. Conexão com o Servidor SQL", font=("", 14, "bold")).pack(pady=10)
-        self.entry_servidor = ctk.CTkEntry(self.frame_conexao, placeholder_text="Servidor (ex: localhost\\SQLEXPRESS)")
-        self.entry_servidor.pack(pady=5, padx=10, fill="x")
-        self.entry_usuario = ctk.CTkEntry(self.frame_conexao, placeholder_text="Usuário")
-        self.entry_usuario.pack(pady=5, padx=10, fill="x")
-        self.entry_senha = ctk.CTkEntry(self.frame_conexao, placeholder_text="Senha", show="*")
-        self.entry_senha.pack(pady=5, padx=10, fill="x")
-        self.btn_conectar = ctk.CTkButton(self.frame_conexao, text="Conectar e Listar Bancos", command=self.iniciar_conexao_thread)
-        self.btn_conectar.pack(pady=10, padx=10)
-        
-        # Seção 2: Seleção de Bancos
-        self.frame_selecao = ctk.CTkFrame(self.main_scrollable_frame, corner_radius=10)
-        self.frame_selecao.pack(pady=10, padx=10, fill="x")
-        ctk.CTkLabel(self.frame_selecao, text="2. Seleção dos Bancos de Dados", font=("", 14, "bold")).pack(pady=10)
-        self.frame_scroll_bancos = ctk.CTkScrollableFrame(self.frame_selecao, height=150)
-        self.frame_scroll_bancos.pack(pady=5, padx=10, fill="x")
-        ctk.CTkLabel(self.frame_scroll_bancos, text="Conecte ao servidor para listar os bancos.").pack()
-        
-        # Seção 3: Execução da Análise
-        self.frame_execucao = ctk.CTkFrame(self.main_scrollable_frame, corner_radius=10)
-        self.frame_execucao.pack(pady=10, padx=10, fill="x")
-        ctk.CTkLabel(self.frame_execucao, text="3. Executar Análise", font=("", 14, "bold")).pack(pady=10)
-        self.btn_analisar = ctk.CTkButton(self.frame_execucao, text="Iniciar Análise e Gerar Relatório", command=self.iniciar_analise_thread, state="disabled")
-        self.btn_analisar.pack(pady=10, padx=10)
-        
-        # Rótulo de Status
-        self.status_label = ctk.CTkLabel(self.main_scrollable_frame, text="Aguardando conexão...", wraplength=550)
-        self.status_label.pack(pady=10, padx=10)
-        
-        self.checkboxes_bancos = []
-
-    def atualizar_status(self, mensagem):
-        # Atualiza o rótulo de status na GUI de forma segura para threads
-        self.status_label.configure(text=mensagem)
-
-    def desativar_botoes(self):
-        # Desativa os botões para evitar cliques duplos durante a execução
-        self.btn_conectar.configure(state="disabled")
-        self.btn_analisar.configure(state="disabled")
-
-    def ativar_botoes(self):
-        # Reativa os botões após a conclusão da tarefa
-        self.btn_conectar.configure(state="normal")
-        self.btn_analisar.configure(state="normal" if self.checkboxes_bancos else "disabled")
-
-    def iniciar_conexao_thread(self):
-        # Inicia a conexão em uma nova thread
-        self.desativar_botoes()
-        self.atualizar_status("Conectando ao servidor...")
-        thread = threading.Thread(target=self.conectar_e_listar_bancos)
-        thread.start()
-        
-    def conectar_e_listar_bancos(self):
-        """Função que se conecta e lista os bancos em uma thread separada."""
-        servidor, usuario, senha = self.entry_servidor.get(), self.entry_usuario.get(), self.entry_senha.get()
-        if not servidor or not usuario:
-            self.after(0, lambda: self.atualizar_status("Erro: Servidor e Usuário são campos obrigatórios."))
-            self.after(0, self.ativar_botoes)
-            return
-        conn_str = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={servidor};DATABASE=master;UID={usuario};PWD={senha};"
-        try:
-            with pyodbc.connect(conn_str, timeout=5) as conn:
-                cursor = conn.cursor()
-                # Query para listar bancos de dados de usuário, ignorando os do sistema
-                cursor.execute("SELECT name FROM sys.databases WHERE state = 0 AND name NOT IN ('master', 'model', 'msdb', 'tempdb') ORDER BY name;")
-                bancos = [row.name for row in cursor.fetchall()]
-            
-            # Limpa e preenche a lista de checkboxes na GUI
-            for widget in self.frame_scroll_bancos.winfo_children(): widget.destroy()
-            self.checkboxes_bancos = []
-            for banco in bancos:
-                checkbox = ctk.CTkCheckBox(self.frame_scroll_bancos, text=banco)
-                checkbox.pack(padx=20, pady=5, anchor="w")
-                self.checkboxes_bancos.append((banco, checkbox))
-                
-            self.after(0, lambda: self.atualizar_status("Conectado com sucesso. Selecione os bancos para análise."))
-        except Exception as e:
-            self.after(0, lambda e=e: self.atualizar_status(f"Falha na conexão: {e}"))
-        finally:
-            self.after(0, self.ativar_botoes)
-
-    def iniciar_analise_thread(self):
-        # Inicia a análise em uma nova thread
-        bancos_selecionados = [banco for banco, checkbox in self.checkboxes_bancos if checkbox.get() == 1]
-        if not bancos_selecionados or len(bancos_selecionados) < 2:
-            self.atualizar_status("Erro: Selecione pelo menos dois bancos de dados para comparar.")
-            return
-        self.desativar_botoes()
-        self.atualizar_status("Iniciando análise. Isso pode levar alguns minutos...")
-        conexao_info = {"servidor": self.entry_servidor.get(), "usuario": self.entry_usuario.get(), "senha": self.entry_senha.get()}
-        thread = threading.Thread(target=executar_analise_completa, args=(conexao_info, bancos_selecionados, lambda msg: self.after(0, lambda msg=msg: self.atualizar_status(msg)), self))
-        thread.start()
+# Seção de Linha de Comando
+# Roda a análise sem a janela (ex: agendada no Agendador de Tarefas do Windows para vários
+# clientes), lendo os bancos de um arquivo no formato do config.json. O progresso vai para o
+# stderr e o código de saída indica o resultado, para que scripts possam reagir a ele.
+
+TIPOS_BANCO_SUPORTADOS = ("SQLServer",)
+CODIGO_SAIDA_OK = 0                 # Análise concluída sem inconsistências
+CODIGO_SAIDA_INCONSISTENCIAS = 1    # Análise concluída, com inconsistências no relatório
+CODIGO_SAIDA_ERRO = 2               # Configuração inválida, erro crítico ou tabelas que não puderam ser lidas
+
+class ErroConfiguracao(Exception):
+    """Arquivo de configuração ausente, mal formado ou com valores não suportados."""
+
+def carregar_configuracao(caminho):
+    """
+    Lê o arquivo de configuração e valida as entradas de 'bancos_de_dados'.
+
+    Além da lista de bancos, o arquivo pode ter 'max_conexoes_por_servidor' (servidor -> número
+    de sessões simultâneas) para limitar servidores específicos.
+
+    Parâmetros:
+    - caminho (str): Caminho do arquivo JSON (ex: config.json).
+
+    Retorna:
+    - tuple: (bancos, limites). 'bancos' são as entradas (dicts com nome_identificador, tipo,
+      servidor, banco, usuario, senha e, opcionalmente, driver); sem 'nome_identificador', o nome
+      do banco é usado. 'limites' é o dict de 'max_conexoes_por_servidor' (vazio se ausente).
+
+    Lança:
+    - ErroConfiguracao: Se o arquivo não puder ser lido, não for JSON válido ou tiver entradas incompletas.
+    """
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            configuracao = json.load(arquivo)
+    except OSError as e:
+        raise ErroConfiguracao(f"Não foi possível ler '{caminho}': {e}") from e
+    except json.JSONDecodeError as e:
+        raise ErroConfiguracao(f"'{caminho}' não é um JSON válido: {e}") from e
+
+    bancos = configuracao.get("bancos_de_dados") if isinstance(configuracao, dict) else None
+    if not isinstance(bancos, list) or not bancos:
+        raise ErroConfiguracao(f"'{caminho}' precisa ter uma lista 'bancos_de_dados' com pelo menos uma entrada.")
+    for posicao, entrada in enumerate(bancos, start=1):
+        if not isinstance(entrada, dict):
+            raise ErroConfiguracao(f"A entrada {posicao} de 'bancos_de_dados' não é um objeto.")
+        faltando = [campo for campo in ("servidor", "banco", "usuario") if not entrada.get(campo)] + [campo for campo in ("senha",) if campo not in entrada]
+        if faltando:
+            raise ErroConfiguracao(f"A entrada {posicao} de 'bancos_de_dados' não tem: {', '.join(faltando)}.")
+        tipo = entrada.setdefault("tipo", "SQLServer")
+        if tipo not in TIPOS_BANCO_SUPORTADOS:
+            raise ErroConfiguracao(f"Tipo de banco não suportado na entrada {posicao}: '{tipo}' (use {', '.join(TIPOS_BANCO_SUPORTADOS)}).")
+        entrada.setdefault("nome_identificador", entrada["banco"])
+
+    limites = configuracao.get("max_conexoes_por_servidor", {})
+    if not isinstance(limites, dict) or not all(isinstance(v, int) and not isinstance(v, bool) and v > 0 for v in limites.values()):
+        raise ErroConfiguracao("'max_conexoes_por_servidor' precisa ser um objeto 'servidor': número de sessões (inteiro maior que zero).")
+    return bancos, limites
+
+def preparar_execucao(bancos):
+    """
+    Confere se as entradas da configuração formam uma análise válida.
+
+    Lança:
+    - ErroConfiguracao: Se houver menos de dois bancos, bancos repetidos ou um servidor com
+      credenciais diferentes entre as entradas.
+    """
+    if len(bancos) < 2:
+        raise ErroConfiguracao("Informe pelo menos dois bancos de dados para comparar.")
+    try:
+        montar_alvos(None, bancos)
+    except ValueError as e:
+        raise ErroConfiguracao(str(e)) from e
+
+def _inteiro_positivo(texto):
+    """Tipo do argparse para opções que precisam ser inteiros maiores que zero."""
+    if not texto.isdigit() or int(texto) < 1:
+        raise argparse.ArgumentTypeError(f"deve ser um inteiro maior que zero (recebido: '{texto}')")
+    return int(texto)
+
+def criar_parser():
+    """Monta o parser dos argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        prog="analise_gui.py",
+        description="Ferramenta de Análise Pré-Unificação. Sem argumentos, abre a janela; com --config, roda a análise sem interface.",
+        epilog=f"Códigos de saída: {CODIGO_SAIDA_OK} = sem inconsistências, {CODIGO_SAIDA_INCONSISTENCIAS} = inconsistências encontradas, "
+               f"{CODIGO_SAIDA_ERRO} = erro (configuração, falha crítica ou tabelas não lidas).",
+    )
+    parser.add_argument("--config", metavar="ARQUIVO", help="Arquivo JSON com a lista 'bancos_de_dados' (ex: config.json).")
+    parser.add_argument("--bancos", nargs="+", metavar="NOME", help="Analisa só estas entradas da configuração (pelo nome_identificador).")
+    parser.add_argument("--pasta-resultados", default=PASTA_RESULTADOS, metavar="PASTA", help=f"Pasta do relatório (padrão: {PASTA_RESULTADOS}).")
+    parser.add_argument("--paralelismo", type=_inteiro_positivo, default=MAX_EXTRACOES_SIMULTANEAS, metavar="N", help=f"Extrações simultâneas por servidor (padrão: {MAX_EXTRACOES_SIMULTANEAS}).")
+    parser.add_argument("--verificacoes", nargs="+", choices=list(REGISTRO_VERIFICACOES), metavar="ID",
+                        help="Executa só estas verificações, lendo só as tabelas e colunas que elas usam (padrão: todas). Opções: " + ", ".join(REGISTRO_VERIFICACOES) + ".")
+    parser.add_argument("--pushdown", action="store_true", help="Verifica as duplicidades no próprio servidor.")
+    parser.add_argument("--incremental", action="store_true", help="Analisa cada banco assim que a sua extração termina.")
+    parser.add_argument("--em-disco", action="store_true", help="Consolida os dados num arquivo SQLite (para máquinas com pouca memória).")
+    parser.add_argument("--cache", action="store_true", help="Usa o cache local de extrações.")
+    parser.add_argument("--forcar-cache", action="store_true", help="Ignora o conteúdo do cache e baixa tudo de novo.")
+    parser.add_argument("--so-alterados", action="store_true", help="Extrai só os bancos que mudaram desde a última execução; os demais vêm do resultado guardado.")
+    parser.add_argument("--exportar", choices=FORMATOS_EXPORTACAO, help="Grava também cada seção completa neste formato.")
+    parser.add_argument("--limite-linhas", type=_inteiro_positivo, metavar="N", help="Máximo de linhas por seção no relatório de texto.")
+    return parser
+
+def executar_linha_de_comando(args):
+    """
+    Roda a análise descrita no arquivo de configuração, sem interface gráfica.
+
+    Parâmetros:
+    - args (argparse.Namespace): Argumentos lidos por 'criar_parser'.
+
+    Retorna:
+    - int: O código de saída (CODIGO_SAIDA_OK, CODIGO_SAIDA_INCONSISTENCIAS ou CODIGO_SAIDA_ERRO).
+    """
+    def status(mensagem):
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] {mensagem}", file=sys.stderr, flush=True)
+
+    try:
+        bancos, limites = carregar_configuracao(args.config)
+        if args.bancos:
+            desconhecidos = [nome for nome in args.bancos if nome not in {b["nome_identificador"] for b in bancos}]
+            if desconhecidos:
+                raise ErroConfiguracao(f"Bancos não encontrados na configuração: {', '.join(desconhecidos)}.")
+            bancos = [b for b in bancos if b["nome_identificador"] in args.bancos]
+        preparar_execucao(bancos)
+    except ErroConfiguracao as e:
+        status(f"Erro de configuração: {e}")
+        return CODIGO_SAIDA_ERRO
+
+    # Ctrl+C pede o cancelamento: as extrações em andamento param no próximo lote e o rastro é gravado
+    instrumentacao = Instrumentacao()
+    def cancelar(*_):
+        status("Cancelando a análise...")
+        instrumentacao.cancelar()
+    tratador_anterior = signal.signal(signal.SIGINT, cancelar)
+    try:
+        resultado = executar_analise_completa(
+            None, bancos, status, None, args.paralelismo,
+            modo_pushdown=args.pushdown, modo_incremental=args.incremental, modo_em_disco=args.em_disco, usar_cache=args.cache, forcar_atualizacao_cache=args.forcar_cache,
+            reverificar_alterados=args.so_alterados,
+            formato_exportacao=args.exportar, limite_linhas_secao=args.limite_linhas, pasta_resultados=args.pasta_resultados,
+            limites_por_servidor=limites, verificacoes=args.verificacoes, instrumentacao=instrumentacao,
+        )
+    finally:
+        signal.signal(signal.SIGINT, tratador_anterior)
+    if resultado is None or resultado["falhas_extracao"]:
+        return CODIGO_SAIDA_ERRO
+    status(f"Relatório: {os.path.abspath(resultado['caminho_relatorio'])}")
+    return CODIGO_SAIDA_INCONSISTENCIAS if resultado["inconsistencias"] else CODIGO_SAIDA_OK
+
+def main(argv=None):
+    """Ponto de entrada: abre a janela ou, com --config, roda a análise pela linha de comando."""
+    args = criar_parser().parse_args(argv)
+    if args.config:
+        return executar_linha_de_comando(args)
+    # O analise_app importa as funções deste módulo; registrá-lo como 'analise_gui' evita que o
+    # arquivo seja carregado uma segunda vez quando é rodado como script (__main__)
+    sys.modules.setdefault("analise_gui", sys.modules[__name__])
+    from analise_app import App
+    App().mainloop()
+    return CODIGO_SAIDA_OK
 
 # Bloco de execução principal
 # Garante que o código dentro deste bloco só será executado quando o script for rodado diretamente.
 if __name__ == "__main__":
-    app = App()
-    app.mainloop()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,90 @@
+# bench_afastamentos.py
+# Mede a verificação de afastamentos sobrepostos (varredura por banco e funcionário) com
+# milhões de afastamentos sintéticos, comparando com a abordagem antiga ('shift' por
+# funcionario_id + 'merge' dos nomes só pelo id).
+#
+# Uso:
+#   python benchmarks/bench_afastamentos.py --linhas 1000000 5000000 --bancos 50
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Permite importar o analise_gui.py da pasta acima
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from analise_gui import encontrar_afastamentos_sobrepostos, anexar_nomes_funcionarios  # noqa: E402
+
+def gerar_dados(linhas, bancos, funcionarios_por_banco=20_000, semente=42):
+    """
+    Gera afastamentos e funcionários consolidados. Todos os bancos reutilizam os mesmos ids de
+    funcionário (1..funcionarios_por_banco), como acontece com bases do Ponto Offline.
+    """
+    rng = np.random.default_rng(semente)
+    nomes_bancos = [f"Banco_{i + 1:03d}" for i in range(bancos)]
+    inicio = pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, linhas), unit="D")
+    fim = inicio + pd.to_timedelta(rng.integers(0, 30, linhas), unit="D")
+    afastamentos = pd.DataFrame({
+        "funcionario_id": pd.array(rng.integers(1, funcionarios_por_banco + 1, linhas), dtype="Int64"),
+        "data_inicio": inicio,
+        "data_fim": fim,
+        "origem_db": pd.Categorical.from_codes(np.sort(rng.integers(0, bancos, linhas)), categories=nomes_bancos),
+    })
+    ids = np.tile(np.arange(1, funcionarios_por_banco + 1), bancos)
+    funcionarios = pd.DataFrame({
+        "id": pd.array(ids, dtype="Int64"),
+        "nome": [f"Func {i}" for i in ids],
+        "origem_db": pd.Categorical.from_codes(np.repeat(np.arange(bancos), funcionarios_por_banco), categories=nomes_bancos),
+    })
+    return afastamentos, funcionarios
+
+def abordagem_antiga(afastamentos, funcionarios):
+    """A verificação como era antes: agrupa só por funcionario_id e compara com o anterior."""
+    df = afastamentos.sort_values(["funcionario_id", "data_inicio"])
+    df["data_fim_anterior"] = df.groupby("funcionario_id")["data_fim"].shift(1)
+    sobreposicoes = df[df["data_inicio"] <= df["data_fim_anterior"]]
+    return sobreposicoes.merge(funcionarios[["id", "nome"]], left_on="funcionario_id", right_on="id", how="left")
+
+def abordagem_nova(afastamentos, funcionarios):
+    return anexar_nomes_funcionarios(encontrar_afastamentos_sobrepostos(afastamentos), funcionarios)
+
+def conferir_com_forca_bruta(semente=7, casos=200):
+    """Confere a varredura contra a comparação de todos os pares em casos pequenos."""
+    rng = np.random.default_rng(semente)
+    for _ in range(casos):
+        n = int(rng.integers(1, 40))
+        afastamentos, _ = gerar_dados(n, 2, funcionarios_por_banco=3, semente=int(rng.integers(1 << 30)))
+        esperado = 0
+        for i in range(n):
+            a = afastamentos.iloc[i]
+            outros = afastamentos.drop(index=i)
+            mesmo = (outros["funcionario_id"] == a["funcionario_id"]) & (outros["origem_db"] == a["origem_db"])
+            esperado += bool((mesmo & (outros["data_inicio"] <= a["data_fim"]) & (a["data_inicio"] <= outros["data_fim"])).any())
+        assert len(encontrar_afastamentos_sobrepostos(afastamentos)) == esperado
+
+def medir(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da verificação de afastamentos sobrepostos.")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--bancos", type=int, default=50)
+    parser.add_argument("--funcionarios-por-banco", type=int, default=20_000)
+    args = parser.parse_args()
+
+    conferir_com_forca_bruta()
+    # A abordagem antiga mistura bancos e multiplica as linhas no 'merge', por isso as contagens diferem
+    print(f"{'LINHAS':>12} | {'ANTIGA (s)':>10} | {'LINHAS ANTIGA':>13} | {'NOVA (s)':>10} | {'LINHAS NOVA':>11}")
+    for linhas in args.linhas:
+        afastamentos, funcionarios = gerar_dados(linhas, args.bancos, args.funcionarios_por_banco)
+        tempo_antigo, antigo = medir(abordagem_antiga, afastamentos, funcionarios)
+        tempo_novo, novo = medir(abordagem_nova, afastamentos, funcionarios)
+        print(f"{linhas:>12} | {tempo_antigo:>10.2f} | {len(antigo):>13} | {tempo_novo:>10.2f} | {len(novo):>11}")
+        del antigo, novo
+
+if __name__ == "__main__":
+    main()
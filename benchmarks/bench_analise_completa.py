@@ -0,0 +1,184 @@
+# bench_analise_completa.py
+# Roda a análise completa (extração, verificações e relatório) sobre bancos sintéticos em SQLite
+# (ver dados_sinteticos.py), em várias escalas e modos, e mede o tempo total, o tempo de cada
+# verificação e o pico de memória. Cada execução roda num processo separado, para que o pico de
+# memória de uma não contamine a outra.
+#
+# O benchmark também é uma verificação de regressão:
+# - as linhas encontradas por cada verificação precisam ser exatamente as do gabarito gerado
+#   junto com os bancos;
+# - com --referencia, o tempo e a memória são comparados com os de uma execução anterior gravada
+#   com --gravar-referencia, e qualquer piora acima da tolerância é apontada.
+# O código de saída é 1 se houver divergência nos achados ou regressão, e 0 caso contrário.
+#
+# Uso:
+#   python benchmarks/bench_analise_completa.py --escalas 5x2000 20x5000 50x10000 --gravar-referencia ref.json
+#   python benchmarks/bench_analise_completa.py --escalas 5x2000 20x5000 50x10000 --referencia ref.json
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Permite importar o analise_gui.py da pasta acima
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from analise_gui import REGISTRO_VERIFICACOES, Instrumentacao, executar_analise_completa, memoria_processo_mb  # noqa: E402
+from dados_sinteticos import FabricaSQLiteLocal, carregar_ou_gerar  # noqa: E402
+
+# Opções de executar_analise_completa de cada modo medido
+MODOS = {
+    "padrao": {},
+    "incremental": {"modo_incremental": True},
+    "em_disco": {"modo_em_disco": True},
+}
+
+def executar_uma(pasta_dados, modo, paralelismo):
+    """
+    Roda uma análise completa (no processo atual) e devolve as medições.
+
+    Retorna:
+    - dict: segundos, memoria_pico_mb, extracao_s (do início da primeira extração ao fim da
+      última), verificacoes_s (soma das verificações e consolidações), falhas e, por verificação,
+      as linhas encontradas e o tempo.
+    """
+    with open(os.path.join(pasta_dados, "gabarito.json"), 'r', encoding='utf-8') as f:
+        bancos = json.load(f)["bancos"]
+    instrumentacao = Instrumentacao()
+    inicio = time.perf_counter()
+    resultado = executar_analise_completa(
+        {"servidor": "local", "usuario": "", "senha": ""}, bancos, lambda mensagem: None, None, paralelismo,
+        fabrica_conexao=FabricaSQLiteLocal(pasta_dados), pasta_resultados=os.path.join(pasta_dados, f"resultados_{modo}"),
+        instrumentacao=instrumentacao, **MODOS[modo],
+    )
+    segundos = time.perf_counter() - inicio
+    if resultado is None: raise RuntimeError("A análise foi interrompida por um erro crítico.")
+
+    extracoes = instrumentacao.registros_da_etapa("extracao")
+    titulos = {dados["titulo"]: identificador for identificador, dados in REGISTRO_VERIFICACOES.items()}
+    verificacoes = {titulos[r["verificacao"]]: {"linhas": r["linhas"], "segundos": r["segundos"]} for r in instrumentacao.registros_da_etapa("verificacao")}
+    return {
+        "segundos": round(segundos, 3),
+        "memoria_pico_mb": memoria_processo_mb()[1],
+        "extracao_s": round(max(r["inicio_s"] + r["segundos"] for r in extracoes) - min(r["inicio_s"] for r in extracoes), 3) if extracoes else 0.0,
+        "verificacoes_s": round(sum(r["segundos"] for r in instrumentacao.registros if r["etapa"] in ("verificacao", "consolidacao")), 3),
+        "falhas": len(resultado["falhas_extracao"]),
+        "verificacoes": verificacoes,
+    }
+
+def medir_em_subprocesso(pasta_dados, modo, paralelismo):
+    """Roda 'executar_uma' num processo novo e devolve o seu resultado."""
+    processo = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--executar-uma", pasta_dados, modo, "--paralelismo", str(paralelismo)],
+        capture_output=True, text=True,
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(f"A execução '{modo}' falhou:\n{processo.stderr}")
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+def conferir_achados(esperado, medicao):
+    """Lista as verificações cujas linhas encontradas diferem do gabarito."""
+    divergencias = []
+    for identificador, linhas in esperado.items():
+        encontradas = medicao["verificacoes"].get(identificador, {}).get("linhas")
+        if encontradas != linhas:
+            divergencias.append(f"{identificador}: esperado {linhas}, encontrado {encontradas}")
+    if medicao["falhas"]:
+        divergencias.append(f"{medicao['falhas']} tabela(s) não puderam ser lidas")
+    return divergencias
+
+def comparar_com_referencia(referencia, medicao, tolerancia, tempo_minimo):
+    """
+    Lista as pioras em relação à referência acima da tolerância. Tempos menores que
+    'tempo_minimo' segundos (nas duas execuções) são ignorados, porque variam demais.
+    """
+    pioras = []
+
+    def conferir(nome, anterior, atual, unidade, minimo=0.0):
+        if anterior is None or atual is None or max(anterior, atual) < minimo: return
+        if atual > anterior * (1 + tolerancia):
+            pioras.append(f"{nome}: {anterior:.2f} -> {atual:.2f} {unidade} (+{(atual / anterior - 1) * 100 if anterior else float('inf'):.0f}%)")
+
+    conferir("tempo total", referencia.get("segundos"), medicao["segundos"], "s", tempo_minimo)
+    conferir("pico de memória", referencia.get("memoria_pico_mb"), medicao["memoria_pico_mb"], "MB")
+    for identificador, atual in medicao["verificacoes"].items():
+        anterior = referencia.get("verificacoes", {}).get(identificador, {})
+        conferir(f"verificação '{identificador}'", anterior.get("segundos"), atual["segundos"], "s", tempo_minimo)
+    return pioras
+
+def escala(texto):
+    """Converte 'BANCOSxFUNCIONARIOS' (ex: '50x10000') em (bancos, funcionarios)."""
+    try:
+        bancos, funcionarios = (int(parte) for parte in texto.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"escala inválida: '{texto}' (use BANCOSxFUNCIONARIOS, ex: 50x10000)")
+    return bancos, funcionarios
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--executar-uma":
+        # Modo interno: uma única execução, chamada por 'medir_em_subprocesso'
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--executar-uma", nargs=2, metavar=("PASTA", "MODO"))
+        parser.add_argument("--paralelismo", type=int, default=4)
+        args = parser.parse_args()
+        print(json.dumps(executar_uma(args.executar_uma[0], args.executar_uma[1], args.paralelismo)))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Benchmark e teste de regressão da análise completa com bancos sintéticos.")
+    parser.add_argument("--escalas", type=escala, nargs="+", default=[(5, 2000), (20, 5000), (50, 10000)], metavar="BxF",
+                        help="Escalas no formato BANCOSxFUNCIONARIOS (padrão: 5x2000 20x5000 50x10000).")
+    parser.add_argument("--modos", nargs="+", choices=list(MODOS), default=list(MODOS))
+    parser.add_argument("--pasta-dados", default=os.path.join(tempfile.gettempdir(), "bench_verificador_unificacao"),
+                        help="Onde os bancos sintéticos são gerados (e reaproveitados entre execuções).")
+    parser.add_argument("--taxa-duplicados", type=float, default=0.02)
+    parser.add_argument("--taxa-datas", type=float, default=0.01)
+    parser.add_argument("--taxa-sobreposicoes", type=float, default=0.02)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--paralelismo", type=int, default=4)
+    parser.add_argument("--referencia", metavar="ARQUIVO", help="Resultados anteriores (de --gravar-referencia) para detectar regressões.")
+    parser.add_argument("--gravar-referencia", metavar="ARQUIVO", help="Grava os resultados desta execução como referência.")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Piora aceita em relação à referência (padrão: 0.25 = 25%%).")
+    parser.add_argument("--tempo-minimo", type=float, default=0.5, help="Tempos abaixo deste valor (s) não são comparados (padrão: 0.5).")
+    parser.add_argument("--detalhar", action="store_true", help="Mostra também o tempo de cada verificação.")
+    args = parser.parse_args()
+
+    referencia = {}
+    if args.referencia:
+        with open(args.referencia, 'r', encoding='utf-8') as f:
+            referencia = json.load(f)
+
+    resultados, problemas = {}, []
+    print(f"{'ESCALA':>10} | {'MODO':>11} | {'TOTAL (s)':>9} | {'EXTRAÇÃO (s)':>12} | {'VERIF. (s)':>10} | {'PICO (MB)':>9} | ACHADOS")
+    for bancos, funcionarios in args.escalas:
+        nome_escala = f"{bancos}x{funcionarios}"
+        pasta_dados = os.path.join(args.pasta_dados, f"{nome_escala}_s{args.semente}")
+        gabarito = carregar_ou_gerar(pasta_dados, bancos=bancos, funcionarios=funcionarios, taxa_duplicados=args.taxa_duplicados,
+                                     taxa_datas=args.taxa_datas, taxa_sobreposicoes=args.taxa_sobreposicoes, semente=args.semente)
+        for modo in args.modos:
+            chave = f"{nome_escala}/{modo}"
+            medicao = medir_em_subprocesso(pasta_dados, modo, args.paralelismo)
+            resultados[chave] = medicao
+            divergencias = conferir_achados(gabarito["esperado"], medicao)
+            pioras = comparar_com_referencia(referencia[chave], medicao, args.tolerancia, args.tempo_minimo) if chave in referencia else []
+            problemas += [f"{chave} | achados | {d}" for d in divergencias] + [f"{chave} | regressão | {p}" for p in pioras]
+            pico = f"{medicao['memoria_pico_mb']:.0f}" if medicao["memoria_pico_mb"] else "-"
+            print(f"{nome_escala:>10} | {modo:>11} | {medicao['segundos']:>9.2f} | {medicao['extracao_s']:>12.2f} | {medicao['verificacoes_s']:>10.2f} | {pico:>9} | "
+                  + ("ok" if not divergencias else f"{len(divergencias)} divergência(s)"))
+            if args.detalhar:
+                for identificador, dados in medicao["verificacoes"].items():
+                    print(f"{'':>10}   {identificador:<30} {dados['segundos']:>8.3f} s {dados['linhas']:>10} linha(s)")
+
+    if args.gravar_referencia:
+        with open(args.gravar_referencia, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+        print(f"\nReferência gravada em '{args.gravar_referencia}'.")
+    if problemas:
+        print("\nFALHOU:")
+        for problema in problemas: print(f"  {problema}")
+        return 1
+    print("\nTodos os achados conferem com o gabarito" + (" e não houve regressão." if referencia else "."))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# bench_duplicidades.py
+# Mede o motor de duplicidade (IndiceDuplicidade) com milhões de funcionários sintéticos,
+# comparando com a abordagem antiga (um 'duplicated' por verificação + ordenação no relatório).
+#
+# Uso:
+#   python benchmarks/bench_duplicidades.py --linhas 1000000 3000000 --bancos 50
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Permite importar o analise_gui.py da pasta acima
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from analise_gui import MotorDuplicidade, VERIFICACOES_DUPLICIDADE  # noqa: E402
+
+def gerar_funcionarios(linhas, bancos, taxa_duplicados=0.02, semente=42):
+    """
+    Gera um DataFrame de funcionários consolidado. Os documentos são únicos, exceto uma fração
+    'taxa_duplicados' das linhas, que copia o documento de outra linha qualquer (do mesmo banco
+    ou de outro).
+    """
+    rng = np.random.default_rng(semente)
+    nomes_bancos = [f"Banco_{i + 1:03d}" for i in range(bancos)]
+    origens = np.sort(rng.integers(0, bancos, linhas))
+
+    def documentos(prob_nulo):
+        valores = rng.permutation(linhas * 10)[:linhas]
+        copias = rng.random(linhas) < taxa_duplicados
+        valores[copias] = valores[rng.integers(0, linhas, int(copias.sum()))]
+        valores = pd.array(valores.astype(str), dtype="string")
+        valores[rng.random(linhas) < prob_nulo] = pd.NA
+        return valores
+
+    return pd.DataFrame({
+        "id": pd.array(np.arange(linhas), dtype="Int64"),
+        "nome": pd.array([f"Func {i}" for i in range(linhas)], dtype="string"),
+        "cpf": documentos(0.05),
+        "n_pis": documentos(0.3),
+        "n_folha": documentos(0.0),
+        "n_identificador": documentos(0.5),
+        "origem_db": pd.Categorical.from_codes(origens, categories=nomes_bancos),
+    })
+
+def abordagem_antiga(df):
+    """
+    Verificações de documentos como eram antes do motor de duplicidade ('duplicated' por coluna e
+    nova ordenação no relatório), acrescidas do filtro de grupos presentes em mais de um banco,
+    para que o resultado seja equivalente ao do motor.
+    """
+    resultado = {}
+    for titulo, _, colunas_chave, colunas_relatorio, _ in VERIFICACOES_DUPLICIDADE[-4:]:
+        coluna = colunas_chave[0]
+        duplicados = df[df[coluna].notna() & df.duplicated(subset=[coluna], keep=False)]
+        bancos = duplicados.groupby(coluna, observed=True)['origem_db'].transform('nunique')
+        duplicados = duplicados[bancos > 1]
+        resultado[titulo] = duplicados[colunas_relatorio].sort_values(by=[coluna, 'origem_db'], kind='stable')
+    return resultado
+
+def medir(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do motor de duplicidade de funcionários.")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[100_000, 1_000_000, 3_000_000])
+    parser.add_argument("--bancos", type=int, default=50)
+    parser.add_argument("--taxa-duplicados", type=float, default=0.02)
+    args = parser.parse_args()
+
+    verificacoes_funcionarios = [v for v in VERIFICACOES_DUPLICIDADE if v[1] == "funcionarios"]
+    print(f"{'LINHAS':>12} | {'ANTIGA (s)':>10} | {'MOTOR (s)':>10} | {'CONFLITOS':>10}")
+    for linhas in args.linhas:
+        df = gerar_funcionarios(linhas, args.bancos, args.taxa_duplicados)
+        tempo_antigo, esperado = medir(abordagem_antiga, df)
+        tempo_motor, secoes = medir(lambda: MotorDuplicidade({"funcionarios": df}).verificar(verificacoes_funcionarios))
+        # As duas abordagens precisam encontrar exatamente as mesmas linhas, na mesma ordem
+        for titulo, df_esperado in esperado.items():
+            colunas = list(df_esperado.columns)
+            assert secoes[titulo][colunas].reset_index(drop=True).equals(df_esperado.reset_index(drop=True)), titulo
+        conflitos = sum(len(s) for s in secoes.values() if s is not None)
+        print(f"{linhas:>12} | {tempo_antigo:>10.2f} | {tempo_motor:>10.2f} | {conflitos:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+# dados_sinteticos.py
+# Gera N bancos no formato do Ponto Offline (as tabelas e colunas de CONFIG_TABELAS) em arquivos
+# SQLite locais, com taxas controladas de duplicidades entre bancos, datas inválidas e afastamentos
+# sobrepostos. Junto com os bancos é gravado um gabarito: quantas linhas cada verificação do
+# relatório deve encontrar, calculado a partir das anomalias injetadas.
+#
+# A FabricaSQLiteLocal abre esses arquivos como se fossem bancos do SQL Server (cada banco é
+# anexado com o esquema 'dbo'), para rodar a análise completa sem servidor:
+#   executar_analise_completa(None, bancos, print, None, fabrica_conexao=FabricaSQLiteLocal(pasta))
+#
+# Uso:
+#   python benchmarks/dados_sinteticos.py --pasta dados_sinteticos --bancos 50 --funcionarios 10000
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+# Permite importar o analise_gui.py da pasta acima
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from analise_gui import CONFIG_TABELAS, TIPOS_COLUNAS  # noqa: E402
+
+ARQUIVO_GABARITO = "gabarito.json"
+
+# Tamanho das tabelas em relação à quantidade de funcionários de cada banco
+EMPRESAS_POR_BANCO = 3
+FUNCIONARIOS_POR_HORARIO = 200
+FUNCIONARIOS_POR_FUNCAO = 20
+FUNCIONARIOS_POR_DEPARTAMENTO = 20
+FUNCIONARIOS_POR_EQUIPAMENTO = 100
+FRACAO_COM_AFASTAMENTOS = 0.5
+DIAS_SEMANA = 7
+
+class FabricaSQLiteLocal:
+    """
+    Fábrica de conexões (no formato esperado pelo GerenciadorConexoes) que abre os bancos gerados
+    por 'gerar_bancos': cada banco é o arquivo '<pasta>/<banco>.db', anexado como 'dbo' numa
+    conexão em memória, para que as consultas '[dbo].[tabela]' da extração funcionem sem mudança.
+    """
+    def __init__(self, pasta):
+        self.pasta = pasta
+
+    def _caminho(self, banco):
+        return os.path.join(self.pasta, banco + ".db")
+
+    def __call__(self, servidor, banco):
+        conexao = sqlite3.connect(":memory:", check_same_thread=False)
+        conexao.execute("ATTACH DATABASE ? AS dbo", (self._caminho(banco),))
+        return conexao
+
+    def trocar_banco(self, conexao, banco):
+        conexao.execute("DETACH DATABASE dbo")
+        conexao.execute("ATTACH DATABASE ? AS dbo", (self._caminho(banco),))
+        return True
+
+def nomes_bancos(bancos):
+    return [f"Banco_{i + 1:03d}" for i in range(bancos)]
+
+def _datas(dias):
+    """Converte dias desde 1970-01-01 em textos 'AAAA-MM-DD' (o formato mais comum no Ponto Offline)."""
+    return np.datetime_as_string(np.asarray(dias, dtype="datetime64[D]"), unit="D").astype(object)
+
+def _dias(texto):
+    return int(np.datetime64(texto, "D").astype(np.int64))
+
+def _copias(rng, bancos, tamanho, taxa):
+    """
+    Sorteia as linhas que copiam a chave do primeiro banco (mesma posição) em cada um dos demais.
+
+    Retorna:
+    - tuple: (mascaras, linhas_esperadas). 'mascaras[d]' marca as linhas copiadas no banco d (o
+      banco 0 nunca copia); 'linhas_esperadas' é quantas linhas a verificação de duplicidade deve
+      listar: cada chave copiada aparece no banco 0 e em todos os bancos que a copiaram.
+    """
+    mascaras = [np.zeros(tamanho, dtype=bool)] + [rng.random(tamanho) < taxa for _ in range(bancos - 1)]
+    copias_por_linha = np.sum(mascaras, axis=0)
+    return mascaras, int(np.sum(np.where(copias_por_linha > 0, copias_por_linha + 1, 0)))
+
+def _aplicar_copias(valores, valores_banco0, mascara):
+    valores = np.array(valores, dtype=object)
+    valores[mascara] = np.asarray(valores_banco0, dtype=object)[mascara]
+    return valores
+
+def _gerar_funcionarios(rng, d, n, taxa_datas):
+    """Funcionários do banco d com datas válidas, exceto as linhas sorteadas (um erro em cada)."""
+    admissao = _dias("2000-01-01") + rng.integers(0, 7000, n)
+    demitido = rng.random(n) < 0.2
+    demissao = np.where(demitido, admissao + rng.integers(1, 2000, n), 0)
+    nascimento = _dias("1950-01-01") + rng.integers(0, 15000, n)
+    expedicao = nascimento + rng.integers(6600, 9000, n)
+    colunas = {
+        "id": np.arange(1, n + 1),
+        "nome": np.array([f"Funcionario {d}-{i}" for i in range(n)], dtype=object),
+        "admissao": _datas(admissao),
+        "demissao": np.where(demitido, _datas(demissao), None),
+        "nascimento": _datas(nascimento),
+        "expedicao": _datas(expedicao),
+        "cpf": np.array([f"{d:04d}{i:07d}" for i in range(n)], dtype=object),
+        "n_pis": np.array([f"P{d:04d}{i:07d}" for i in range(n)], dtype=object),
+        "n_folha": np.array([f"F{d}-{i}" for i in range(n)], dtype=object),
+        "n_identificador": np.array([f"I{d}-{i}" for i in range(n)], dtype=object),
+    }
+    # Cada linha sorteada recebe exatamente um dos três tipos de erro da validação de datas
+    com_erro = np.flatnonzero(rng.random(n) < taxa_datas)
+    tipos = rng.integers(0, 3, len(com_erro))
+    for posicao, tipo in zip(com_erro, tipos):
+        if tipo == 0:
+            colunas["expedicao"][posicao] = f"sem data {posicao}"
+        elif tipo == 1:
+            colunas["nascimento"][posicao] = "1850-01-01"
+        else:
+            colunas["demissao"][posicao] = _datas([admissao[posicao] - 10])[0]
+    return colunas, len(com_erro)
+
+def _gerar_afastamentos(rng, n, taxa_sobreposicoes):
+    """
+    Dois afastamentos separados para parte dos funcionários; cada afastamento sorteado ganha um
+    segundo afastamento contido nele, o que marca as duas linhas como sobrepostas.
+    """
+    funcionarios = np.flatnonzero(rng.random(n) < FRACAO_COM_AFASTAMENTOS) + 1
+    inicio1 = _dias("2015-01-01") + rng.integers(0, 1000, len(funcionarios))
+    fim1 = inicio1 + rng.integers(1, 30, len(funcionarios))
+    inicio2 = fim1 + rng.integers(2, 200, len(funcionarios))
+    fim2 = inicio2 + rng.integers(1, 30, len(funcionarios))
+    ids, inicios, fins = [funcionarios, funcionarios], [inicio1, inicio2], [fim1, fim2]
+    sobrepostos = 0
+    for inicio, fim in ((inicio1, fim1), (inicio2, fim2)):
+        sorteados = rng.random(len(funcionarios)) < taxa_sobreposicoes
+        ids.append(funcionarios[sorteados])
+        inicios.append(inicio[sorteados])
+        fins.append(np.minimum(fim[sorteados], inicio[sorteados] + 3))
+        sobrepostos += 2 * int(sorteados.sum())
+    funcionario_id = np.concatenate(ids)
+    return {
+        "id": np.arange(1, len(funcionario_id) + 1),
+        "funcionario_id": funcionario_id,
+        "data_inicio": _datas(np.concatenate(inicios)),
+        "data_fim": _datas(np.concatenate(fins)),
+    }, sobrepostos
+
+def _gravar_banco(caminho, tabelas):
+    """Cria o arquivo SQLite com as tabelas de CONFIG_TABELAS e grava as colunas geradas."""
+    if os.path.exists(caminho): os.remove(caminho)
+    conexao = sqlite3.connect(caminho)
+    try:
+        for nome_logico, config in CONFIG_TABELAS.items():
+            colunas = config["colunas"]
+            definicao = ", ".join(f"[{c}] {'INTEGER' if TIPOS_COLUNAS.get(c) == 'inteiro' else 'TEXT'}" for c in colunas)
+            conexao.execute(f"CREATE TABLE [{config['tabela']}] ({definicao})")
+            valores = tabelas[nome_logico]
+            linhas = zip(*([v.item() if hasattr(v, "item") else v for v in valores[c]] for c in colunas))
+            conexao.executemany(f"INSERT INTO [{config['tabela']}] VALUES ({', '.join('?' * len(colunas))})", linhas)
+        conexao.commit()
+    finally:
+        conexao.close()
+
+def gerar_bancos(pasta, bancos, funcionarios, taxa_duplicados=0.02, taxa_datas=0.01, taxa_sobreposicoes=0.02, semente=42):
+    """
+    Gera os bancos sintéticos e o gabarito das verificações.
+
+    Parâmetros:
+    - pasta (str): Pasta dos arquivos '<banco>.db' e do gabarito.json.
+    - bancos (int): Quantidade de bancos.
+    - funcionarios (int): Funcionários por banco (as demais tabelas são proporcionais).
+    - taxa_duplicados (float): Fração das linhas de cada banco (exceto o primeiro) que repete a
+      chave de uma linha do primeiro banco, sorteada separadamente para cada verificação.
+    - taxa_datas (float): Fração dos funcionários com uma data inválida, fora do intervalo aceito
+      ou com demissão anterior à admissão.
+    - taxa_sobreposicoes (float): Fração dos afastamentos que ganha um afastamento sobreposto.
+    - semente (int): Semente do gerador aleatório (os mesmos parâmetros geram os mesmos bancos).
+
+    Retorna:
+    - dict: O gabarito: parâmetros, nomes dos bancos e 'esperado' (identificador de
+      REGISTRO_VERIFICACOES -> linhas que a seção deve ter).
+    """
+    os.makedirs(pasta, exist_ok=True)
+    rng = np.random.default_rng(semente)
+    nomes = nomes_bancos(bancos)
+    tamanhos = {
+        "empresas": EMPRESAS_POR_BANCO,
+        "horarios": max(1, funcionarios // FUNCIONARIOS_POR_HORARIO),
+        "funcoes": max(1, funcionarios // FUNCIONARIOS_POR_FUNCAO),
+        "departamentos": max(1, funcionarios // FUNCIONARIOS_POR_DEPARTAMENTO),
+        "equipamentos": max(1, funcionarios // FUNCIONARIOS_POR_EQUIPAMENTO),
+        "funcionarios": funcionarios,
+    }
+
+    # Chaves sorteadas para cópia entre bancos, uma vez por verificação
+    esperado = {}
+    copias = {}
+    for identificador, nome_logico in [
+        ("empresas_cnpj_nome", "empresas"), ("funcoes_descricao", "funcoes"), ("departamentos_descricao", "departamentos"),
+        ("equipamentos_codigo", "equipamentos"), ("equipamentos_descricao", "equipamentos"), ("equipamentos_serial_rep", "equipamentos"),
+        ("funcionarios_cpf", "funcionarios"), ("funcionarios_n_pis", "funcionarios"), ("funcionarios_n_folha", "funcionarios"),
+        ("funcionarios_n_identificador", "funcionarios"), ("horarios", "horarios"),
+    ]:
+        copias[identificador], esperado[identificador] = _copias(rng, bancos, tamanhos[nome_logico], taxa_duplicados)
+    # Cada horário tem uma linha por dia da semana, e a seção lista todas as linhas dos nomes em conflito
+    esperado["horarios"] *= DIAS_SEMANA
+    esperado["datas_funcionarios"] = esperado["afastamentos"] = 0
+
+    banco0 = {}
+    for d, nome_db in enumerate(nomes):
+        t = tamanhos
+        tabelas = {
+            "empresas": {"id": np.arange(1, t["empresas"] + 1),
+                         "nome": np.array([f"Empresa {d}-{i}" for i in range(t["empresas"])], dtype=object),
+                         "cnpj": np.array([f"{d:02d}.{i:03d}.000/0001-{(d + i) % 100:02d}" for i in range(t["empresas"])], dtype=object)},
+            "funcoes": {"id": np.arange(1, t["funcoes"] + 1), "descricao": np.array([f"Funcao {d}-{i}" for i in range(t["funcoes"])], dtype=object)},
+            "departamentos": {"id": np.arange(1, t["departamentos"] + 1), "descricao": np.array([f"Departamento {d}-{i}" for i in range(t["departamentos"])], dtype=object)},
+            "equipamentos": {"id": np.arange(1, t["equipamentos"] + 1),
+                             "codigo": d * 1_000_000 + np.arange(t["equipamentos"]),
+                             "descricao": np.array([f"Equipamento {d}-{i}" for i in range(t["equipamentos"])], dtype=object),
+                             "serial_rep": np.array([f"REP{d:04d}{i:08d}" for i in range(t["equipamentos"])], dtype=object)},
+        }
+        tabelas["funcionarios"], erros_datas = _gerar_funcionarios(rng, d, funcionarios, taxa_datas)
+        tabelas["afastamentos"], sobrepostos = _gerar_afastamentos(rng, funcionarios, taxa_sobreposicoes)
+        esperado["datas_funcionarios"] += erros_datas
+        esperado["afastamentos"] += sobrepostos
+        # Horários: números únicos entre todos os bancos; os nomes copiados colidem com outro número
+        numeros = d * 100_000 + np.arange(t["horarios"])
+        nomes_horarios = np.array([f"Horario {d}-{i}" for i in range(t["horarios"])], dtype=object)
+
+        if d == 0:
+            banco0 = {"empresas": tabelas["empresas"], "funcoes": tabelas["funcoes"], "departamentos": tabelas["departamentos"],
+                      "equipamentos": tabelas["equipamentos"], "funcionarios": tabelas["funcionarios"], "horarios": nomes_horarios}
+        else:
+            for coluna in ("cnpj", "nome"):
+                tabelas["empresas"][coluna] = _aplicar_copias(tabelas["empresas"][coluna], banco0["empresas"][coluna], copias["empresas_cnpj_nome"][d])
+            for nome_logico in ("funcoes", "departamentos"):
+                tabelas[nome_logico]["descricao"] = _aplicar_copias(tabelas[nome_logico]["descricao"], banco0[nome_logico]["descricao"], copias[f"{nome_logico}_descricao"][d])
+            for coluna in ("codigo", "descricao", "serial_rep"):
+                tabelas["equipamentos"][coluna] = _aplicar_copias(tabelas["equipamentos"][coluna], banco0["equipamentos"][coluna], copias[f"equipamentos_{coluna}"][d])
+            for coluna in ("cpf", "n_pis", "n_folha", "n_identificador"):
+                tabelas["funcionarios"][coluna] = _aplicar_copias(tabelas["funcionarios"][coluna], banco0["funcionarios"][coluna], copias[f"funcionarios_{coluna}"][d])
+            nomes_horarios = _aplicar_copias(nomes_horarios, banco0["horarios"], copias["horarios"][d])
+        tabelas["horarios"] = {
+            "numero": np.repeat(numeros, DIAS_SEMANA),
+            "nome": np.repeat(nomes_horarios, DIAS_SEMANA),
+            "dia_semana": np.tile(np.arange(1, DIAS_SEMANA + 1), t["horarios"]),
+        }
+        _gravar_banco(os.path.join(pasta, nome_db + ".db"), tabelas)
+
+    gabarito = {
+        "parametros": {"bancos": bancos, "funcionarios": funcionarios, "taxa_duplicados": taxa_duplicados,
+                       "taxa_datas": taxa_datas, "taxa_sobreposicoes": taxa_sobreposicoes, "semente": semente},
+        "bancos": nomes,
+        "esperado": esperado,
+    }
+    with open(os.path.join(pasta, ARQUIVO_GABARITO), 'w', encoding='utf-8') as f:
+        json.dump(gabarito, f, ensure_ascii=False, indent=1)
+    return gabarito
+
+def carregar_ou_gerar(pasta, **parametros):
+    """Reaproveita os bancos da pasta se o gabarito tiver os mesmos parâmetros; senão, gera de novo."""
+    try:
+        with open(os.path.join(pasta, ARQUIVO_GABARITO), 'r', encoding='utf-8') as f:
+            gabarito = json.load(f)
+        if gabarito["parametros"] == parametros and all(os.path.exists(os.path.join(pasta, b + ".db")) for b in gabarito["bancos"]):
+            return gabarito
+    except (OSError, ValueError, KeyError):
+        pass
+    return gerar_bancos(pasta, **parametros)
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera bancos sintéticos do Ponto Offline em SQLite, com gabarito das verificações.")
+    parser.add_argument("--pasta", default="dados_sinteticos")
+    parser.add_argument("--bancos", type=int, default=10)
+    parser.add_argument("--funcionarios", type=int, default=5000, help="Funcionários por banco.")
+    parser.add_argument("--taxa-duplicados", type=float, default=0.02)
+    parser.add_argument("--taxa-datas", type=float, default=0.01)
+    parser.add_argument("--taxa-sobreposicoes", type=float, default=0.02)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    gabarito = gerar_bancos(args.pasta, args.bancos, args.funcionarios, args.taxa_duplicados, args.taxa_datas, args.taxa_sobreposicoes, args.semente)
+    print(f"{args.bancos} banco(s) gerado(s) em '{args.pasta}' em {time.perf_counter() - inicio:.1f} s. Linhas esperadas por verificação:")
+    for identificador, linhas in gabarito["esperado"].items():
+        print(f"  {identificador:<30} {linhas:>10}")
+
+if __name__ == "__main__":
+    main()
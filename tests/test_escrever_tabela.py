@@ -0,0 +1,49 @@
+# test_escrever_tabela.py
+# Confere que a tabela escrita em blocos por 'escrever_tabela' é idêntica, byte a byte, à do
+# 'DataFrame.to_string(index=False)', para cada tipo de coluna que aparece no relatório.
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Permite importar o analise_gui.py da pasta acima
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from analise_gui import escrever_tabela  # noqa: E402
+
+def escrever(df, tamanho_bloco):
+    arquivo = io.StringIO()
+    escrever_tabela(df, arquivo, tamanho_bloco=tamanho_bloco)
+    return arquivo.getvalue()
+
+COLUNAS = {
+    "texto": pd.Series(["Ana", None, "José da Silva", "Bia"], dtype=object),
+    "inteiro": pd.array([1, 250, None, 42], dtype="Int64"),
+    "data": pd.to_datetime(["2020-01-31", None, "1999-12-01", "2024-02-29"], format="ISO8601"),
+    "data_hora": pd.to_datetime(["2020-01-31 08:00", "2021-05-01 17:30:15", None, "2024-02-29 00:00"], format="ISO8601"),
+    "decimal": np.array([1.5, 2.25, np.nan, -10.0]),
+}
+
+@pytest.mark.parametrize("coluna", list(COLUNAS))
+@pytest.mark.parametrize("tamanho_bloco", [1, 3, 100])
+def test_coluna_igual_ao_to_string(coluna, tamanho_bloco):
+    df = pd.DataFrame({coluna: COLUNAS[coluna], "origem_db": ["Banco_A", "Banco_B", "Banco_A", "Banco_C"]})
+    assert escrever(df, tamanho_bloco) == df.to_string(index=False)
+
+@pytest.mark.parametrize("valores", [
+    [1.5, 2.25],                      # casas decimais comuns à coluna (1.50 / 2.25)
+    [100.0, 2.0, np.nan],             # só zeros: fica uma casa
+    [1e7, 2.5],                       # grande, mas cabe sem notação científica
+    [1e12, 1.123456],                 # grande e longo: notação científica
+    [1e-8, 1.0],                      # muito pequeno: notação científica
+    [np.inf, -np.inf, 0.5],
+])
+def test_decimais_iguais_ao_to_string(valores):
+    df = pd.DataFrame({"valor": np.array(valores, dtype=float)})
+    assert escrever(df, 1) == df.to_string(index=False)
+
+def test_todas_as_colunas_juntas():
+    df = pd.DataFrame(COLUNAS)
+    assert escrever(df, 2) == df.to_string(index=False)